@@ -0,0 +1,94 @@
+# benchmarks/conteos_incrementales.py
+"""
+Mantenimiento incremental de conteos (tables.conteos_incrementales) vs. recuento completo.
+
+Sobre datos sintéticos: reconstruye el almacén, aplica un delta con altas, cambios
+(de dimensiones y de ESTADO_CASO) y bajas por ID_CASO, y compara el tiempo con el de
+volver a contar la tabla completa (CuboImprod.desde_df). Cada delta pasa por un CSV
+(las bajas con las dimensiones vacías) y se lee con leer_delta, como en la CLI.
+Verifica que el almacén coincida con el recuento y termina con código 1 si no.
+
+Uso (desde la raíz del repo):
+    python benchmarks/conteos_incrementales.py
+    python benchmarks/conteos_incrementales.py --filas 2000000 --delta 1000 10000 --estados ACTIVO
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datos_sinteticos import generar_improd
+from src.cubo_improd import CuboImprod
+from tables.conteos_incrementales import COL_OPERACION, COLUMNAS_ALMACEN, AlmacenConteos, leer_delta
+
+
+def generar_delta(df: pd.DataFrame, n: int, seed: int) -> pd.DataFrame:
+    """~60% cambios, ~25% altas y ~15% bajas sobre los ID_CASO de 'df'."""
+    rng = np.random.default_rng(seed)
+    n_cambios, n_altas = int(n * 0.6), int(n * 0.25)
+    n_bajas = n - n_cambios - n_altas
+    nuevas = generar_improd(n_cambios + n_altas, seed=seed + 1)[COLUMNAS_ALMACEN]
+    existentes = rng.choice(df["ID_CASO"].to_numpy(), n_cambios + n_bajas, replace=False)
+
+    cambios = nuevas.iloc[:n_cambios].assign(ID_CASO=existentes[:n_cambios], **{COL_OPERACION: "U"})
+    altas = nuevas.iloc[n_cambios:].assign(
+        ID_CASO=np.arange(n_altas) + int(df["ID_CASO"].max()) + 1, **{COL_OPERACION: "I"}
+    )
+    bajas = pd.DataFrame({"ID_CASO": existentes[n_cambios:], COL_OPERACION: "D"})
+    return pd.concat([cambios, altas, bajas], ignore_index=True).sample(frac=1, random_state=seed)
+
+
+def aplicar_a_df(df: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """El mismo delta aplicado a las filas (la última fila de cada ID_CASO manda)."""
+    ultimo = delta.drop_duplicates("ID_CASO", keep="last")
+    resto = df[~df["ID_CASO"].isin(ultimo["ID_CASO"])]
+    vigentes = ultimo[ultimo[COL_OPERACION] != "D"][COLUMNAS_ALMACEN]
+    return pd.concat([resto, vigentes.astype(resto.dtypes.to_dict())], ignore_index=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--delta", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--estados", nargs="+", help="solo cuentan estos ESTADO_CASO (p. ej. ACTIVO)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = generar_improd(args.filas, seed=args.seed)[COLUMNAS_ALMACEN]
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        almacen = AlmacenConteos(Path(tmp) / "conteos.sqlite", args.estados)
+        t0 = time.perf_counter()
+        r = almacen.reconstruir(df)
+        print(f"Reconstrucción: {r['casos']:,} casos, {r['celdas']:,} celdas ({time.perf_counter() - t0:.2f} s)")
+
+        print(f"{'delta':>10}{'incremental (s)':>18}{'recuento (s)':>15}{'coincide':>10}")
+        for i, n in enumerate(args.delta):
+            delta = generar_delta(df, n, seed=args.seed + 100 + i)
+            archivo = Path(tmp) / f"delta_{i}.csv"
+            delta.reindex(columns=COLUMNAS_ALMACEN + [COL_OPERACION]).to_csv(archivo, index=False)
+            t0 = time.perf_counter()
+            almacen.aplicar_delta(leer_delta(archivo))
+            t_delta = time.perf_counter() - t0
+
+            df = aplicar_a_df(df, delta)
+            t0 = time.perf_counter()
+            filas = df if args.estados is None else df[df["ESTADO_CASO"].astype(str).isin(args.estados)]
+            CuboImprod.desde_df(filas)
+            t_recuento = time.perf_counter() - t0
+
+            coincide = almacen.verificar(df).empty and almacen.verificar().empty
+            ok = ok and coincide
+            print(f"{n:>10,}{t_delta:>18.3f}{t_recuento:>15.3f}{'sí' if coincide else 'NO':>10}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
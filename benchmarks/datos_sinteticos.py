@@ -0,0 +1,242 @@
+# benchmarks/datos_sinteticos.py
+"""
+Generador reproducible (semilla) de datos IMPROD sintéticos con el esquema de
+cargar_improd (tables.consultas_sql.COLUMNAS_IMPROD), para medir el pipeline sin la BD.
+
+Cardinalidades y sesgo tomados del informe real:
+- NIVEL_TERRITORIAL: ~84% TERRITORIAL / ~16% CENTRAL.
+- TIPO_DEPENDENCIA condicionado al nivel (Provincial > Regional > Distrital; Delegada > Veeduría > ...).
+- DEPENDENCIA_TITULAR con distribución Zipf dentro de cada tipo (pocas dependencias concentran los casos).
+- IMPROD: procesos disciplinarios, quejas y otras actuaciones; ANIO_PGN creciente hacia el último año.
+- Nulos ocasionales en las dimensiones (se conservan como grupo propio en las tablas).
+
+Se genera por bloques, así que sirve de 10 mil a 50 millones de filas.
+
+Uso:
+    from benchmarks.datos_sinteticos import generar_improd
+    df = generar_improd(1_000_000, seed=0)                         # todas las columnas
+    df = generar_improd(50_000_000, columnas=COLUMNAS_REPORTE, categorias=True)
+
+    python benchmarks/datos_sinteticos.py --filas 200000 --salida data/sample_improd.csv
+    python benchmarks/datos_sinteticos.py --filas 1000000 --salida data/improd.sqlite   # BD local (DB_URL)
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+import numpy as np
+import pandas as pd
+
+from tables.consultas_sql import COLUMNAS_IMPROD, COLUMNAS_REPORTE
+
+NIVELES = {"TERRITORIAL": 0.836, "CENTRAL": 0.164}
+TIPOS = {
+    "TERRITORIAL": {
+        "PROCURADURIA PROVINCIAL": 0.574,
+        "PROCURADURIA REGIONAL": 0.322,
+        "PROCURADURIA DISTRITAL": 0.104,
+    },
+    "CENTRAL": {
+        "PROCURADURIA DELEGADA": 0.727,
+        "VEEDURIA": 0.153,
+        "SECRETARIA GENERAL": 0.07,
+        "OFICINA DE CONTROL INTERNO": 0.05,
+    },
+}
+IMPROD = {
+    "PROCESOS DISCIPLINARIOS": 0.58,
+    "QUEJAS": 0.27,
+    "ACTUACIONES ADMINISTRATIVAS": 0.10,
+    "OTRAS ACTUACIONES": 0.05,
+}
+ANIOS = {"HASTA 2021": 0.09, "2022": 0.14, "2023": 0.20, "2024": 0.27, "2025": 0.30}
+ESTADOS = {"ACTIVO": 0.93, "SUSPENDIDO": 0.07}
+ETAPAS = {
+    "INDAGACION PREVIA": 0.35, "INVESTIGACION DISCIPLINARIA": 0.30, "CITACION A AUDIENCIA": 0.15,
+    "PLIEGO DE CARGOS": 0.12, "JUZGAMIENTO": 0.08,
+}
+RIESGOS = {"BAJO": 0.55, "MEDIO": 0.30, "ALTO": 0.15}
+
+# Dependencias por tipo (≈ 1.100 en total) y sesgo Zipf dentro de cada tipo
+DEPENDENCIAS_POR_TIPO = {
+    "PROCURADURIA PROVINCIAL": 600, "PROCURADURIA REGIONAL": 32, "PROCURADURIA DISTRITAL": 110,
+    "PROCURADURIA DELEGADA": 300, "VEEDURIA": 12, "SECRETARIA GENERAL": 4, "OFICINA DE CONTROL INTERNO": 2,
+}
+EXPONENTE_ZIPF = 1.1
+TASA_NULOS = 0.005
+BLOQUE = 1_000_000
+
+
+def _pesos(d: dict):
+    claves = list(d)
+    p = np.array([d[k] for k in claves], dtype=float)
+    return claves, p / p.sum()
+
+
+def _zipf(n: int) -> np.ndarray:
+    p = 1.0 / np.arange(1, n + 1) ** EXPONENTE_ZIPF
+    return p / p.sum()
+
+
+def _categorias_dependencias():
+    """Nombres de dependencias (en el orden de TIPOS) y el rango de códigos de cada tipo."""
+    nombres, rangos = [], {}
+    for nivel in TIPOS:
+        for tipo in TIPOS[nivel]:
+            n = DEPENDENCIAS_POR_TIPO[tipo]
+            rangos[tipo] = (len(nombres), n)
+            nombres += [f"{tipo} {i:04d}" for i in range(1, n + 1)]
+    return nombres, rangos
+
+
+def _con_nulos(rng, codigos: np.ndarray) -> np.ndarray:
+    if TASA_NULOS:
+        codigos[rng.random(len(codigos)) < TASA_NULOS] = -1
+    return codigos
+
+
+def _bloque(rng, filas: int, id_inicial: int, columnas, categorias: bool) -> pd.DataFrame:
+    niveles, p_nivel = _pesos(NIVELES)
+    tipos = [t for nivel in TIPOS for t in TIPOS[nivel]]
+    deps, rangos = _categorias_dependencias()
+
+    nivel = rng.choice(len(niveles), size=filas, p=p_nivel)
+    tipo = np.empty(filas, dtype=np.int16)
+    dep = np.empty(filas, dtype=np.int32)
+    for i, n in enumerate(niveles):
+        m = nivel == i
+        nombres_tipo, p_tipo = _pesos(TIPOS[n])
+        t = rng.choice(len(nombres_tipo), size=int(m.sum()), p=p_tipo)
+        tipo[m] = tipos.index(nombres_tipo[0]) + t  # los tipos de un nivel son contiguos
+    for j, t in enumerate(tipos):
+        m = tipo == j
+        inicio, n = rangos[t]
+        dep[m] = inicio + rng.choice(n, size=int(m.sum()), p=_zipf(n))
+
+    improd, p_improd = _pesos(IMPROD)
+    anios, p_anio = _pesos(ANIOS)
+    anio = rng.choice(len(anios), size=filas, p=p_anio)
+
+    datos = {}
+
+    def _cat(nombre, codigos, valores):
+        if nombre in columnas:
+            datos[nombre] = pd.Categorical.from_codes(codigos, categories=valores)
+
+    def _elegir(nombre, dist):
+        if nombre in columnas:
+            valores, p = _pesos(dist)
+            _cat(nombre, rng.choice(len(valores), size=filas, p=p), valores)
+
+    _cat("IMPROD", _con_nulos(rng, rng.choice(len(improd), size=filas, p=p_improd)), improd)
+    _cat("NIVEL_TERRITORIAL", _con_nulos(rng, nivel.astype(np.int8)), niveles)
+    _cat("TIPO_DEPENDENCIA", _con_nulos(rng, tipo), tipos)
+    _cat("DEPENDENCIA_TITULAR", _con_nulos(rng, dep), deps)
+    _cat("ANIO_PGN", _con_nulos(rng, anio.astype(np.int8)), anios)
+    _elegir("ESTADO_CASO", ESTADOS)
+    _elegir("ETAPA_ACTUAL", ETAPAS)
+    _elegir("ETAPA_PROCESO", ETAPAS)
+    _elegir("ETAPA_HOMOLOGADA", ETAPAS)
+    _elegir("RIESGO", RIESGOS)
+
+    ids = np.arange(id_inicial, id_inicial + filas, dtype=np.int64)
+    if "ID_CASO" in columnas:
+        datos["ID_CASO"] = ids
+    if {"IUS", "IUC", "FECHA_PGN", "FECHA_PRESCRIPCION"} & set(columnas):
+        # FECHA_PGN coherente con ANIO_PGN ('HASTA 2021' -> 2012..2021)
+        anio_num = np.where(anio == 0, rng.integers(2012, 2022, size=filas), 2021 + anio)
+        fecha = (
+            pd.to_datetime(anio_num.astype(str), format="%Y")
+            + pd.to_timedelta(rng.integers(0, 365, size=filas), unit="D")
+        )
+        if "FECHA_PGN" in columnas:
+            datos["FECHA_PGN"] = fecha
+        if "FECHA_PRESCRIPCION" in columnas:
+            datos["FECHA_PRESCRIPCION"] = fecha + pd.DateOffset(years=5)
+        if "IUS" in columnas:
+            datos["IUS"] = pd.Series(anio_num.astype(str)).radd("E-") + "-" + pd.Series(ids % 10_000_000).astype(str).str.zfill(7)
+        if "IUC" in columnas:
+            datos["IUC"] = pd.Series(anio_num.astype(str)).radd("IUC-D-") + "-" + pd.Series(ids).astype(str)
+
+    df = pd.DataFrame({c: datos[c] for c in columnas})
+    if not categorias:
+        for c in df.columns:
+            if isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype(object).where(df[c].notna(), None)
+    return df
+
+
+def iterar_improd_sintetico(filas: int, seed: int = 0, columnas=None, categorias: bool = False, bloque: int = BLOQUE):
+    """Genera 'filas' en DataFrames de a 'bloque' filas (mismo resultado para la misma semilla)."""
+    columnas = list(columnas or COLUMNAS_IMPROD)
+    desconocidas = [c for c in columnas if c not in COLUMNAS_IMPROD]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas para IMPROD_DISCIPLINARIO: {desconocidas}")
+    rng = np.random.default_rng(seed)
+    for inicio in range(0, filas, bloque):
+        yield _bloque(rng, min(bloque, filas - inicio), inicio + 1, columnas, categorias)
+
+
+def generar_improd(filas: int, seed: int = 0, columnas=None, categorias: bool = False) -> pd.DataFrame:
+    """
+    DataFrame sintético con el esquema de cargar_improd.
+    - 'columnas': subconjunto de COLUMNAS_IMPROD (p. ej. COLUMNAS_REPORTE para tamaños grandes).
+    - 'categorias': dimensiones como category (mucho menos memoria); si no, texto como en la BD.
+    """
+    bloques = list(iterar_improd_sintetico(filas, seed, columnas, categorias))
+    if len(bloques) == 1:
+        return bloques[0]
+    return pd.concat(bloques, ignore_index=True)
+
+
+def escribir_sqlite(bloques, ruta, tabla: str = "IMPROD_DISCIPLINARIO") -> int:
+    """
+    Base SQLite que reemplaza a [EXT].[IMPROD_DISCIPLINARIO] para probar las consultas
+    con DB_URL=sqlite:///<ruta> (ver config.db_config). Reemplaza la tabla si existe.
+    """
+    import sqlite3
+    filas = 0
+    with sqlite3.connect(ruta) as con:
+        for i, b in enumerate(bloques):
+            b.to_sql(tabla, con, if_exists="replace" if i == 0 else "append", index=False, chunksize=100_000)
+            filas += len(b)
+    return filas
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", default="data/sample_improd.csv", help=".csv, .parquet o .sqlite")
+    parser.add_argument("--solo-reporte", action="store_true", help="solo COLUMNAS_REPORTE")
+    args = parser.parse_args()
+
+    columnas = COLUMNAS_REPORTE if args.solo_reporte else COLUMNAS_IMPROD
+    ruta = Path(args.salida)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    bloques = iterar_improd_sintetico(args.filas, args.seed, columnas)
+    if ruta.suffix in (".sqlite", ".db"):
+        escribir_sqlite(bloques, ruta)
+    elif ruta.suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        escritor = None
+        for b in bloques:
+            tabla = pa.Table.from_pandas(b, preserve_index=False)
+            escritor = escritor or pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+        if escritor:
+            escritor.close()
+    else:
+        for i, b in enumerate(bloques):
+            b.to_csv(ruta, mode="w" if i == 0 else "a", header=i == 0, index=False, encoding="utf-8-sig" if i == 0 else "utf-8")
+    print(f"{args.filas:,} filas en {ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# benchmarks/importtime.py
+"""
+Control de regresión del tiempo de arranque.
+
+Para cada módulo del proyecto:
+- mide el tiempo acumulado de importación con `python -X importtime` (en un
+  proceso nuevo, sin caché de módulos) y lo compara con su presupuesto;
+- verifica que importar el módulo NO cargue dependencias pesadas
+  (pandas, numpy, python-docx, openai, sqlalchemy, pyarrow, dotenv):
+  estas se importan dentro de las funciones que las usan.
+
+Uso (desde la raíz del repo):
+    python benchmarks/importtime.py            # termina con código 1 si hay regresión
+    python benchmarks/importtime.py --repeticiones 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# Presupuesto (ms) del tiempo acumulado de importación de cada módulo
+PRESUPUESTOS_MS = {
+    "config.db_config": 30,
+    "config.openai_config": 60,
+    "config.openai_cache": 30,
+    "config.trazas": 20,
+    "src.utils": 30,
+    "src.docx_utils": 30,
+    "src.prompt_payloads": 40,
+    "src.tabla_niveldep": 20,
+    "src.tabla_top": 20,
+    "src.cubo_improd": 20,
+    "src.formato_tablas": 20,
+    "src.tabla_reporte": 30,
+    "src.compactar_payload": 30,
+    "src.informe": 40,
+    "src.lote_informes": 60,
+    "src.servicio_informes": 80,
+    "prompts.loader": 25,
+    "tables.consultas_sql": 40,
+    "tables.snapshot_improd": 40,
+    "tables.esquema_improd": 20,
+    "tables.consultas_duckdb": 40,
+    "tables.conteos_incrementales": 30,
+}
+
+PESADOS = ["pandas", "numpy", "docx", "openai", "sqlalchemy", "pyarrow", "dotenv", "duckdb"]
+
+
+def _entorno() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), env.get("PYTHONPATH")]))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def medir_importtime(modulo: str) -> float:
+    """Tiempo acumulado (ms) de 'import modulo' según -X importtime."""
+    r = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=_entorno(), capture_output=True, text=True,
+    )
+    if r.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{r.stderr}")
+    # Formato: "import time: self [us] | cumulative | imported package"
+    for linea in reversed(r.stderr.splitlines()):
+        partes = [p.strip() for p in linea.split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            return int(partes[1]) / 1000
+    raise RuntimeError(f"-X importtime no reportó {modulo}")
+
+
+def pesados_cargados(modulo: str) -> list:
+    """Dependencias pesadas presentes en sys.modules tras importar 'modulo'."""
+    codigo = (
+        f"import json, sys, {modulo}; "
+        f"print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))"
+    )
+    r = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=_entorno(), capture_output=True, text=True,
+    )
+    if r.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{r.stderr}")
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3, help="mediciones por módulo (se toma la mínima)")
+    args = parser.parse_args()
+
+    fallas = 0
+    print(f"{'módulo':<30}{'ms':>8}{'límite':>8}  pesados")
+    for modulo, limite in PRESUPUESTOS_MS.items():
+        ms = min(medir_importtime(modulo) for _ in range(max(1, args.repeticiones)))
+        pesados = pesados_cargados(modulo)
+        ok = ms <= limite and not pesados
+        fallas += not ok
+        print(f"{modulo:<30}{ms:>8.1f}{limite:>8}  {', '.join(pesados) or '-'}{'' if ok else '   <-- REGRESIÓN'}")
+
+    if fallas:
+        print(f"\n{fallas} módulo(s) fuera de presupuesto.")
+        return 1
+    print("\nArranque dentro del presupuesto.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# benchmarks/lectura_particionada.py
+"""
+Extracción completa en una consulta (cargar_improd) vs. lectura por particiones en paralelo
+(cargar_improd_particionado, por ANIO_PGN y por rangos de ID_CASO).
+
+Usa una BD SQLite local con datos sintéticos mediante DB_URL (mismo esquema que
+[EXT].[IMPROD_DISCIPLINARIO]) y el pool configurado por DB_POOL_*. Verifica que las
+filas y los tipos sean idénticos (ordenando por ID_CASO) y termina con código 1 si no.
+Contra SQL Server basta con no definir DB_URL (y usar --sin-bd-local).
+
+Uso (desde la raíz del repo):
+    python benchmarks/lectura_particionada.py
+    python benchmarks/lectura_particionada.py --filas 2000000 --particiones 8 --hilos 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.datos_sinteticos import escribir_sqlite, iterar_improd_sintetico
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bd", help="ruta del SQLite (por defecto, temporal)")
+    parser.add_argument("--sin-bd-local", action="store_true", help="usa la BD configurada en .env")
+    parser.add_argument("--particiones", type=int, help="rangos de ID_CASO (por defecto, DB_POOL_SIZE)")
+    parser.add_argument("--hilos", type=int, help="lecturas simultáneas (por defecto, DB_POOL_SIZE)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.sin_bd_local:
+            ruta = Path(args.bd or Path(tmp) / "improd.sqlite")
+            t0 = time.perf_counter()
+            escribir_sqlite(iterar_improd_sintetico(args.filas, args.seed), ruta)
+            print(f"BD local: {args.filas:,} filas en {ruta} ({time.perf_counter() - t0:.1f} s)")
+            os.environ["DB_URL"] = f"sqlite:///{ruta}"
+
+        from config.db_config import get_engine, opciones_pool
+        from tables.consultas_sql import cargar_improd_particionado, cargar_improd
+
+        print(f"Pool: {opciones_pool()}")
+        t0 = time.perf_counter()
+        base = cargar_improd(particionar_por="")
+        t_base = time.perf_counter() - t0
+        base = base.sort_values("ID_CASO", kind="stable").reset_index(drop=True)
+
+        print(f"{'lectura':<28}{'filas':>12}{'tiempo (s)':>12}{'idénticas':>12}")
+        print(f"{'una consulta':<28}{len(base):>12,}{t_base:>12.3f}{'-':>12}")
+        ok = True
+        for por in ("ANIO_PGN", "ID_CASO"):
+            t0 = time.perf_counter()
+            df = cargar_improd_particionado(por=por, particiones=args.particiones, hilos=args.hilos)
+            segundos = time.perf_counter() - t0
+            df = df.sort_values("ID_CASO", kind="stable").reset_index(drop=True)
+            iguales = df.equals(base) and (df.dtypes == base.dtypes).all()
+            ok = ok and iguales
+            print(f"{'particionada por ' + por:<28}{len(df):>12,}{segundos:>12.3f}{'sí' if iguales else 'NO':>12}")
+
+        if not args.sin_bd_local and not args.bd:
+            get_engine().dispose()  # libera el archivo antes de borrar el temporal
+        return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
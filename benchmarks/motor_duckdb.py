@@ -0,0 +1,118 @@
+# benchmarks/motor_duckdb.py
+"""
+Paridad y rendimiento de los motores del cubo (src.cubo_improd.MOTORES): pandas vs. DuckDB.
+
+Escribe datos sintéticos (datos_sinteticos.py) en CSV y Parquet, arma el cubo con cada
+motor y verifica que los conteos, las tablas del informe (nivel/dependencia y top de
+dependencias) y los payloads del prompt sean idénticos. Con --memoria se limita la
+memoria de DuckDB para forzar el volcado a disco (--dir-temporal).
+Termina con código 1 si algún motor difiere.
+
+Uso (desde la raíz del repo):
+    python benchmarks/motor_duckdb.py
+    python benchmarks/motor_duckdb.py --filas 5000000 --formatos parquet --memoria 256MB
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.datos_sinteticos import iterar_improd_sintetico
+from src.cubo_improd import MOTORES, cubo_desde_archivo
+from src.prompt_payloads import construir_payload_resumen, construir_payload_top_dependencias
+from src.tabla_niveldep import construir_tabla1
+from src.tabla_reporte import TablaReporte
+from src.tabla_top import construir_tabla_top_dependencias
+from tables.consultas_sql import COLUMNAS_REPORTE
+
+FILTROS = ("disciplinarios", "quejas")
+
+
+def escribir(ruta: Path, filas: int, seed: int):
+    bloques = iterar_improd_sintetico(filas, seed, COLUMNAS_REPORTE)
+    if ruta.suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        escritor = None
+        for b in bloques:
+            tabla = pa.Table.from_pandas(b, preserve_index=False)
+            escritor = escritor or pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+        escritor.close()
+    else:
+        for i, b in enumerate(bloques):
+            b.to_csv(ruta, mode="w" if i == 0 else "a", header=i == 0, index=False,
+                     encoding="utf-8-sig" if i == 0 else "utf-8")
+
+
+def salidas(cubo) -> dict:
+    """Todo lo que consume el informe a partir del cubo."""
+    out = {"conteos": cubo.conteos}
+    for f in FILTROS:
+        t1 = construir_tabla1(cubo, f)
+        top = construir_tabla_top_dependencias(cubo, f)
+        out[f"tabla1_{f}"] = t1
+        out[f"top_{f}"] = top
+        out[f"payload_resumen_{f}"] = construir_payload_resumen(TablaReporte.desde_dataframe(t1, nombre=f))
+        out[f"payload_top_{f}"] = construir_payload_top_dependencias(
+            TablaReporte.desde_dataframe(top, nombre=f, decimales_pct=0, sufijo_pct="%"))
+    return out
+
+
+def diferencias(a: dict, b: dict) -> list:
+    distintas = []
+    for clave, valor in a.items():
+        otro = b[clave]
+        iguales = valor.equals(otro) and (valor.dtypes == otro.dtypes).all() if hasattr(valor, "equals") \
+            else valor == otro
+        if not iguales:
+            distintas.append(clave)
+    return distintas
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formatos", nargs="+", default=["csv", "parquet"], choices=["csv", "parquet"])
+    parser.add_argument("--memoria", help="límite de memoria de DuckDB (p. ej. 256MB)")
+    parser.add_argument("--dir-temporal", help="carpeta de volcado de DuckDB")
+    parser.add_argument("--hilos", type=int)
+    args = parser.parse_args()
+
+    opciones = {"duckdb": {"memoria": args.memoria, "dir_temporal": args.dir_temporal, "hilos": args.hilos}}
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for formato in args.formatos:
+            ruta = Path(tmp) / f"improd.{formato}"
+            t0 = time.perf_counter()
+            escribir(ruta, args.filas, args.seed)
+            print(f"\n{formato}: {args.filas:,} filas ({ruta.stat().st_size / 1e6:.0f} MB, "
+                  f"escrito en {time.perf_counter() - t0:.1f} s)")
+            print(f"{'motor':<10}{'tiempo (s)':>12}{'combinaciones':>16}")
+
+            resultados = {}
+            for motor in MOTORES:
+                t0 = time.perf_counter()
+                cubo = cubo_desde_archivo(ruta, motor, **opciones.get(motor, {}))
+                segundos = time.perf_counter() - t0
+                resultados[motor] = salidas(cubo)
+                print(f"{motor:<10}{segundos:>12.3f}{len(cubo.conteos):>16,}")
+
+            base, *otros = resultados
+            for motor in otros:
+                distintas = diferencias(resultados[base], resultados[motor])
+                if distintas:
+                    ok = False
+                    print(f"{motor} difiere de {base} en: {', '.join(distintas)}")
+                else:
+                    print(f"{motor} = {base}: conteos, tablas y payloads idénticos")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# benchmarks/pipeline.py
+"""
+Suite de rendimiento del pipeline del informe sobre datos sintéticos (ver datos_sinteticos.py).
+
+Casos por tamaño de datos:
+- cubo / tablas:  CuboImprod.desde_df, construir_tabla1, construir_tabla_top_dependencias
+- JSON y payloads: dataframe_a_json_tabla, construir_payload_resumen, construir_payload_top_dependencias
+- docx:           aplicar_placeholders (tablas + textos) e insert_dataframe_at_bookmark
+
+Para cada caso reporta el mejor tiempo de N repeticiones y el pico de memoria
+asignada (tracemalloc, en una corrida aparte para no distorsionar el tiempo).
+Con --base compara contra resultados guardados y termina con código 1 si hay regresión.
+
+Uso (desde la raíz del repo):
+    python benchmarks/pipeline.py                                   # 10k y 1M filas
+    python benchmarks/pipeline.py --filas 10000 --guardar benchmarks/base.json
+    python benchmarks/pipeline.py --filas 10000 --base benchmarks/base.json --tolerancia 0.3
+    python benchmarks/pipeline.py --filas 50000000 --categorias --casos cubo tabla1_cubo
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from docx import Document
+
+from benchmarks.datos_sinteticos import generar_improd
+from src.cubo_improd import CuboImprod
+from src.docx_utils import aplicar_placeholders, insert_dataframe_at_bookmark
+from src.prompt_payloads import construir_payload_resumen, construir_payload_top_dependencias
+from src.tabla_niveldep import construir_tabla1
+from src.tabla_reporte import TablaReporte
+from src.tabla_top import construir_tabla_top_dependencias
+from src.utils import dataframe_a_json_tabla
+from tables.consultas_sql import COLUMNAS_REPORTE
+
+PLANTILLA = "plantillas/Plantilla_Prueba.docx"
+TEXTO = "En total se registran 40.176 procesos disciplinarios activos. " * 8
+
+# Diferencias de tiempo menores a esto se consideran ruido al comparar con la base
+PISO_SEGUNDOS = 0.01
+
+
+def casos(df, plantilla: str) -> dict:
+    """{nombre: (preparar, fn)}: preparar() arma los argumentos fuera de la medición."""
+    cubo = CuboImprod.desde_df(df)
+    tabla1 = construir_tabla1(cubo)
+    top = construir_tabla_top_dependencias(cubo, "quejas")
+    rep1 = TablaReporte.desde_dataframe(tabla1, nombre="Disciplinarios TOTAL")
+    rep_top = TablaReporte.desde_dataframe(top, nombre="Top 10", decimales_pct=0, sufijo_pct="%")
+
+    def _doc():
+        doc = Document(plantilla)
+        doc.add_paragraph("<<tabla_bench>>")
+        return (doc,)
+
+    return {
+        "cubo": (lambda: (df,), CuboImprod.desde_df),
+        "tabla1_filas": (lambda: (df,), construir_tabla1),
+        "tabla1_cubo": (lambda: (cubo,), construir_tabla1),
+        "top_cubo": (lambda: (cubo, "quejas"), construir_tabla_top_dependencias),
+        "json_tabla": (lambda: (tabla1,), dataframe_a_json_tabla),
+        "payload_resumen": (lambda: (rep1,), construir_payload_resumen),
+        "payload_top": (lambda: (rep_top,), construir_payload_top_dependencias),
+        "docx_placeholders": (
+            lambda: (Document(plantilla),),
+            lambda doc: aplicar_placeholders(
+                doc,
+                textos={"<<texto_total_activos>>": TEXTO, "<<texto_top_quejas>>": TEXTO},
+                tablas={"<<tabla_total_activos>>": rep1.formateada(), "<<tabla_top_quejas>>": rep_top.formateada()},
+            ),
+        ),
+        "docx_bookmark": (_doc, lambda doc: insert_dataframe_at_bookmark(doc, rep1.formateada(), "<<tabla_bench>>")),
+    }
+
+
+def medir(preparar, fn, repeticiones: int) -> dict:
+    fn(*preparar())  # calentamiento: imports diferidos y cachés fuera de la medición
+    tiempos = []
+    for _ in range(repeticiones):
+        args = preparar()
+        t0 = time.perf_counter()
+        fn(*args)
+        tiempos.append(time.perf_counter() - t0)
+
+    args = preparar()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"segundos": min(tiempos), "pico_mb": pico / 1e6}
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list:
+    """Regresiones (tiempo o memoria) por encima de la tolerancia relativa."""
+    regresiones = []
+    for filas, res in actual.items():
+        for caso, m in res.items():
+            b = base.get(filas, {}).get(caso)
+            if not b:
+                continue
+            if m["segundos"] > b["segundos"] * (1 + tolerancia) and m["segundos"] - b["segundos"] > PISO_SEGUNDOS:
+                regresiones.append(f"{filas} filas / {caso}: {b['segundos']:.4f} -> {m['segundos']:.4f} s")
+            if m["pico_mb"] > b["pico_mb"] * (1 + tolerancia) and m["pico_mb"] - b["pico_mb"] > 1:
+                regresiones.append(f"{filas} filas / {caso}: {b['pico_mb']:.1f} -> {m['pico_mb']:.1f} MB")
+    return regresiones
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--casos", nargs="+", help="subconjunto de casos (por defecto, todos)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--categorias", action="store_true", help="dimensiones category (para 10M+ filas)")
+    parser.add_argument("--plantilla", default=PLANTILLA)
+    parser.add_argument("--guardar", help="escribe los resultados en este JSON")
+    parser.add_argument("--base", help="JSON de resultados anteriores para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    resultados = {}
+    for n in args.filas:
+        t0 = time.perf_counter()
+        df = generar_improd(n, seed=args.seed, columnas=COLUMNAS_REPORTE, categorias=args.categorias)
+        print(f"\n{n:,} filas (generadas en {time.perf_counter() - t0:.1f} s)")
+        print(f"{'caso':<20}{'tiempo (s)':>12}{'pico (MB)':>12}")
+
+        todos = casos(df, args.plantilla)
+        desconocidos = sorted(set(args.casos or []) - set(todos))
+        if desconocidos:
+            parser.error(f"casos desconocidos: {desconocidos} (disponibles: {sorted(todos)})")
+        resultados[str(n)] = {}
+        for nombre, (preparar, fn) in todos.items():
+            if args.casos and nombre not in args.casos:
+                continue
+            m = medir(preparar, fn, args.repeticiones)
+            resultados[str(n)][nombre] = m
+            print(f"{nombre:<20}{m['segundos']:>12.4f}{m['pico_mb']:>12.1f}")
+        del df, todos
+
+    if args.guardar:
+        Path(args.guardar).write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+    if args.base:
+        regresiones = comparar(resultados, json.loads(Path(args.base).read_text(encoding="utf-8")), args.tolerancia)
+        if regresiones:
+            print("\nRegresiones:")
+            for r in regresiones:
+                print(f"  {r}")
+            return 1
+        print("\nSin regresiones respecto de la base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# benchmarks/sql_pushdown.py
+"""
+Carga fila a fila (cargar_improd) vs. agregado en el servidor (cargar_conteos_improd).
+
+Arma una BD SQLite local con datos sintéticos (mismo esquema que [EXT].[IMPROD_DISCIPLINARIO]),
+la usa mediante DB_URL y get_engine(), y compara filas transferidas y tiempos de ambas rutas.
+Verifica además que las tablas del informe sean idénticas.
+
+Uso (desde la raíz del repo):
+    python benchmarks/sql_pushdown.py
+    python benchmarks/sql_pushdown.py --filas 2000000 --bd /tmp/improd.sqlite
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.datos_sinteticos import escribir_sqlite, iterar_improd_sintetico
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bd", help="ruta del SQLite (por defecto, temporal)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(args.bd or Path(tmp) / "improd.sqlite")
+        t0 = time.perf_counter()
+        escribir_sqlite(iterar_improd_sintetico(args.filas, args.seed), ruta)
+        print(f"BD local: {args.filas:,} filas en {ruta} ({time.perf_counter() - t0:.1f} s)")
+
+        os.environ["DB_URL"] = f"sqlite:///{ruta}"
+        from src.cubo_improd import CuboImprod
+        from src.tabla_niveldep import construir_tabla1
+        from src.tabla_top import construir_tabla_top_dependencias
+        from tables.consultas_sql import cargar_conteos_improd, cargar_improd
+
+        t0 = time.perf_counter()
+        filas = cargar_improd()
+        t_filas = time.perf_counter() - t0
+        cubo_filas = CuboImprod.desde_df(filas)
+
+        t0 = time.perf_counter()
+        conteos = cargar_conteos_improd()
+        t_conteos = time.perf_counter() - t0
+        cubo_conteos = CuboImprod.desde_conteos(conteos)
+
+        iguales = all(
+            construir_tabla1(cubo_filas, f).equals(construir_tabla1(cubo_conteos, f))
+            and construir_tabla_top_dependencias(cubo_filas, f).equals(construir_tabla_top_dependencias(cubo_conteos, f))
+            for f in ("disciplinarios", "quejas")
+        )
+
+        print(f"{'ruta':<24}{'filas transferidas':>20}{'tiempo (s)':>12}")
+        print(f"{'cargar_improd':<24}{len(filas):>20,}{t_filas:>12.3f}")
+        print(f"{'cargar_conteos_improd':<24}{len(conteos):>20,}{t_conteos:>12.3f}")
+        print("Tablas idénticas" if iguales else "Las tablas difieren entre rutas")
+        if not args.bd:
+            from config.db_config import get_engine
+            get_engine().dispose()  # libera el archivo antes de borrar el temporal
+        return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
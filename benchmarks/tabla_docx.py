@@ -0,0 +1,80 @@
+# benchmarks/tabla_docx.py
+"""
+Inserción de tablas en el docx: ruta celda a celda (python-docx) vs. w:tbl armado en bloque (lxml).
+
+Para cada tamaño inserta la misma tabla en la plantilla con ambas rutas,
+verifica que el contenido de las celdas sea idéntico y reporta los tiempos.
+
+Uso (desde la raíz del repo):
+    python benchmarks/tabla_docx.py
+    python benchmarks/tabla_docx.py --filas 100 1000 10000 --plantilla plantillas/Plantilla_Prueba.docx
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+
+from src.docx_utils import aplicar_placeholders
+
+MARCADOR = "<<tabla_anexo>>"
+
+
+def tabla_anexo(filas: int, seed: int = 0) -> pd.DataFrame:
+    """Tabla ya formateada (texto), con la forma de las tablas del informe."""
+    rng = np.random.default_rng(seed)
+    cols = ["HASTA 2021", "2022", "2023", "2024", "2025"]
+    datos = pd.DataFrame(rng.integers(0, 5000, size=(filas, len(cols))), columns=cols)
+    datos["Total general"] = datos.sum(axis=1)
+    datos = datos.map(lambda v: f"{v:,}".replace(",", "."))
+    datos["%"] = [f"{x:.2f}".replace(".", ",") for x in rng.random(filas) * 100]
+    datos.index = pd.Index([f"Dependencia {i}" for i in range(filas)], name="DEPENDENCIAS")
+    return datos
+
+
+def _documento(plantilla):
+    doc = Document(plantilla) if plantilla else Document()
+    doc.add_paragraph(MARCADOR)
+    return doc
+
+
+def _celdas(doc):
+    tbl = next(doc.element.body.iter(qn("w:tbl")))
+    return [[c.text for c in fila.cells] for fila in Table(tbl, doc._body).rows]
+
+
+def medir(df: pd.DataFrame, plantilla, tabla_rapida: bool):
+    doc = _documento(plantilla)
+    t0 = time.perf_counter()
+    aplicar_placeholders(doc, tablas={MARCADOR: df}, tabla_rapida=tabla_rapida)
+    return time.perf_counter() - t0, doc
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--plantilla", default="plantillas/Plantilla_Prueba.docx")
+    args = parser.parse_args()
+
+    print(f"{'filas':>8}{'celdas (s)':>14}{'bloque (s)':>14}{'x':>8}")
+    for n in args.filas:
+        df = tabla_anexo(n)
+        t_celdas, doc_celdas = medir(df, args.plantilla, tabla_rapida=False)
+        t_bloque, doc_bloque = medir(df, args.plantilla, tabla_rapida=True)
+        if _celdas(doc_celdas) != _celdas(doc_bloque):
+            print(f"{n:>8}  contenido distinto entre rutas")
+            return 1
+        print(f"{n:>8}{t_celdas:>14.3f}{t_bloque:>14.3f}{t_celdas / t_bloque:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
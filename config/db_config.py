@@ -1,24 +1,89 @@
 # config/db_config.py
 import os
 from urllib.parse import quote_plus
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
 
-# Cargar variables desde .env (en la raíz del proyecto)
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-load_dotenv(os.path.join(BASE_DIR, ".env"))
 
 _engine = None  # lazy singleton
+_env_cargado = False
+
+
+def _cargar_env():
+    """Carga variables desde .env (en la raíz del proyecto) en el primer uso, no al importar."""
+    global _env_cargado
+    if not _env_cargado:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(BASE_DIR, ".env"))
+        _env_cargado = True
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    valor = os.getenv(nombre, "").strip()
+    if not valor:
+        return defecto
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"{nombre} debe ser un entero (valor actual: {valor!r}).") from None
+
+
+def opciones_pool() -> dict:
+    """
+    Parámetros del pool de conexiones (variables de entorno, con valores por defecto):
+    - DB_POOL_SIZE (5): conexiones abiertas que se mantienen; también es el número de
+      particiones que se leen a la vez en cargar_improd_particionado.
+    - DB_MAX_OVERFLOW (5): conexiones extra en picos.
+    - DB_POOL_TIMEOUT (30): segundos esperando una conexión libre.
+    - DB_POOL_RECYCLE (1800): segundos antes de reabrir una conexión (cortes del servidor / firewall).
+    - DB_POOL_PRE_PING (1): verifica la conexión antes de usarla.
+    """
+    _cargar_env()
+    return {
+        "pool_size": _entero_env("DB_POOL_SIZE", 5),
+        "max_overflow": _entero_env("DB_MAX_OVERFLOW", 5),
+        "pool_timeout": _entero_env("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _entero_env("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1").strip() != "0",
+    }
+
+
+def _engine_desde_url(url: str):
+    """
+    Engine alterno definido por DB_URL (p. ej. sqlite:///data/improd.sqlite) para probar
+    las consultas sin SQL Server. En SQLite la misma base se adjunta como EXT, así
+    [EXT].[IMPROD_DISCIPLINARIO] resuelve igual que en el servidor.
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.engine import make_url
+    en_memoria = make_url(url).database in (None, "", ":memory:")
+    # SQLite en memoria usa un pool de una conexión por hilo: no admite tamaño de pool
+    engine = create_engine(url) if en_memoria else create_engine(url, **opciones_pool())
+    if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        ruta = engine.url.database
+
+        @event.listens_for(engine, "connect")
+        def _adjuntar_ext(dbapi_con, _):
+            dbapi_con.execute("ATTACH DATABASE ? AS EXT", (ruta,))
+    return engine
+
 
 def get_engine():
     """
     Crea y retorna el engine SOLO cuando se necesita (USE_DB=1).
     Así el proyecto puede correr en modo demo sin BD.
+    Si DB_URL está definida se usa esa URL en lugar de SQL Server (ver _engine_desde_url).
+    El pool de conexiones se configura con las variables DB_POOL_* (ver opciones_pool).
     """
     global _engine
     if _engine is not None:
         return _engine
 
+    from sqlalchemy import create_engine
+    _cargar_env()
+    url = os.getenv("DB_URL")
+    if url:
+        _engine = _engine_desde_url(url)
+        return _engine
     server   = os.getenv("DB_SERVER")
     database = os.getenv("DB_NAME")
     username = os.getenv("DB_USER")
@@ -37,20 +102,26 @@ def get_engine():
         f"?driver={driver_q}&Encrypt=yes&TrustServerCertificate=no&Connection Timeout=30"
     )
 
-    _engine = create_engine(conn_url, fast_executemany=True)
+    _engine = create_engine(conn_url, fast_executemany=True, **opciones_pool())
     return _engine
 
 
 def run_query(sql: str):
     """Ejecuta una consulta SQL y devuelve un DataFrame."""
     import pandas as pd
-    engine = get_engine()
-    with engine.connect() as conn:
-        return pd.read_sql(text(sql), conn)
+    from sqlalchemy import text
+    from config.trazas import span
+    with span("sql.run_query") as s:
+        engine = get_engine()
+        with engine.connect() as conn:
+            df = pd.read_sql(text(sql), conn)
+        s.anotar(filas=len(df))
+        return df
 
 
 def test_connection():
     """Prueba de conexión a la base de datos (usar manualmente, NO en flujo demo)."""
+    from sqlalchemy import text
     try:
         engine = get_engine()
         with engine.begin() as con:
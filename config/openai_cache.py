@@ -0,0 +1,109 @@
+# config/openai_cache.py
+"""
+Caché persistente (SQLite) de respuestas de Azure OpenAI.
+
+La clave es un hash SHA-256 de (deployment, system prompt, prompt de usuario ya
+renderizado, temperature, top_p, max_tokens): si los datos del informe no cambian,
+el prompt tampoco, y la narrativa se reutiliza sin llamar al modelo.
+- Desalojo por antigüedad (max_edad_dias) y por tamaño (max_entradas / max_bytes, LRU).
+- Nunca se guardan respuestas de error ('[Error OpenAI] ...').
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+PREFIJO_ERROR = "[Error OpenAI]"
+
+
+class CacheRespuestas:
+    def __init__(
+        self,
+        ruta: str = ".cache/openai_respuestas.sqlite",
+        max_entradas: int = 5000,
+        max_bytes: int = 50 * 1024 * 1024,
+        max_edad_dias: float = 30,
+    ):
+        self.ruta = Path(ruta)
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.max_edad_seg = max_edad_dias * 86400
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            con.execute(
+                """CREATE TABLE IF NOT EXISTS respuestas (
+                       clave      TEXT PRIMARY KEY,
+                       texto      TEXT NOT NULL,
+                       bytes      INTEGER NOT NULL,
+                       creado     REAL NOT NULL,
+                       ultimo_uso REAL NOT NULL
+                   )"""
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_respuestas_uso ON respuestas (ultimo_uso)")
+
+    @contextmanager
+    def _conectar(self):
+        # Una conexión por operación: segura entre hilos y procesos
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:  # commit / rollback
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def clave(deployment, system: str, prompt: str, temperature, top_p, max_tokens) -> str:
+        base = json.dumps(
+            [deployment, system, prompt, temperature, top_p, max_tokens],
+            ensure_ascii=False, separators=(",", ":"),
+        )
+        return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave: str) -> Optional[str]:
+        """Devuelve la respuesta guardada o None (ausente o vencida)."""
+        ahora = time.time()
+        with self._conectar() as con:
+            fila = con.execute("SELECT texto, creado FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            texto, creado = fila
+            if ahora - creado > self.max_edad_seg:
+                con.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                return None
+            con.execute("UPDATE respuestas SET ultimo_uso = ? WHERE clave = ?", (ahora, clave))
+            return texto
+
+    def guardar(self, clave: str, texto: str) -> bool:
+        """Guarda la respuesta (salvo vacía o de error) y aplica el desalojo. True si se guardó."""
+        if not texto or texto.startswith(PREFIJO_ERROR):
+            return False
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, texto, bytes, creado, ultimo_uso) VALUES (?, ?, ?, ?, ?)",
+                (clave, texto, len(texto.encode("utf-8")), ahora, ahora),
+            )
+            self._desalojar(con, ahora)
+        return True
+
+    def _desalojar(self, con, ahora: float):
+        con.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.max_edad_seg,))
+        n, total = con.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()
+        if n <= self.max_entradas and total <= self.max_bytes:
+            return
+        # LRU: se eliminan las menos usadas hasta volver a los límites
+        acumulado, sobrantes = 0, []
+        filas = con.execute("SELECT clave, bytes FROM respuestas ORDER BY ultimo_uso DESC").fetchall()
+        for i, (clave, b) in enumerate(filas):
+            acumulado += b
+            if i >= self.max_entradas or acumulado > self.max_bytes:
+                sobrantes.append((clave,))
+        con.executemany("DELETE FROM respuestas WHERE clave = ?", sobrantes)
+
+    def limpiar(self):
+        with self._conectar() as con:
+            con.execute("DELETE FROM respuestas")
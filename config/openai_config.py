@@ -1,10 +1,20 @@
 import os
-from typing import Optional
-from dotenv import load_dotenv, find_dotenv
-from openai import AzureOpenAI
+import math
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Sequence, List, TYPE_CHECKING
 
-# Cargar .env de forma robusta (independiente del cwd)
-load_dotenv(find_dotenv(), override=True)
+from config.trazas import span
+
+if TYPE_CHECKING:
+    from openai import AzureOpenAI, AsyncAzureOpenAI
+    from config.openai_cache import CacheRespuestas
+
+# Arranque liviano: el .env, el SDK de openai (~0,7 s de import) y los clientes
+# se cargan en el primer uso, no al importar el módulo.
 
 def _clean(x: Optional[str]) -> str:
     """Limpia comentarios inline y comillas accidentales en variables .env."""
@@ -15,18 +25,421 @@ def _clean(x: Optional[str]) -> str:
         x = x[1:-1].strip()
     return x
 
-# Lee variables
-_AZ_ENDPOINT  = os.getenv("AZURE_OPENAI_ENDPOINT")
-_AZ_API_KEY   = os.getenv("AZURE_OPENAI_API_KEY")
-_AZ_API_VER   = os.getenv("AZURE_OPENAI_API_VERSION") or "2024-02-15-preview"
-_AZ_DEPLOY    = os.getenv("AZURE_OPENAI_MODEL")
 
-# Cliente
-_client = AzureOpenAI(
-    azure_endpoint=_AZ_ENDPOINT,
-    api_key=_AZ_API_KEY,
-    api_version=_AZ_API_VER,
-)
+@dataclass(frozen=True)
+class _ConfigAzure:
+    endpoint: Optional[str]
+    api_key: Optional[str]
+    api_version: str
+    deployment: Optional[str]
+
+
+_conf: Optional[_ConfigAzure] = None
+
+def _config() -> _ConfigAzure:
+    """Lee el .env (una sola vez, independiente del cwd) y las variables de Azure OpenAI."""
+    global _conf
+    if _conf is None:
+        from dotenv import load_dotenv, find_dotenv
+        load_dotenv(find_dotenv(), override=True)
+        _conf = _ConfigAzure(
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION") or "2024-02-15-preview",
+            deployment=os.getenv("AZURE_OPENAI_MODEL"),
+        )
+    return _conf
+
+
+def modelo_por_defecto() -> Optional[str]:
+    """Deployment que usan los llamados sin 'model' explícito (AZURE_OPENAI_MODEL)."""
+    return _config().deployment
+
+
+# Cliente síncrono: se crea en el primer llamado y se reutiliza
+# (los reintentos los gestiona el planificador, no el SDK)
+_client = None
+_client_lock = threading.Lock()
+
+def _get_client() -> "AzureOpenAI":
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AzureOpenAI
+                c = _config()
+                _client = AzureOpenAI(
+                    azure_endpoint=c.endpoint,
+                    api_key=c.api_key,
+                    api_version=c.api_version,
+                    max_retries=0,
+                )
+    return _client
+
+
+# Cliente asíncrono: uno por event loop (httpx no permite compartir conexiones entre loops).
+# Se indexa por loop sin retenerlo (WeakKeyDictionary): loops de distintos hilos no se pisan,
+# y el cliente de cada loop se cierra con cerrar_cliente_async antes de que el loop termine.
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+def _get_async_client() -> "AsyncAzureOpenAI":
+    import asyncio
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        cliente = _async_clients.get(loop)
+        if cliente is None:
+            from openai import AsyncAzureOpenAI
+            c = _config()
+            cliente = _async_clients[loop] = AsyncAzureOpenAI(
+                azure_endpoint=c.endpoint,
+                api_key=c.api_key,
+                api_version=c.api_version,
+                max_retries=0,
+            )
+    return cliente
+
+
+async def cerrar_cliente_async():
+    """Cierra el cliente asíncrono del loop actual (libera su pool httpx); el próximo llamado crea otro."""
+    import asyncio
+    with _async_lock:
+        cliente = _async_clients.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.close()
+
+
+# ---------------------------------------------------------------------------
+# Errores tipados
+# ---------------------------------------------------------------------------
+
+class ErrorOpenAI(Exception):
+    """Error de un llamado a Azure OpenAI (nunca se devuelve como texto del informe)."""
+
+    def __init__(self, mensaje: str, reintentos: int = 0):
+        super().__init__(mensaje)
+        self.reintentos = reintentos
+
+
+class ErrorConfiguracionOpenAI(ErrorOpenAI):
+    """Faltan variables de entorno (endpoint, key o deployment)."""
+
+
+class ErrorCuotaOpenAI(ErrorOpenAI):
+    """429 persistente: se agotaron los reintentos por cuota del deployment."""
+
+
+class ErrorTransitorioOpenAI(ErrorOpenAI):
+    """Timeout, error de conexión o 5xx persistente tras los reintentos."""
+
+
+class ErrorRespuestaOpenAI(ErrorOpenAI):
+    """Error no reintentable (petición inválida, autenticación, filtro de contenido...)."""
+
+
+def _contexto(model: Optional[str]) -> str:
+    # Información útil sin exponer la key
+    c = _config()
+    return f"endpoint={c.endpoint} | version={c.api_version} | model={model or c.deployment}"
+
+
+# ---------------------------------------------------------------------------
+# Planificador: presupuesto RPM/TPM (token buckets) + reintentos con backoff
+# ---------------------------------------------------------------------------
+
+def estimar_tokens(*textos: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token + sobrecosto por mensaje)."""
+    return sum(math.ceil(len(t or "") / 4) + 4 for t in textos)
+
+
+class _CuboTokens:
+    """Token bucket que se recarga de forma continua hasta 'capacidad' unidades por minuto."""
+
+    def __init__(self, capacidad_por_minuto: float):
+        self.capacidad = float(capacidad_por_minuto)
+        self.tasa = self.capacidad / 60.0
+        self.disponibles = self.capacidad
+        self.t = time.monotonic()
+
+    def espera(self, n: float) -> float:
+        """Segundos que faltan para disponer de 'n' unidades (0 si ya están)."""
+        ahora = time.monotonic()
+        self.disponibles = min(self.capacidad, self.disponibles + (ahora - self.t) * self.tasa)
+        self.t = ahora
+        n = min(n, self.capacidad)  # una petición mayor que el cubo no debe bloquear para siempre
+        return 0.0 if self.disponibles >= n else (n - self.disponibles) / self.tasa
+
+    def consumir(self, n: float):
+        self.disponibles -= min(n, self.capacidad)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """Lee Retry-After / retry-after-ms de la respuesta HTTP, si existe."""
+    from email.utils import parsedate_to_datetime
+    respuesta = getattr(e, "response", None)
+    headers = getattr(respuesta, "headers", None) or {}
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    valor = headers.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _clasificar(e: Exception):
+    """Clase de ErrorOpenAI que corresponde a la excepción y si se puede reintentar."""
+    import openai
+    if isinstance(e, openai.RateLimitError):
+        return ErrorCuotaOpenAI, True
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return ErrorTransitorioOpenAI, True
+    if isinstance(e, openai.APIStatusError):
+        codigo = getattr(e, "status_code", 0) or 0
+        if codigo == 429:
+            return ErrorCuotaOpenAI, True
+        if codigo in (408, 409) or codigo >= 500:
+            return ErrorTransitorioOpenAI, True
+    return ErrorRespuestaOpenAI, False
+
+
+class PlanificadorOpenAI:
+    """
+    Controla el ritmo de los llamados del proceso:
+    - rpm / tpm: presupuestos por minuto (None = sin límite del lado del cliente).
+      Cada llamado reserva 1 request y (tokens estimados del prompt + max_tokens).
+    - Reintenta 429 y fallos transitorios con backoff exponencial con jitter,
+      respetando Retry-After; al agotar los reintentos lanza un ErrorOpenAI tipado.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_reintentos: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self._rpm = _CuboTokens(rpm) if rpm else None
+        self._tpm = _CuboTokens(tpm) if tpm else None
+        self.max_reintentos = max_reintentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+
+    def _intentar_reserva(self, tokens: int) -> float:
+        with self._lock:
+            espera = max(
+                self._rpm.espera(1) if self._rpm else 0.0,
+                self._tpm.espera(tokens) if self._tpm else 0.0,
+            )
+            if espera == 0.0:
+                if self._rpm:
+                    self._rpm.consumir(1)
+                if self._tpm:
+                    self._tpm.consumir(tokens)
+            return espera
+
+    def reservar(self, tokens: int):
+        while (espera := self._intentar_reserva(tokens)) > 0:
+            time.sleep(espera)
+
+    async def reservar_async(self, tokens: int):
+        import asyncio
+        while (espera := self._intentar_reserva(tokens)) > 0:
+            await asyncio.sleep(espera)
+
+    def _backoff(self, intento: int, e: Exception) -> float:
+        jitter = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+        ra = _retry_after(e)
+        return max(ra, jitter) if ra is not None else jitter
+
+    def _decidir(self, e: Exception, intento: int, contexto: str):
+        """Devuelve los segundos a esperar antes de reintentar, o lanza el error tipado."""
+        clase, reintentable = _clasificar(e)
+        if not reintentable or intento >= self.max_reintentos:
+            raise clase(f"{contexto} | {e}", reintentos=intento) from e
+        return self._backoff(intento, e)
+
+    def ejecutar(self, llamado, tokens: int, contexto: str = ""):
+        for intento in range(self.max_reintentos + 1):
+            self.reservar(tokens)
+            try:
+                return llamado(), intento
+            except Exception as e:
+                time.sleep(self._decidir(e, intento, contexto))
+
+    async def ejecutar_async(self, llamado, tokens: int, contexto: str = ""):
+        import asyncio
+        for intento in range(self.max_reintentos + 1):
+            await self.reservar_async(tokens)
+            try:
+                return await llamado(), intento
+            except Exception as e:
+                await asyncio.sleep(self._decidir(e, intento, contexto))
+
+
+_planificador = None
+
+def _planificador_desde_env(partes: int = 1) -> PlanificadorOpenAI:
+    partes = max(1, int(partes))
+    return PlanificadorOpenAI(
+        rpm=float(_clean(os.getenv("AZURE_OPENAI_RPM")) or 0) / partes or None,
+        tpm=float(_clean(os.getenv("AZURE_OPENAI_TPM")) or 0) / partes or None,
+        max_reintentos=int(_clean(os.getenv("AZURE_OPENAI_MAX_REINTENTOS")) or 5),
+    )
+
+
+def _get_planificador() -> PlanificadorOpenAI:
+    """Planificador compartido por el proceso (AZURE_OPENAI_RPM / _TPM / _MAX_REINTENTOS)."""
+    global _planificador
+    if _planificador is None:
+        _planificador = _planificador_desde_env()
+    return _planificador
+
+
+def repartir_presupuesto(partes: int):
+    """
+    Este proceso usa 1/'partes' del presupuesto RPM/TPM. Para pools de procesos:
+    cada worker tiene su propio planificador y, sin repartir, entre todos superarían
+    la cuota del deployment.
+    """
+    global _planificador
+    _config()  # el presupuesto puede venir del .env
+    _planificador = _planificador_desde_env(partes)
+
+
+# ---------------------------------------------------------------------------
+# Caché de respuestas (OPENAI_CACHE=0 la desactiva)
+# ---------------------------------------------------------------------------
+
+_cache_respuestas = None
+_cache_lock = threading.Lock()
+
+def _get_cache() -> Optional["CacheRespuestas"]:
+    global _cache_respuestas
+    _config()  # asegura que el .env esté cargado
+    if _clean(os.getenv("OPENAI_CACHE", "1")) == "0":
+        return None
+    if _cache_respuestas is None:
+        with _cache_lock:
+            if _cache_respuestas is None:
+                from config.openai_cache import CacheRespuestas
+                _cache_respuestas = CacheRespuestas(
+                    ruta=_clean(os.getenv("OPENAI_CACHE_PATH")) or ".cache/openai_respuestas.sqlite",
+                    max_entradas=int(_clean(os.getenv("OPENAI_CACHE_MAX_ENTRADAS")) or 5000),
+                    max_edad_dias=float(_clean(os.getenv("OPENAI_CACHE_MAX_DIAS")) or 30),
+                )
+    return _cache_respuestas
+
+
+def _preparar(Role_system: str, Prompt: str, model: Optional[str]):
+    """Valida configuración y arma (deployment, messages)."""
+    c = _config()
+    mdl = model or c.deployment
+    if not (mdl and c.endpoint and c.api_key):
+        raise ErrorConfiguracionOpenAI(
+            "Faltan variables en .env (AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_API_KEY / AZURE_OPENAI_MODEL)."
+        )
+    messages = [
+        {"role": "system", "content": Role_system},
+        {"role": "user",   "content": Prompt},
+    ]
+    return mdl, messages
+
+
+def _clave_cache(mdl, Role_system, Prompt, max_tokens, temperature, top_p, usar_cache, refrescar_cache):
+    """(cache, clave, respuesta_guardada) según los switches usar_cache / refrescar_cache."""
+    cache = _get_cache() if usar_cache else None
+    if cache is None:
+        return None, None, None
+    clave = cache.clave(mdl, Role_system, Prompt, temperature, top_p, max_tokens)
+    guardada = None if refrescar_cache else cache.obtener(clave)
+    return cache, clave, guardada
+
+
+def _texto(completion) -> str:
+    return (completion.choices[0].message.content or "").strip()
+
+
+@dataclass
+class UsoTokens:
+    """Tokens de prompt estimados (antes de enviar) vs. reales (completion.usage)."""
+    prompt_estimados: int
+    prompt_reales: Optional[int] = None      # None si la respuesta vino de la caché
+    completion_reales: Optional[int] = None
+    desde_cache: bool = False
+    reintentos: int = 0
+
+
+@dataclass
+class RespuestaOpenAI:
+    texto: str
+    uso: UsoTokens
+
+
+def _uso(completion, estimados: int, reintentos: int = 0) -> UsoTokens:
+    usage = getattr(completion, "usage", None)
+    return UsoTokens(
+        prompt_estimados=estimados,
+        prompt_reales=getattr(usage, "prompt_tokens", None),
+        completion_reales=getattr(usage, "completion_tokens", None),
+        reintentos=reintentos,
+    )
+
+
+def _anotar(s, mdl: str, uso: UsoTokens):
+    """Atributos del span 'openai.response' (ver config.trazas)."""
+    s.anotar(
+        modelo=mdl,
+        prompt_estimados=uso.prompt_estimados,
+        prompt_tokens=uso.prompt_reales,
+        completion_tokens=uso.completion_reales,
+        reintentos=uso.reintentos,
+        desde_cache=uso.desde_cache,
+    )
+
+
+def openai_response_detallada(
+    Role_system: str,
+    Prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
+) -> RespuestaOpenAI:
+    """Igual que openai_response, pero devuelve también el uso de tokens (estimado vs. real)."""
+    with span("openai.response", max_tokens=max_tokens) as s:
+        mdl, messages = _preparar(Role_system, Prompt, model)
+        estimados = estimar_tokens(Role_system, Prompt)
+        cache, clave, guardada = _clave_cache(mdl, Role_system, Prompt, max_tokens, temperature, top_p,
+                                              usar_cache, refrescar_cache)
+        if guardada is not None:
+            r = RespuestaOpenAI(guardada, UsoTokens(estimados, desde_cache=True))
+        else:
+            completion, reintentos = _get_planificador().ejecutar(
+                lambda: _get_client().chat.completions.create(
+                    model=mdl,  # deployment name
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=top_p,
+                ),
+                tokens=estimados + max_tokens,
+                contexto=_contexto(model),
+            )
+            texto = _texto(completion)
+            if cache is not None:
+                cache.guardar(clave, texto)
+            r = RespuestaOpenAI(texto, _uso(completion, estimados, reintentos))
+        _anotar(s, mdl, r.uso)
+        return r
+
 
 def openai_response(
     Role_system: str,
@@ -35,33 +448,344 @@ def openai_response(
     max_tokens: int = 500,
     temperature: float = 0.2,
     top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
 ) -> str:
     """
     Llamado básico a Azure OpenAI (chat.completions), leyendo credenciales/endpoint del .env.
     - 'model' por defecto usa AZURE_OPENAI_MODEL (deployment name).
+    - Las respuestas se guardan en caché local (ver config.openai_cache):
+      usar_cache=False la omite; refrescar_cache=True fuerza un llamado nuevo y la actualiza.
+    - Pasa por el planificador (RPM/TPM, reintentos con backoff). Si el llamado no
+      se logra, lanza ErrorOpenAI (ErrorCuotaOpenAI, ErrorTransitorioOpenAI, ...).
+    - Para conocer los tokens usados, ver openai_response_detallada.
     """
-    try:
-        mdl = model or _AZ_DEPLOY
-        if not (mdl and _AZ_ENDPOINT and _AZ_API_KEY):
-            return "[Error OpenAI] Faltan variables en .env (AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_API_KEY / AZURE_OPENAI_MODEL)."
-
-        messages = [
-            {"role": "system", "content": Role_system},
-            {"role": "user",   "content": Prompt},
-        ]
-
-        completion = _client.chat.completions.create(
-            model=mdl,  # deployment name
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            top_p=top_p,
+    return openai_response_detallada(
+        Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache
+    ).texto
+
+
+async def openai_response_detallada_async(
+    Role_system: str,
+    Prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
+) -> RespuestaOpenAI:
+    """Igual que openai_response_detallada pero sin bloquear (AsyncAzureOpenAI)."""
+    import asyncio
+    with span("openai.response", max_tokens=max_tokens) as s:
+        mdl, messages = _preparar(Role_system, Prompt, model)
+        estimados = estimar_tokens(Role_system, Prompt)
+        # La caché es SQLite (lecturas, desalojo, VACUUM): en un hilo, sin frenar el event loop
+        cache, clave, guardada = await asyncio.to_thread(
+            _clave_cache, mdl, Role_system, Prompt, max_tokens, temperature, top_p, usar_cache, refrescar_cache
         )
-        return completion.choices[0].message.content.strip()
+        if guardada is not None:
+            r = RespuestaOpenAI(guardada, UsoTokens(estimados, desde_cache=True))
+        else:
+            completion, reintentos = await _get_planificador().ejecutar_async(
+                lambda: _get_async_client().chat.completions.create(
+                    model=mdl,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    top_p=top_p,
+                ),
+                tokens=estimados + max_tokens,
+                contexto=_contexto(model),
+            )
+            texto = _texto(completion)
+            if cache is not None:
+                await asyncio.to_thread(cache.guardar, clave, texto)
+            r = RespuestaOpenAI(texto, _uso(completion, estimados, reintentos))
+        _anotar(s, mdl, r.uso)
+        return r
+
+
+async def openai_response_async(
+    Role_system: str,
+    Prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
+) -> str:
+    """Igual que openai_response pero sin bloquear (AsyncAzureOpenAI)."""
+    r = await openai_response_detallada_async(
+        Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache
+    )
+    return r.texto
+
+
+# ---------------------------------------------------------------------------
+# Respuestas en flujo (stream=True)
+# ---------------------------------------------------------------------------
+
+def _fragmento(chunk) -> str:
+    """Texto nuevo de un chunk del stream ('' en el chunk final de uso o sin contenido)."""
+    choices = getattr(chunk, "choices", None) or []
+    delta = getattr(choices[0], "delta", None) if choices else None
+    return getattr(delta, "content", None) or ""
+
+
+# stream_options (uso de tokens en el último chunk) existe en Azure desde esta api_version;
+# con versiones anteriores (p. ej. la por defecto, 2024-02-15-preview) la API responde 400
+_VERSION_USO_EN_STREAM = "2024-09-01"
+
+
+def _admite_uso_en_stream(api_version: Optional[str]) -> bool:
+    """True si la api_version acepta stream_options={'include_usage': True}."""
+    fecha = (api_version or "")[:10]
+    return len(fecha) == 10 and fecha[4] == fecha[7] == "-" and fecha >= _VERSION_USO_EN_STREAM
+
+
+class _FlujoBase:
+    def __init__(self, Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache):
+        self._args = (Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache)
+        self.texto: Optional[str] = None
+        self.uso: Optional[UsoTokens] = None
+        self.segundos_primer_fragmento: Optional[float] = None
+        self._recorrido = False
+        self._partes: List[str] = []
+        self._usage = None
+
+    def _iniciar(self):
+        if self._recorrido:
+            raise RuntimeError("El flujo de la respuesta ya se recorrió (se puede iterar una sola vez).")
+        self._recorrido = True
+        self._t0 = time.perf_counter()
+        Role_system, Prompt, model, max_tokens, temperature, top_p, _, _ = self._args
+        mdl, messages = _preparar(Role_system, Prompt, model)
+        self._estimados = estimar_tokens(Role_system, Prompt)
+        self._crear = dict(model=mdl, messages=messages, temperature=temperature, max_tokens=max_tokens,
+                           top_p=top_p, stream=True)
+        if _admite_uso_en_stream(_config().api_version):
+            self._crear["stream_options"] = {"include_usage": True}
+        # Sin stream_options el uso queda solo con los tokens estimados (prompt_reales=None)
+        return mdl
+
+    def _buscar_en_cache(self) -> Optional[str]:
+        """Consulta la caché (SQLite); el flujo async la corre en un hilo."""
+        Role_system, Prompt, _, max_tokens, temperature, top_p, usar_cache, refrescar_cache = self._args
+        self._cache, self._clave, guardada = _clave_cache(
+            self._crear["model"], Role_system, Prompt, max_tokens, temperature, top_p, usar_cache, refrescar_cache
+        )
+        return guardada
+
+    def _agregar(self, chunk) -> str:
+        self._usage = getattr(chunk, "usage", None) or self._usage
+        delta = _fragmento(chunk)
+        if delta:
+            if self.segundos_primer_fragmento is None:
+                self.segundos_primer_fragmento = time.perf_counter() - self._t0
+            self._partes.append(delta)
+        return delta
+
+    def _desde_cache(self, guardada: str):
+        self.segundos_primer_fragmento = time.perf_counter() - self._t0
+        self.texto = guardada
+        self.uso = UsoTokens(self._estimados, desde_cache=True)
+
+    def _guardar_en_cache(self):
+        if self._cache is not None:
+            self._cache.guardar(self._clave, self.texto)
+
+    def _terminar(self, reintentos: int):
+        self.texto = "".join(self._partes).strip()
+        self.uso = UsoTokens(
+            prompt_estimados=self._estimados,
+            prompt_reales=getattr(self._usage, "prompt_tokens", None),
+            completion_reales=getattr(self._usage, "completion_tokens", None),
+            reintentos=reintentos,
+        )
+
+    def _error(self, e: Exception, reintentos: int) -> ErrorOpenAI:
+        """Un corte a mitad del stream no se reintenta (ya se entregó texto): error tipado."""
+        if isinstance(e, ErrorOpenAI):
+            return e
+        clase, _ = _clasificar(e)
+        return clase(f"{_contexto(self._args[2])} | stream interrumpido | {e}", reintentos=reintentos)
+
+    def _anotar_span(self, s, mdl: str):
+        _anotar(s, mdl, self.uso)
+        s.anotar(stream=True, segundos_primer_fragmento=self.segundos_primer_fragmento)
+
 
-    except Exception as e:
-        # Devuelve info útil sin exponer la key
-        return f"[Error OpenAI] endpoint={_AZ_ENDPOINT} | version={_AZ_API_VER} | model={model or _AZ_DEPLOY} | {e}"
-    
+class FlujoOpenAI(_FlujoBase):
+    """
+    Fragmentos de texto de la respuesta a medida que llegan (ver openai_response_stream).
+    Al agotar el iterador quedan 'texto' (completo, igual que openai_response), 'uso'
+    y 'segundos_primer_fragmento'. Se puede recorrer una sola vez.
+    """
+
+    def __iter__(self):
+        with span("openai.response", max_tokens=self._args[3]) as s:
+            mdl = self._iniciar()
+            guardada = self._buscar_en_cache()
+            if guardada is not None:
+                self._desde_cache(guardada)
+                yield guardada
+            else:
+                flujo, reintentos = _get_planificador().ejecutar(
+                    lambda: _get_client().chat.completions.create(**self._crear),
+                    tokens=self._estimados + self._args[3],
+                    contexto=_contexto(self._args[2]),
+                )
+                try:
+                    for chunk in flujo:
+                        delta = self._agregar(chunk)
+                        if delta:
+                            yield delta
+                except Exception as e:
+                    raise self._error(e, reintentos) from e
+                finally:
+                    getattr(flujo, "close", lambda: None)()
+                self._terminar(reintentos)
+                self._guardar_en_cache()
+            self._anotar_span(s, mdl)
+
+
+class FlujoOpenAIAsync(_FlujoBase):
+    """Igual que FlujoOpenAI pero se recorre con 'async for' (AsyncAzureOpenAI)."""
+
+    async def __aiter__(self):
+        import asyncio
+        with span("openai.response", max_tokens=self._args[3]) as s:
+            mdl = self._iniciar()
+            guardada = await asyncio.to_thread(self._buscar_en_cache)
+            if guardada is not None:
+                self._desde_cache(guardada)
+                yield guardada
+            else:
+                flujo, reintentos = await _get_planificador().ejecutar_async(
+                    lambda: _get_async_client().chat.completions.create(**self._crear),
+                    tokens=self._estimados + self._args[3],
+                    contexto=_contexto(self._args[2]),
+                )
+                try:
+                    async for chunk in flujo:
+                        delta = self._agregar(chunk)
+                        if delta:
+                            yield delta
+                except Exception as e:
+                    raise self._error(e, reintentos) from e
+                finally:
+                    cerrar = getattr(flujo, "close", None)
+                    if cerrar is not None:
+                        await cerrar()
+                self._terminar(reintentos)
+                await asyncio.to_thread(self._guardar_en_cache)
+            self._anotar_span(s, mdl)
+
+
+def openai_response_stream(
+    Role_system: str,
+    Prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
+) -> FlujoOpenAI:
+    """
+    Igual que openai_response pero con stream=True: devuelve un iterador de fragmentos
+    de texto a medida que el modelo los genera (el primero llega mucho antes que la
+    respuesta completa).
+
+        flujo = openai_response_stream(system, prompt, max_tokens=700)
+        for delta in flujo:
+            print(delta, end="", flush=True)
+        flujo.texto, flujo.uso
+
+    - El llamado se abre al empezar a iterar; la apertura pasa por el planificador
+      (RPM/TPM, reintentos). Un corte a mitad del stream lanza ErrorOpenAI sin reintentar.
+    - Desde la caché se entrega la respuesta guardada en un solo fragmento; el texto
+      completo se guarda en la caché al terminar el stream.
+    """
+    return FlujoOpenAI(Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache)
+
+
+def openai_response_stream_async(
+    Role_system: str,
+    Prompt: str,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    temperature: float = 0.2,
+    top_p: float = 0.95,
+    usar_cache: bool = True,
+    refrescar_cache: bool = False,
+) -> FlujoOpenAIAsync:
+    """Igual que openai_response_stream pero con 'async for' (AsyncAzureOpenAI)."""
+    return FlujoOpenAIAsync(Role_system, Prompt, model, max_tokens, temperature, top_p, usar_cache, refrescar_cache)
+
+
+# ---------------------------------------------------------------------------
+# Generación concurrente de secciones
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ResultadoSeccion:
+    """Resultado de una sección: 'texto' si terminó bien, 'error' (normalmente ErrorOpenAI) si falló."""
+    indice: int
+    texto: Optional[str] = None
+    error: Optional[Exception] = None
+    uso: Optional[UsoTokens] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def generar_secciones_async(solicitudes: Sequence, max_concurrencia: int = 4) -> List[ResultadoSeccion]:
+    """
+    Ejecuta en paralelo una lista de solicitudes (system, prompt, params) donde 'params'
+    es un dict opcional con model / max_tokens / temperature / top_p / usar_cache / refrescar_cache.
+    - Como máximo 'max_concurrencia' llamados simultáneos (además del presupuesto RPM/TPM).
+    - Devuelve los resultados en el mismo orden de las solicitudes.
+    - Un error afecta solo a su sección (queda en ResultadoSeccion.error).
+    """
+    import asyncio
+    semaforo = asyncio.Semaphore(max(1, max_concurrencia))
+
+    async def _una(i, solicitud) -> ResultadoSeccion:
+        system, prompt, *resto = solicitud
+        params = dict(resto[0] or {}) if resto else {}
+        async with semaforo:
+            try:
+                r = await openai_response_detallada_async(system, prompt, **params)
+                return ResultadoSeccion(indice=i, texto=r.texto, uso=r.uso)
+            except Exception as e:
+                return ResultadoSeccion(indice=i, error=e)
+
+    return list(await asyncio.gather(*(_una(i, s) for i, s in enumerate(solicitudes))))
+
+
+def generar_secciones(solicitudes: Sequence, max_concurrencia: int = 4) -> List[ResultadoSeccion]:
+    """
+    Versión bloqueante de generar_secciones_async.
+    Si ya hay un event loop activo (p. ej. Jupyter) se ejecuta en un hilo aparte.
+    """
+    import asyncio
+
+    async def _generar():
+        try:
+            return await generar_secciones_async(solicitudes, max_concurrencia)
+        finally:
+            await cerrar_cliente_async()  # el loop de asyncio.run termina aquí: no dejar conexiones abiertas
+
+    corrutina = _generar()
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrutina)
 
-    
\ No newline at end of file
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, corrutina).result()
@@ -0,0 +1,263 @@
+# config/trazas.py
+"""
+Trazas por etapa del pipeline del informe: tiempo, filas, memoria y tokens.
+
+Desactivadas por defecto: span() devuelve un objeto nulo compartido y las funciones
+decoradas con @trazar solo comparan una variable global antes de llamar a la original.
+
+Activación:
+- TRAZAS=1 (traza en salidas/trazas/traza_<fecha>.jsonl) o TRAZAS=<ruta.jsonl>;
+- o en código:
+
+    with traza("salidas/trazas/informe.jsonl") as t:
+        generar_informe(spec, df)
+    print(t.tabla_resumen())
+
+Cada span es una línea JSON con: nombre, id, padre, hilo, inicio, segundos, filas,
+rss_pico_mb (pico de memoria del proceso al cerrar el span), error y atributos
+(p. ej. tokens de prompt/completion y reintentos de los llamados al modelo).
+Al cerrar la traza se escribe además el resumen por etapa en <ruta>.resumen.txt.
+"""
+
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+DIR_TRAZAS = "salidas/trazas"
+
+_activa: Optional["Traza"] = None
+_padre: ContextVar[Optional[int]] = ContextVar("traza_padre", default=None)
+
+
+def _rss_pico_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso (None donde no hay 'resource', p. ej. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def contar_filas(x) -> Optional[int]:
+    """Filas de un DataFrame, CuboImprod (conteos) o TablaReporte (datos); None si no aplica."""
+    for attr in ("conteos", "datos"):
+        x = getattr(x, attr, x)
+    return len(x) if hasattr(x, "shape") else None
+
+
+class _SpanNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, filas: Optional[int] = None, **atributos):
+        pass
+
+
+_NULO = _SpanNulo()
+
+
+class Span:
+    __slots__ = ("traza", "nombre", "id", "padre", "hilo", "inicio", "segundos",
+                 "filas", "atributos", "error", "_t0", "_token")
+
+    def __init__(self, traza: "Traza", nombre: str, atributos: dict):
+        self.traza = traza
+        self.nombre = nombre
+        self.id = next(traza._ids)
+        self.atributos = atributos
+        self.filas = None
+        self.error = None
+        self.segundos = 0.0
+
+    def anotar(self, filas: Optional[int] = None, **atributos):
+        if filas is not None:
+            self.filas = int(filas)
+        self.atributos.update(atributos)
+
+    def __enter__(self):
+        self.padre = _padre.get()
+        self._token = _padre.set(self.id)
+        self.hilo = threading.current_thread().name
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.segundos = time.perf_counter() - self._t0
+        _padre.reset(self._token)
+        if valor is not None:
+            self.error = f"{tipo.__name__}: {valor}"
+        self.traza._registrar(self)
+        return False
+
+    def registro(self) -> dict:
+        return {
+            "nombre": self.nombre,
+            "id": self.id,
+            "padre": self.padre,
+            "hilo": self.hilo,
+            "inicio": round(self.inicio, 6),
+            "segundos": round(self.segundos, 6),
+            "filas": self.filas,
+            "rss_pico_mb": _rss_pico_mb(),
+            "error": self.error,
+            "atributos": self.atributos,
+        }
+
+
+class Traza:
+    """Spans de una corrida; si hay 'ruta' se escriben como JSON lines a medida que cierran."""
+
+    def __init__(self, ruta: Optional[str] = None):
+        self.ruta = Path(ruta) if ruta else None
+        self.registros: List[dict] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._archivo = None
+        if self.ruta:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._archivo = open(self.ruta, "w", encoding="utf-8")
+
+    def _registrar(self, span: Span):
+        registro = span.registro()
+        with self._lock:
+            self.registros.append(registro)
+            if self._archivo:
+                self._archivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+    def resumen(self) -> List[dict]:
+        """Agregado por nombre de span, ordenado por tiempo total."""
+        with self._lock:
+            registros = list(self.registros)
+        etapas = {}
+        for r in registros:
+            e = etapas.setdefault(r["nombre"], {
+                "nombre": r["nombre"], "llamados": 0, "segundos": 0.0, "max_segundos": 0.0,
+                "filas": 0, "rss_pico_mb": None, "prompt_tokens": 0, "completion_tokens": 0,
+                "reintentos": 0, "errores": 0,
+            })
+            a = r["atributos"]
+            e["llamados"] += 1
+            e["segundos"] += r["segundos"]
+            e["max_segundos"] = max(e["max_segundos"], r["segundos"])
+            e["filas"] += r["filas"] or 0
+            if r["rss_pico_mb"] is not None:
+                e["rss_pico_mb"] = max(e["rss_pico_mb"] or 0, r["rss_pico_mb"])
+            e["prompt_tokens"] += a.get("prompt_tokens") or 0
+            e["completion_tokens"] += a.get("completion_tokens") or 0
+            e["reintentos"] += a.get("reintentos") or 0
+            e["errores"] += r["error"] is not None
+        return sorted(etapas.values(), key=lambda e: e["segundos"], reverse=True)
+
+    def tabla_resumen(self) -> str:
+        cols = [("etapa", 42), ("n", 6), ("total s", 10), ("max s", 9), ("filas", 12),
+                ("rss MB", 9), ("tok in", 9), ("tok out", 9), ("reint", 6), ("err", 4)]
+        lineas = ["".join(f"{c:<{w}}" if i == 0 else f"{c:>{w}}" for i, (c, w) in enumerate(cols))]
+        for e in self.resumen():
+            rss = "-" if e["rss_pico_mb"] is None else f"{e['rss_pico_mb']:.0f}"
+            lineas.append(
+                f"{e['nombre'][:41]:<42}{e['llamados']:>6}{e['segundos']:>10.3f}{e['max_segundos']:>9.3f}"
+                f"{e['filas']:>12,}{rss:>9}{e['prompt_tokens']:>9}{e['completion_tokens']:>9}"
+                f"{e['reintentos']:>6}{e['errores']:>4}"
+            )
+        return "\n".join(lineas)
+
+    def cerrar(self):
+        if self._archivo:
+            self._archivo.close()
+            self._archivo = None
+            self.ruta.with_suffix(".resumen.txt").write_text(self.tabla_resumen() + "\n", encoding="utf-8")
+
+
+def activar_trazas(ruta: Optional[str] = None) -> Traza:
+    """Activa la traza global (reemplaza la anterior, que se cierra)."""
+    global _activa
+    anterior, _activa = _activa, Traza(ruta)
+    if anterior is not None:
+        anterior.cerrar()
+    return _activa
+
+
+def desactivar_trazas() -> Optional[Traza]:
+    """Desactiva y cierra la traza global; la devuelve para consultar el resumen."""
+    global _activa
+    traza_actual, _activa = _activa, None
+    if traza_actual is not None:
+        traza_actual.cerrar()
+    return traza_actual
+
+
+def traza_activa() -> Optional[Traza]:
+    return _activa
+
+
+@contextmanager
+def traza(ruta: Optional[str] = None):
+    t = activar_trazas(ruta)
+    try:
+        yield t
+    finally:
+        if _activa is t:
+            desactivar_trazas()
+        else:
+            t.cerrar()
+
+
+def span(nombre: str, **atributos):
+    """Context manager de una etapa; sin traza activa devuelve un span nulo (sin costo)."""
+    t = _activa
+    if t is None:
+        return _NULO
+    return Span(t, nombre, atributos)
+
+
+def trazar(nombre: Optional[str] = None, filas: Optional[Callable[..., Optional[int]]] = None):
+    """
+    Decorador: envuelve la función en un span.
+    'filas' recibe los mismos argumentos que la función y devuelve las filas procesadas
+    (por defecto, contar_filas del primer argumento).
+    """
+    def deco(fn):
+        etiqueta = nombre or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            t = _activa
+            if t is None:
+                return fn(*args, **kwargs)
+            with Span(t, etiqueta, {}) as s:
+                try:
+                    s.filas = filas(*args, **kwargs) if filas else (contar_filas(args[0]) if args else None)
+                except Exception:
+                    pass  # contar filas nunca debe romper la etapa
+                return fn(*args, **kwargs)
+        return envoltura
+    return deco
+
+
+def _desde_entorno():
+    valor = os.getenv("TRAZAS", "").strip()
+    if valor and valor != "0":
+        ruta = valor if valor not in ("1", "true", "True") else \
+            f"{DIR_TRAZAS}/traza_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
+        activar_trazas(ruta)
+        import atexit
+        atexit.register(desactivar_trazas)
+
+
+_desde_entorno()
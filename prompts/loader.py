@@ -1,16 +1,109 @@
 from pathlib import Path
 from string import Template
+from dataclasses import dataclass
+from functools import lru_cache
 import json
+import threading
+
+from config.trazas import span, trazar
 
 BASE = Path(__file__).resolve().parent
 
+
+@dataclass(frozen=True)
+class PlantillaPrompt:
+    ruta: Path
+    texto: str
+    template: Template
+    placeholders: frozenset  # $nombre / ${nombre} que usa la plantilla
+    mtime_ns: int
+
+
+def _compilar_archivo(ruta: Path) -> PlantillaPrompt:
+    mtime_ns = ruta.stat().st_mtime_ns
+    texto = ruta.read_text(encoding="utf-8")
+    template = _compilar(texto)
+    return PlantillaPrompt(ruta, texto, template, frozenset(template.get_identifiers()), mtime_ns)
+
+
+class RegistroPrompts:
+    """
+    Plantillas de prompts/ leídas y compiladas una sola vez.
+    - precargar(): compila todos los .md bajo 'base'.
+    - obtener(): devuelve la plantilla; si el archivo cambió (mtime) se vuelve a leer.
+    - render(): sustituye validando que se entreguen todos los placeholders.
+    """
+
+    def __init__(self, base: Path = BASE):
+        self.base = Path(base)
+        self._plantillas = {}
+        self._lock = threading.Lock()
+
+    def precargar(self) -> "RegistroPrompts":
+        for ruta in sorted(self.base.rglob("*.md")):
+            self._plantillas[ruta.relative_to(self.base).parts] = _compilar_archivo(ruta)
+        return self
+
+    def obtener(self, *path_parts) -> PlantillaPrompt:
+        clave = tuple(Path(*path_parts).parts)
+        ruta = self.base.joinpath(*clave)
+        plantilla = self._plantillas.get(clave)
+        if plantilla is None or ruta.stat().st_mtime_ns != plantilla.mtime_ns:
+            with self._lock:
+                plantilla = _compilar_archivo(ruta)
+                self._plantillas[clave] = plantilla
+        return plantilla
+
+    def render(self, *path_parts, **kwargs) -> str:
+        with span("prompt.render", plantilla="/".join(path_parts)) as s:
+            plantilla = self.obtener(*path_parts)
+            validar_placeholders(plantilla, kwargs)
+            texto = plantilla.template.safe_substitute(_serializar_kwargs(kwargs))
+            s.anotar(caracteres=len(texto))
+            return texto
+
+
+_registro = None
+
+
+def get_registro() -> RegistroPrompts:
+    """Registro compartido (se precarga en el primer uso)."""
+    global _registro
+    if _registro is None:
+        _registro = RegistroPrompts().precargar()
+    return _registro
+
+
 def get_prompt(*path_parts) -> str:
-    path = BASE.joinpath(*path_parts)
-    return path.read_text(encoding="utf-8")
+    return get_registro().obtener(*path_parts).texto
+
+
+def validar_placeholders(plantilla, kwargs: dict):
+    """ValueError si la plantilla (PlantillaPrompt o texto) usa placeholders que no están en kwargs."""
+    if isinstance(plantilla, PlantillaPrompt):
+        nombre, requeridos = plantilla.ruta.name, plantilla.placeholders
+    else:
+        nombre, requeridos = "plantilla", set(_compilar(plantilla).get_identifiers())
+    faltan = sorted(set(requeridos) - set(kwargs))
+    if faltan:
+        raise ValueError(f"Faltan placeholders para {nombre}: {faltan}")
+
+
+@lru_cache(maxsize=128)
+def _compilar(template_str: str) -> Template:
+    return Template(template_str)
+
+
+def _serializar(v) -> str:
+    return json.dumps(v, ensure_ascii=False, indent=2)
+
+
+def _serializar_kwargs(kwargs: dict) -> dict:
+    return {k: (_serializar(v) if isinstance(v, (dict, list)) else v) for k, v in kwargs.items()}
+
 
+@trazar("prompt.render_prompt")
 def render_prompt(template_str: str, **kwargs) -> str:
-    safe_kwargs = {
-        k: (json.dumps(v, ensure_ascii=False, indent=2) if isinstance(v, (dict, list)) else v)
-        for k, v in kwargs.items()
-    }
-    return Template(template_str).safe_substitute(**safe_kwargs)
+    """Sustituye los placeholders de 'template_str' (ValueError si falta alguno, como RegistroPrompts.render)."""
+    validar_placeholders(template_str, kwargs)
+    return _compilar(template_str).safe_substitute(_serializar_kwargs(kwargs))
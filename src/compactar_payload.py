@@ -0,0 +1,150 @@
+# src/compactar_payload.py
+"""
+Compactación de payloads antes de renderizar el prompt (entre prompt_payloads y render_prompt).
+
+- Conserva solo los campos que usa la plantilla ('campos').
+- Serializa en JSON compacto (sin indentación ni espacios).
+- Si el payload supera el presupuesto de tokens, recorta los rankings (listas de
+  dicts con 'total' bajo las claves RANKINGS, p. ej. 'dependencias') a top-k y
+  agrega el resto en una fila 'OTRAS (n)', bajando k hasta que el payload quepa.
+
+Uso:
+    pc = compactar_payload(payload, presupuesto_tokens=800, campos=[...])
+    usr_msg = render_prompt(user_t, payload=pc.json, corte_hasta=payload["corte_hasta"])
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from config.openai_config import estimar_tokens
+
+PASOS_TOP_K = (20, 10, 5, 3, 1)
+
+# Listas ordenables por 'total' que se pueden recortar a top-k + 'OTRAS'
+RANKINGS = ("dependencias", "ranking_top10")
+
+
+@dataclass
+class PayloadCompacto:
+    datos: dict
+    json: str
+    tokens_estimados: int
+    presupuesto_tokens: Optional[int] = None
+    top_k: Optional[int] = None  # k aplicado a los rankings (None = sin recorte)
+
+    @property
+    def dentro_presupuesto(self) -> bool:
+        return self.presupuesto_tokens is None or self.tokens_estimados <= self.presupuesto_tokens
+
+
+def _es_ranking(v) -> bool:
+    return (
+        isinstance(v, list) and len(v) > 0
+        and all(isinstance(x, dict) and isinstance(x.get("total"), (int, float)) for x in v)
+    )
+
+
+def _agregar_otros(resto: List[dict]) -> dict:
+    """Fila 'OTRAS (n)': la etiqueta va en la primera clave de texto y los números se suman."""
+    otros = {}
+    for k, v in resto[0].items():
+        if isinstance(v, str):
+            otros[k] = f"OTRAS ({len(resto)})"
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            s = sum(x.get(k) or 0 for x in resto)
+            otros[k] = round(s, 2) if isinstance(s, float) else s
+    return otros
+
+
+def _recortar(v, k: int, rankings):
+    if isinstance(v, dict):
+        out = {}
+        for c, x in v.items():
+            if c in rankings and _es_ranking(x) and len(x) > k:
+                ordenado = sorted(x, key=lambda r: r["total"], reverse=True)
+                out[c] = ordenado[:k] + [_agregar_otros(ordenado[k:])]
+            else:
+                out[c] = _recortar(x, k, rankings)
+        return out
+    if isinstance(v, list):
+        return [_recortar(x, k, rankings) for x in v]
+    return v
+
+
+def _largo_max_ranking(v, rankings) -> int:
+    if isinstance(v, dict):
+        return max(
+            (len(x) if c in rankings and _es_ranking(x) else _largo_max_ranking(x, rankings)
+             for c, x in v.items()),
+            default=0,
+        )
+    if isinstance(v, list):
+        return max((_largo_max_ranking(x, rankings) for x in v), default=0)
+    return 0
+
+
+def _serializar(datos: dict) -> str:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+
+
+def compactar_payload(
+    payload: dict,
+    presupuesto_tokens: Optional[int] = None,
+    campos: Optional[Iterable[str]] = None,
+    top_k: Optional[int] = None,
+    pasos_top_k: Iterable[int] = PASOS_TOP_K,
+    rankings: Iterable[str] = RANKINGS,
+) -> PayloadCompacto:
+    """
+    Devuelve el payload compactado y su JSON listo para render_prompt.
+    - 'presupuesto_tokens': tokens estimados máximos del JSON del payload (None = sin límite).
+    - 'campos': claves de primer nivel que referencia la plantilla (None = todas).
+    - 'top_k': recorte fijo de los rankings ('rankings' = claves recortables); si no se
+      da, se recorta solo lo necesario para entrar en el presupuesto probando
+      'pasos_top_k' de mayor a menor.
+    Si ni con el k más chico se cumple el presupuesto, se devuelve ese intento
+    (ver PayloadCompacto.dentro_presupuesto).
+    """
+    rankings = frozenset(rankings)
+    if campos is not None:
+        campos = list(campos)
+        faltan = [c for c in campos if c not in payload]
+        if faltan:
+            raise ValueError(f"El payload no tiene los campos pedidos: {faltan}")
+        datos = {c: payload[c] for c in campos}
+    else:
+        datos = dict(payload)
+
+    def _resultado(d, k):
+        texto = _serializar(d)
+        return PayloadCompacto(d, texto, estimar_tokens(texto), presupuesto_tokens, k)
+
+    if top_k is not None:
+        return _resultado(_recortar(datos, top_k, rankings), top_k)
+
+    resultado = _resultado(datos, None)
+    largo = _largo_max_ranking(datos, rankings)
+    for k in sorted(set(pasos_top_k), reverse=True):
+        if resultado.dentro_presupuesto:
+            break
+        if k < largo:
+            resultado = _resultado(_recortar(datos, k, rankings), k)
+    return resultado
+
+
+def resumen_uso(usos: Iterable) -> dict:
+    """
+    Agrega UsoTokens (ver config.openai_config) para ajustar presupuestos:
+    tokens de prompt estimados vs. reales (solo llamados no servidos desde caché).
+    """
+    medidos = [u for u in usos if u is not None and u.prompt_reales is not None]
+    estimados = sum(u.prompt_estimados for u in medidos)
+    reales = sum(u.prompt_reales for u in medidos)
+    return {
+        "llamados": len(medidos),
+        "prompt_estimados": estimados,
+        "prompt_reales": reales,
+        "completion_reales": sum(u.completion_reales or 0 for u in medidos),
+        "razon_real_estimado": round(reales / estimados, 3) if estimados else None,
+    }
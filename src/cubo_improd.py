@@ -0,0 +1,173 @@
+# src/cubo_improd.py
+"""
+Cubo de conteos IMPROD compartido por los constructores de tablas.
+
+Se construye UNA vez con un único groupby sobre
+(IMPROD, NIVEL_TERRITORIAL, TIPO_DEPENDENCIA, DEPENDENCIA_TITULAR, ANIO_PGN)
+y cada tabla del informe se obtiene filtrando y sumando ese agregado, sin
+volver a recorrer las filas originales.
+
+Desde archivos CSV / Parquet el cubo se arma con un motor intercambiable (MOTORES):
+pandas en memoria o DuckDB fuera de memoria; ambos producen los mismos conteos.
+"""
+
+from __future__ import annotations
+
+from os import PathLike
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config.trazas import trazar
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+DIMENSIONES = ["IMPROD", "NIVEL_TERRITORIAL", "TIPO_DEPENDENCIA", "DEPENDENCIA_TITULAR", "ANIO_PGN"]
+COL_CASOS = "CASOS"
+
+
+def _normalizar_anio(s: pd.Series) -> pd.Series:
+    """ANIO_PGN como texto ('HASTA 2021', '2022', ...) conservando los nulos."""
+    import pandas as pd
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # Se convierten solo las categorías (pocas), no cada fila
+        categorias = s.cat.categories.astype(str).str.strip()
+        if not categorias.has_duplicates:
+            return s.cat.rename_categories(categorias)
+    return s.where(s.isna(), s.astype(str).str.strip())
+
+
+def _sin_categorias(d: pd.DataFrame) -> pd.DataFrame:
+    """Dimensiones category -> valores (el agregado es chico y así se ordena igual que el texto)."""
+    import pandas as pd
+    for c in d.columns:
+        if isinstance(d[c].dtype, pd.CategoricalDtype):
+            d[c] = d[c].astype(d[c].cat.categories.dtype)
+    return d
+
+
+class CuboImprod:
+    """
+    Conteos por las DIMENSIONES (columna CASOS).
+    - desde_df:      a partir del DataFrame fila a fila (cargar_improd / CSV).
+    - desde_conteos: a partir de un agregado ya calculado (p. ej. agregar_improd).
+    """
+
+    def __init__(self, conteos: pd.DataFrame):
+        self.conteos = conteos.reset_index(drop=True)
+        self._mascaras = {}  # filtro IMPROD -> máscara booleana sobre self.conteos
+
+    @classmethod
+    @trazar("cubo.desde_df", filas=lambda cls, df: len(df))
+    def desde_df(cls, df: pd.DataFrame) -> "CuboImprod":
+        faltan = [c for c in DIMENSIONES if c not in df.columns]
+        if faltan:
+            raise ValueError(f"Faltan columnas para construir el cubo: {faltan}")
+        d = df[DIMENSIONES].copy()
+        d["ANIO_PGN"] = _normalizar_anio(d["ANIO_PGN"])
+        conteos = d.groupby(DIMENSIONES, dropna=False, observed=True).size().rename(COL_CASOS).reset_index()
+        return cls(_sin_categorias(conteos))
+
+    @classmethod
+    @trazar("cubo.desde_conteos", filas=lambda cls, conteos, *a, **k: len(conteos))
+    def desde_conteos(cls, conteos: pd.DataFrame, col_casos: str = COL_CASOS) -> "CuboImprod":
+        d = conteos[DIMENSIONES + [col_casos]].rename(columns={col_casos: COL_CASOS})
+        d["ANIO_PGN"] = _normalizar_anio(d["ANIO_PGN"])
+        # Re-agrupar por si el agregado trae combinaciones repetidas (p. ej. varios bloques)
+        d = d.groupby(DIMENSIONES, dropna=False, observed=True)[COL_CASOS].sum().reset_index()
+        d[COL_CASOS] = d[COL_CASOS].astype("int64")
+        return cls(_sin_categorias(d))
+
+    def _mascara_improd(self, filtro_improd: str) -> pd.Series:
+        """Misma regla que str.contains(filtro, case=False) pero evaluada sobre los valores únicos."""
+        if filtro_improd not in self._mascaras:
+            import pandas as pd
+            improd = self.conteos["IMPROD"]
+            valores = pd.Series(improd.dropna().unique())
+            validos = set(valores[valores.astype(str).str.contains(filtro_improd, case=False, na=False)])
+            self._mascaras[filtro_improd] = improd.isin(validos)
+        return self._mascaras[filtro_improd]
+
+    def filtrar(self, filtro_improd: str = None, **igualdades) -> pd.DataFrame:
+        """Subconjunto de conteos por IMPROD (contiene) y por igualdad en otras dimensiones."""
+        import pandas as pd
+        mask = self._mascara_improd(filtro_improd) if filtro_improd else pd.Series(True, index=self.conteos.index)
+        for col, valor in igualdades.items():
+            mask = mask & (self.conteos[col] == valor)
+        return self.conteos.loc[mask]
+
+    def total(self, filtro_improd: str = None, **igualdades) -> int:
+        return int(self.filtrar(filtro_improd, **igualdades)[COL_CASOS].sum())
+
+    def crosstab(self, filas, columnas: str, filtro_improd: str = None, **igualdades) -> pd.DataFrame:
+        """
+        Equivalente a pd.crosstab(df[filas], df[columnas]) sobre las filas filtradas,
+        pero sumando conteos del cubo. Las combinaciones con nulos se descartan, igual que crosstab.
+        'filas' puede ser una dimensión o una lista (índice MultiIndex).
+        """
+        filas = [filas] if isinstance(filas, str) else list(filas)
+        d = self.filtrar(filtro_improd, **igualdades)
+        tabla = (
+            d.groupby(filas + [columnas], observed=True)[COL_CASOS].sum()
+             .unstack(fill_value=0)
+             .astype("int64")
+        )
+        tabla.index.names = filas
+        tabla.columns.name = columnas
+        return tabla
+
+
+def _cubo_pandas(fuente, **_opciones) -> CuboImprod:
+    """Lee solo las DIMENSIONES del CSV / Parquet (tipadas, ver tables.esquema_improd) y agrupa con pandas."""
+    import glob
+    import pandas as pd
+    from tables.esquema_improd import cargar_archivo_improd
+    rutas = list(fuente) if isinstance(fuente, (list, tuple)) else [fuente]
+    rutas = [r for patron in rutas for r in (sorted(glob.glob(str(patron))) or [patron])]
+    partes = [cargar_archivo_improd(r, DIMENSIONES) for r in rutas]
+    if len(partes) == 1:
+        return CuboImprod.desde_df(partes[0])
+    from pandas.api.types import union_categoricals
+    return CuboImprod.desde_df(pd.DataFrame({
+        c: union_categoricals([p[c] for p in partes], sort_categories=True) for c in DIMENSIONES
+    }))
+
+
+def _cubo_duckdb(fuente, **opciones) -> CuboImprod:
+    """Agrega con DuckDB sobre los archivos (fuera de memoria) y arma el cubo desde los conteos."""
+    from tables.consultas_duckdb import conteos_duckdb
+    return CuboImprod.desde_conteos(conteos_duckdb(fuente, DIMENSIONES, **opciones))
+
+
+# Motores de ejecución: fuente (ruta / lista de rutas) -> CuboImprod con los mismos conteos
+MOTORES = {
+    "pandas": _cubo_pandas,
+    "duckdb": _cubo_duckdb,
+}
+
+
+def cubo_desde_archivo(fuente, motor: str = "pandas", **opciones) -> CuboImprod:
+    """
+    Cubo a partir de archivos CSV / Parquet con el motor indicado (ver MOTORES).
+    - "pandas": carga las dimensiones en memoria (rápido para archivos chicos).
+    - "duckdb": agrega fuera de memoria con todos los núcleos; 'opciones' son las de
+      conteos_duckdb (memoria, dir_temporal, hilos).
+    Ambos motores entregan el mismo cubo, así las tablas del informe son idénticas.
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor desconocido: {motor!r} (disponibles: {sorted(MOTORES)})")
+    return MOTORES[motor](fuente, **opciones)
+
+
+def como_cubo(datos, motor: str = "pandas") -> CuboImprod:
+    """
+    Acepta un CuboImprod, un agregado con columna CASOS, el DataFrame fila a fila
+    o la ruta de un CSV / Parquet (se agrega con 'motor', ver cubo_desde_archivo).
+    """
+    if isinstance(datos, CuboImprod):
+        return datos
+    if isinstance(datos, (str, PathLike)):
+        return cubo_desde_archivo(datos, motor)
+    if COL_CASOS in datos.columns:
+        return CuboImprod.desde_conteos(datos)
+    return CuboImprod.desde_df(datos)
@@ -1,31 +1,190 @@
-from docx import Document
-from docx.shared import Pt, RGBColor
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-import pandas as pd
+# python-docx y pandas se importan dentro de cada función: importar este módulo es inmediato.
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
 
+from config.trazas import trazar
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from docx.document import Document
+    from docx.text.paragraph import Paragraph
+
+# Marcadores de la plantilla: <<nombre>>
+PATRON_PLACEHOLDER = r"<<[^<>\n]+?>>"
+
+
+class _Historia:
+    """Contenedor mínimo para crear Paragraph fuera del cuerpo (encabezados y pies de página)."""
+    def __init__(self, part):
+        self.part = part
+
+
+@dataclass
+class IndicePlaceholders:
+    """Marcador -> párrafos donde aparece (cuerpo, celdas de tablas, encabezados y pies)."""
+    patron: str
+    ubicaciones: Dict[str, List[Paragraph]] = field(default_factory=dict)
+
+    def __contains__(self, marcador: str) -> bool:
+        return _marcador(marcador) in self.ubicaciones
+
+    def __len__(self) -> int:
+        return len(self.ubicaciones)
+
+
+def _marcador(nombre: str) -> str:
+    """'nombre' -> '<<nombre>>'; cualquier otro marcador ('<<x>>', '{{X}}') se deja igual."""
+    return f"<<{nombre}>>" if re.fullmatch(r"\w+", nombre) else nombre
+
+
+def _historias(doc: Document):
+    """(part, elemento raíz) del cuerpo y de cada encabezado/pie de página (una vez por part)."""
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    yield doc.part, doc.element.body
+    for rel in doc.part.rels.values():
+        if not rel.is_external and rel.reltype in (RT.HEADER, RT.FOOTER):
+            yield rel.target_part, rel.target_part.element
+
+
+def indexar_placeholders(doc: Document, patron: str = PATRON_PLACEHOLDER) -> IndicePlaceholders:
+    """
+    Recorre UNA vez el documento (cuerpo, tablas anidadas, encabezados y pies de página)
+    y ubica cada marcador que cumpla 'patron'. El índice es para un solo
+    aplicar_placeholders: después de reemplazar, el documento cambia.
+    """
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+    regex = re.compile(patron)
+    indice = IndicePlaceholders(patron)
+    for part, raiz in _historias(doc):
+        historia = _Historia(part)
+        for p_el in raiz.iter(qn("w:p")):
+            if not regex.search("".join(p_el.itertext())):
+                continue
+            p = Paragraph(p_el, historia)
+            for m in dict.fromkeys(regex.findall(p.text)):
+                indice.ubicaciones.setdefault(m, []).append(p)
+    return indice
+
+
+def _run_arial(p, texto: str, tamano: int):
+    from docx.shared import Pt
+    r = p.add_run(texto)
+    r.font.name = "Arial"
+    r.font.size = Pt(tamano)
+    return r
+
+
+def _reescribir_parrafo(doc, p, regex, textos: dict, tablas: dict, tabla_rapida: bool = True,
+                        solo_primero: bool = False) -> set:
+    """
+    Reconstruye el párrafo reemplazando sus marcadores conocidos:
+    - texto: run Arial 11;
+    - tabla: se ancla en el párrafo; el texto que sigue queda en Arial 8.
+    solo_primero=True reemplaza solo la primera aparición de cada marcador en el párrafo.
+    Devuelve los marcadores reemplazados.
+    """
+    original = p.text
+    piezas, pos = [], 0
+    for m in regex.finditer(original):
+        if m.group(0) in textos or m.group(0) in tablas:
+            if solo_primero and ("marcador", m.group(0)) in piezas:
+                continue
+            piezas += [("literal", original[pos:m.start()]), ("marcador", m.group(0))]
+            pos = m.end()
+    if not piezas:
+        return set()
+    piezas.append(("literal", original[pos:]))
+
+    p.text = ""  # limpiar párrafo
+    reemplazados, tras_tabla = set(), False
+    primer_marcador = piezas[1][1]
+    for tipo, valor in piezas:
+        if tipo == "literal":
+            if not valor:
+                continue
+            if tras_tabla:
+                _run_arial(p, valor, 8)
+            elif primer_marcador in tablas:
+                p.add_run(valor)
+            else:
+                _run_arial(p, valor, 11)
+        elif valor in textos:
+            _run_arial(p, textos[valor], 11)
+            reemplazados.add(valor)
+        else:
+            construir = _tabla_docx_xml if tabla_rapida else _tabla_docx_celdas
+            anchor = p.add_run()
+            anchor._r.addnext(construir(doc, tablas[valor]))
+            reemplazados.add(valor)
+            tras_tabla = True
+    return reemplazados
+
+
+@trazar("docx.aplicar_placeholders")
+def aplicar_placeholders(
+    doc: Document,
+    textos: Optional[dict] = None,
+    tablas: Optional[dict] = None,
+    indice: Optional[IndicePlaceholders] = None,
+    tabla_rapida: bool = True,
+) -> Dict[str, int]:
+    """
+    Aplica en un solo paso todas las inserciones: 'textos' {marcador: str} y
+    'tablas' {marcador: DataFrame}. Los marcadores pueden darse como '<<nombre>>' o 'nombre'.
+    Usa 'indice' si se entrega (ver indexar_placeholders); si no, lo construye.
+    Devuelve {marcador: párrafos reemplazados} (0 si no estaba en el documento).
+    Las tablas vacías (None o sin filas) se omiten y dejan el marcador.
+    tabla_rapida=False arma las tablas celda a celda con python-docx (más lento, mismo resultado).
+    """
+    textos = {_marcador(k): v for k, v in (textos or {}).items()}
+    tablas = {_marcador(k): v for k, v in (tablas or {}).items()}
+    return _aplicar(doc, textos, tablas, indice or indexar_placeholders(doc), tabla_rapida)
+
+
+def _aplicar(doc: Document, textos: dict, tablas: dict, indice: IndicePlaceholders,
+             tabla_rapida: bool = True, solo_primero: bool = False,
+             max_parrafos: Optional[int] = None) -> Dict[str, int]:
+    """
+    aplicar_placeholders con los marcadores tal cual (sin '<<...>>'). Los reemplazos de un
+    solo marcador lo usan con las reglas de siempre: primera aparición por párrafo y, para
+    tablas, solo el primer párrafo (max_parrafos=1).
+    """
+    tablas = {k: _preparar_df(v) for k, v in tablas.items() if v is not None and not v.empty}
+    regex = re.compile(indice.patron)
+
+    conteo = dict.fromkeys(list(textos) + list(tablas), 0)
+    vistos = set()
+    for marcador in conteo:
+        for p in indice.ubicaciones.get(marcador, [])[:max_parrafos]:
+            if id(p._p) in vistos:
+                continue
+            vistos.add(id(p._p))
+            for m in _reescribir_parrafo(doc, p, regex, textos, tablas, tabla_rapida, solo_primero):
+                conteo[m] += 1
+    return conteo
+
+
+@trazar("docx.insert_text_at_bookmark")
 def insert_text_at_bookmark(doc: Document, bookmark: str, text: str) -> bool:
     """
-    Reemplaza la cadena 'bookmark' (p.ej. {{RESUMEN}}) por 'text' en el documento.
+    Reemplaza la cadena 'bookmark' (p.ej. {{RESUMEN}}) por 'text' en el documento
+    (cuerpo, tablas, encabezados y pies de página).
     - Arial 11, sin negrita.
+    - Reemplaza la primera aparición en cada párrafo que lo contiene.
     - Devuelve True si reemplazó algo.
+    'bookmark' se busca literal (no se envuelve en '<<...>>' como en aplicar_placeholders).
+    Para varios marcadores, aplicar_placeholders recorre el documento una sola vez.
     """
-    replaced = False
-    for p in doc.paragraphs:
-        if bookmark in p.text:
-            before, _, after = p.text.partition(bookmark)
-            p.text = ""  # limpiar párrafo
-            r1 = p.add_run(before)
-            r2 = p.add_run(text)
-            r3 = p.add_run(after)
-            for r in (r1, r2, r3):
-                r.font.name = "Arial"
-                r.font.size = Pt(11)
-            replaced = True
-    return replaced
+    indice = indexar_placeholders(doc, re.escape(bookmark))
+    return _aplicar(doc, {bookmark: text}, {}, indice, solo_primero=True)[bookmark] > 0
 
 def _set_table_borders(table):
     """Aplica bordes finos negros a toda la tabla si no hay estilo."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
     tbl = table._tbl
     tblPr = tbl.tblPr or OxmlElement('w:tblPr')
     borders = OxmlElement('w:tblBorders')
@@ -40,21 +199,16 @@ def _set_table_borders(table):
 
 def _shade_cell(cell, hex_fill):
     """Aplica color de fondo a una celda."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
     tc_pr = cell._element.get_or_add_tcPr()
     shd = OxmlElement('w:shd')
     shd.set(qn('w:fill'), hex_fill)
     tc_pr.append(shd)
 
-def insert_dataframe_at_bookmark(doc: Document, df: pd.DataFrame, bookmark: str) -> bool:
-    """
-    Inserta una tabla en el marcador con formato institucional:
-    - Encabezado azul (1B355E) con texto blanco, negrita Arial 8.
-    - Cuerpo en Arial 8, negro.
-    - Bordes negros finos si no hay estilo de tabla.
-    """
-    if df is None or df.empty:
-        return False
-
+def _preparar_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Índice como columna(s), nulos vacíos y encabezados como texto."""
+    import pandas as pd
     temp = df.copy()
     if temp.index.name or not isinstance(temp.index, pd.RangeIndex):
         idx_name = temp.index.name or " "
@@ -62,52 +216,163 @@ def insert_dataframe_at_bookmark(doc: Document, df: pd.DataFrame, bookmark: str)
 
     temp = temp.fillna("")
     temp.columns = temp.columns.astype(str)
+    return temp
 
-    for p in doc.paragraphs:
-        if bookmark in p.text:
-            # Crear tabla
-            table = doc.add_table(rows=1, cols=len(temp.columns))
-
-            # Intentar aplicar estilo existente
-            for style_name in ("Table Grid", "TableGrid", "Normal Table", "Tabla con cuadrícula"):
-                try:
-                    table.style = style_name
-                    break
-                except Exception:
-                    pass
-            else:
-                _set_table_borders(table)
-
-            # === ENCABEZADO ===
-            hdr_cells = table.rows[0].cells
-            for i, col in enumerate(temp.columns):
-                hdr_cells[i].text = str(col)
-                run = hdr_cells[i].paragraphs[0].runs[0]
-                run.font.name = "Arial"
-                run.font.size = Pt(8)
-                run.bold = True
-                run.font.color.rgb = RGBColor(255, 255, 255)  # blanco
-                _shade_cell(hdr_cells[i], "1B355E")           # azul institucional
-
-            # === CUERPO ===
-            for _, row in temp.iterrows():
-                row_cells = table.add_row().cells
-                for i, val in enumerate(row):
-                    row_cells[i].text = str(val)
-                    run = row_cells[i].paragraphs[0].runs[0]
-                    run.font.name = "Arial"
-                    run.font.size = Pt(8)
-                    run.font.color.rgb = RGBColor(0, 0, 0)
-
-            # Reemplazar marcador
-            before, _, after = p.text.partition(bookmark)
-            p.text = before
-            anchor = p.add_run()
-            anchor._r.addnext(table._element)
-            if after:
-                tail = p.add_run(after)
-                tail.font.name = "Arial"
-                tail.font.size = Pt(8)
-
-            return True
-    return False
\ No newline at end of file
+
+@trazar("docx.tabla_celdas", filas=lambda doc, temp: len(temp))
+def _tabla_docx_celdas(doc: Document, temp: pd.DataFrame):
+    """Tabla con formato institucional armada celda a celda con python-docx (devuelve el w:tbl)."""
+    from docx.shared import Pt, RGBColor
+    table = doc.add_table(rows=1, cols=len(temp.columns))
+
+    # Intentar aplicar estilo existente
+    for style_name in ("Table Grid", "TableGrid", "Normal Table", "Tabla con cuadrícula"):
+        try:
+            table.style = style_name
+            break
+        except Exception:
+            pass
+    else:
+        _set_table_borders(table)
+
+    # === ENCABEZADO ===
+    hdr_cells = table.rows[0].cells
+    for i, col in enumerate(temp.columns):
+        hdr_cells[i].text = str(col)
+        run = hdr_cells[i].paragraphs[0].runs[0]
+        run.font.name = "Arial"
+        run.font.size = Pt(8)
+        run.bold = True
+        run.font.color.rgb = RGBColor(255, 255, 255)  # blanco
+        _shade_cell(hdr_cells[i], "1B355E")           # azul institucional
+
+    # === CUERPO ===
+    for _, row in temp.iterrows():
+        row_cells = table.add_row().cells
+        for i, val in enumerate(row):
+            row_cells[i].text = str(val)
+            run = row_cells[i].paragraphs[0].runs[0]
+            run.font.name = "Arial"
+            run.font.size = Pt(8)
+            run.font.color.rgb = RGBColor(0, 0, 0)
+    return table._element
+
+
+# Estilos de carácter compartidos por todas las celdas (en vez de formato run a run).
+# Si la plantilla ya los define, se respetan.
+ESTILO_ENCABEZADO = "Tabla Informe Encabezado"
+ESTILO_CUERPO = "Tabla Informe Cuerpo"
+ESTILOS_TABLA = ("Table Grid", "TableGrid", "Normal Table", "Tabla con cuadrícula")
+
+
+def _estilo_caracter(doc: Document, nombre: str, negrita: bool, color) -> str:
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.shared import Pt
+    try:
+        return doc.styles[nombre].style_id
+    except KeyError:
+        estilo = doc.styles.add_style(nombre, WD_STYLE_TYPE.CHARACTER)
+        estilo.font.name = "Arial"
+        estilo.font.size = Pt(8)
+        estilo.font.bold = negrita
+        estilo.font.color.rgb = color
+        return estilo.style_id
+
+
+def _estilo_tabla(doc: Document) -> Optional[str]:
+    """
+    Mismo criterio que la ruta celda a celda: primer estilo de ESTILOS_TABLA que exista.
+    Devuelve su style_id ('' si es el estilo de tabla por defecto) o None si no hay ninguno.
+    """
+    from docx.enum.style import WD_STYLE_TYPE
+    for nombre in ESTILOS_TABLA:
+        try:
+            estilo = doc.styles[nombre]
+        except KeyError:
+            continue
+        if estilo.type != WD_STYLE_TYPE.TABLE:
+            continue
+        return "" if estilo == doc.styles.default(WD_STYLE_TYPE.TABLE) else estilo.style_id
+    return None
+
+
+def _run_xml(texto: str, rpr: str) -> str:
+    """w:r con el estilo compartido; tabs y saltos de línea como en Run.text de python-docx."""
+    from xml.sax.saxutils import escape
+    if not texto:
+        return f"<w:r>{rpr}</w:r>"
+    partes = []
+    for i, linea in enumerate(texto.replace("\r\n", "\n").replace("\r", "\n").split("\n")):
+        if i:
+            partes.append("<w:br/>")
+        for j, trozo in enumerate(linea.split("\t")):
+            if j:
+                partes.append("<w:tab/>")
+            if trozo:
+                # xml:space solo si hace falta (como python-docx): además es costoso al mover el w:tbl
+                preservar = ' xml:space="preserve"' if trozo != trozo.strip() else ""
+                partes.append(f"<w:t{preservar}>{escape(trozo)}</w:t>")
+    return f"<w:r>{rpr}{''.join(partes)}</w:r>"
+
+
+@trazar("docx.tabla_xml", filas=lambda doc, temp: len(temp))
+def _tabla_docx_xml(doc: Document, temp: pd.DataFrame):
+    """
+    Misma tabla que _tabla_docx_celdas, pero armada como un único w:tbl con lxml:
+    las celdas referencian estilos de carácter compartidos (ESTILO_ENCABEZADO / ESTILO_CUERPO)
+    y las filas se generan en bloque, sin crear objetos de python-docx por celda.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+    from docx.shared import Emu, RGBColor
+
+    n_cols = len(temp.columns)
+    ancho = Emu(doc._block_width // n_cols).twips if n_cols else 0
+    id_tabla = _estilo_tabla(doc)
+    rpr_enc = f'<w:rPr><w:rStyle w:val="{_estilo_caracter(doc, ESTILO_ENCABEZADO, True, RGBColor(255, 255, 255))}"/></w:rPr>'
+    rpr_cue = f'<w:rPr><w:rStyle w:val="{_estilo_caracter(doc, ESTILO_CUERPO, False, RGBColor(0, 0, 0))}"/></w:rPr>'
+
+    if id_tabla is None:  # sin estilo de tabla: bordes negros finos (≈ 0.5pt)
+        bordes = "".join(
+            f'<w:{b} w:val="single" w:sz="8" w:color="000000"/>'
+            for b in ("top", "left", "bottom", "right", "insideH", "insideV")
+        )
+        estilo_xml, bordes_xml = "", f"<w:tblBorders>{bordes}</w:tblBorders>"
+    else:
+        estilo_xml = f'<w:tblStyle w:val="{id_tabla}"/>' if id_tabla else ""
+        bordes_xml = ""
+
+    tc_enc = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{ancho}"/><w:shd w:val="clear" w:color="auto" w:fill="1B355E"/></w:tcPr><w:p>'
+    tc_cue = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{ancho}"/></w:tcPr><w:p>'
+    fin_tc = "</w:p></w:tc>"
+    grilla = f'<w:gridCol w:w="{ancho}"/>' * n_cols
+
+    filas = ["<w:tr>" + "".join(f"{tc_enc}{_run_xml(str(c), rpr_enc)}{fin_tc}" for c in temp.columns) + "</w:tr>"]
+    for fila in temp.itertuples(index=False, name=None):
+        filas.append("<w:tr>" + "".join(f"{tc_cue}{_run_xml(str(v), rpr_cue)}{fin_tc}" for v in fila) + "</w:tr>")
+
+    return parse_xml(
+        f"<w:tbl {nsdecls('w')}>"
+        f'<w:tblPr>{estilo_xml}<w:tblW w:type="auto" w:w="0"/>{bordes_xml}'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        "</w:tblPr>"
+        f"<w:tblGrid>{grilla}</w:tblGrid>"
+        f"{''.join(filas)}</w:tbl>"
+    )
+
+
+@trazar("docx.insert_dataframe_at_bookmark", filas=lambda doc, df, *a, **k: len(df))
+def insert_dataframe_at_bookmark(doc: Document, df: pd.DataFrame, bookmark: str, tabla_rapida: bool = True) -> bool:
+    """
+    Inserta una tabla en el marcador con formato institucional:
+    - Encabezado azul (1B355E) con texto blanco, negrita Arial 8.
+    - Cuerpo en Arial 8, negro.
+    - Bordes negros finos si no hay estilo de tabla.
+    - Solo en la primera aparición del marcador (búsqueda literal, como insert_text_at_bookmark).
+    Para varios marcadores, aplicar_placeholders recorre el documento una sola vez.
+    """
+    if df is None or df.empty:
+        return False
+    indice = indexar_placeholders(doc, re.escape(bookmark))
+    conteo = _aplicar(doc, {}, {bookmark: df}, indice, tabla_rapida, solo_primero=True, max_parrafos=1)
+    return conteo[bookmark] > 0
@@ -0,0 +1,48 @@
+# src/formato_tablas.py
+"""
+Formato de presentación de las tablas del informe (se aplica una sola vez, al renderizar).
+Los constructores de tablas devuelven números; aquí se convierten a texto:
+- Enteros con separador de miles punto:  40818 -> '40.818'
+- Porcentajes con coma decimal:          82.3  -> '82,30'
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+
+def formatear_miles(s: pd.Series) -> pd.Series:
+    """Enteros con punto como separador de miles."""
+    return s.astype("int64").map("{:,}".format).str.replace(",", ".", regex=False)
+
+
+def formatear_decimal(s: pd.Series, decimales: int = 2) -> pd.Series:
+    """Números con coma decimal y 'decimales' cifras (sin separador de miles)."""
+    return s.round(decimales).map(f"{{:.{decimales}f}}".format).str.replace(".", ",", regex=False)
+
+
+def formatear_tabla(
+    df: pd.DataFrame,
+    col_pct: str = "%",
+    decimales_pct: int = 2,
+    sufijo_pct: str = "",
+) -> pd.DataFrame:
+    """
+    Devuelve una copia de la tabla lista para el documento:
+    columnas numéricas con miles con punto y la columna 'col_pct' con coma decimal
+    (más 'sufijo_pct', p. ej. '%'). Las columnas no numéricas se dejan igual.
+    """
+    from pandas.api.types import is_numeric_dtype
+
+    out = df.copy()
+    for c in out.columns:
+        if not is_numeric_dtype(out[c]):
+            continue
+        if c == col_pct:
+            out[c] = formatear_decimal(out[c], decimales_pct) + sufijo_pct
+        else:
+            out[c] = formatear_miles(out[c])
+    return out
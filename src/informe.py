@@ -0,0 +1,648 @@
+# src/informe.py
+"""
+Informe declarativo: especificación TOML (config/informe.toml) + ejecutor por grafo de dependencias.
+
+Cada sección se descompone en etapas que forman un grafo:
+
+    datos ──> <sec>.tabla ──> <sec>.prompt ──> <sec>.texto ──┐
+                   └──────────────────────────────────────────┴──> documento
+
+- Las etapas de datos (tabla, payload + prompt) corren en un pool de hilos.
+- Los llamados al modelo corren en un pool aparte (max_concurrencia_llm), así un
+  llamado lento no bloquea la preparación de las demás secciones.
+- Si una etapa falla, solo se omiten las que dependen de ella: el resto del
+  informe sigue y el documento se arma con lo que haya terminado.
+- Con incremental=True cada sección guarda la huella de sus entradas (tabla agregada,
+  plantillas de prompt, payload y parámetros del modelo) en un manifest junto a la
+  salida. Al regenerar, las secciones con la misma huella reutilizan el texto guardado
+  sin llamar al modelo, y si nada cambió no se reescribe el documento.
+- Con al_fragmento los textos se piden en flujo, y con vista_previa cada sección se
+  escribe en un documento de vista previa apenas termina (uso interactivo).
+
+Uso:
+    spec = cargar_spec("config/informe.toml")
+    resultado = generar_informe(spec, df)     # df fila a fila, agregado con CASOS o CuboImprod
+    resultado = generar_informe(spec, "data/improd.parquet")   # archivo, agregado con spec.motor
+    resultado.errores                         # {etapa: excepción}
+    resultado.reutilizadas                    # etapas servidas desde el manifest (incremental)
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import importlib
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+from config.trazas import contar_filas, span
+
+RUTA_SPEC = "config/informe.toml"
+
+ALIAS_TABLAS = {
+    "nivel_dependencia": "src.tabla_niveldep:construir_tabla1",
+    "top_dependencias": "src.tabla_top:construir_tabla_top_dependencias",
+}
+ALIAS_PAYLOADS = {
+    "resumen": "src.prompt_payloads:construir_payload_resumen",
+    "top_dependencias": "src.prompt_payloads:construir_payload_top_dependencias",
+}
+
+
+# ---------------------------------------------------------------------------
+# Especificación
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Seccion:
+    nombre: str
+    tabla: str                                  # alias o "modulo:funcion" (recibe cubo, filtro_improd)
+    filtro_improd: Optional[str] = None
+    nombre_tabla: Optional[str] = None
+    formato: dict = field(default_factory=dict)     # decimales_pct / sufijo_pct (TablaReporte)
+    payload: Optional[str] = None               # alias o "modulo:funcion" (recibe TablaReporte)
+    campos: Optional[List[str]] = None          # campos del payload que usa la plantilla
+    presupuesto_tokens: Optional[int] = None    # por defecto, el de [informe]
+    system: Optional[List[str]] = None          # ruta bajo prompts/ (p. ej. ["prompt_total", "system_v1.md"])
+    prompt: Optional[List[str]] = None
+    variables: dict = field(default_factory=dict)   # placeholder -> "{ruta.en.payload}" o literal
+    llm: dict = field(default_factory=dict)     # max_tokens, temperature, top_p, model, ...
+    marcador_texto: Optional[str] = None
+    marcador_tabla: Optional[str] = None
+
+    @property
+    def con_texto(self) -> bool:
+        return self.prompt is not None
+
+
+@dataclass
+class EspecInforme:
+    secciones: List[Seccion]
+    plantilla: Optional[str] = None
+    salida: Optional[str] = None
+    max_workers: int = 4
+    max_concurrencia_llm: int = 4
+    presupuesto_tokens: Optional[int] = None
+    incremental: bool = False       # reutilizar secciones sin cambios (manifest junto a la salida)
+    motor: str = "pandas"           # si 'datos' es una ruta CSV / Parquet: "pandas" o "duckdb"
+
+    def seccion(self, nombre: str) -> Seccion:
+        return next(s for s in self.secciones if s.nombre == nombre)
+
+
+def _desconocidas(datos: dict, clase, donde: str):
+    validas = {f.name for f in fields(clase)}
+    sobran = sorted(set(datos) - validas)
+    if sobran:
+        raise ValueError(f"Claves desconocidas en {donde}: {sobran}")
+
+
+def cargar_spec(ruta: str = RUTA_SPEC) -> EspecInforme:
+    """Lee y valida la especificación TOML del informe."""
+    with open(ruta, "rb") as f:
+        datos = tomllib.load(f)
+
+    general = dict(datos.get("informe", {}))
+    _desconocidas(general, EspecInforme, "[informe]")
+    secciones = []
+    for i, s in enumerate(datos.get("seccion", [])):
+        _desconocidas(s, Seccion, f"[[seccion]] #{i + 1}")
+        if "nombre" not in s or "tabla" not in s:
+            raise ValueError(f"[[seccion]] #{i + 1}: 'nombre' y 'tabla' son obligatorios.")
+        sec = Seccion(**s)
+        if sec.con_texto and not (sec.payload and sec.system):
+            raise ValueError(f"Sección '{sec.nombre}': con 'prompt' también se requieren 'payload' y 'system'.")
+        secciones.append(sec)
+
+    nombres = [s.nombre for s in secciones]
+    repetidas = sorted({n for n in nombres if nombres.count(n) > 1})
+    if repetidas:
+        raise ValueError(f"Secciones repetidas en {ruta}: {repetidas}")
+    if not secciones:
+        raise ValueError(f"{ruta} no declara secciones ([[seccion]]).")
+    return EspecInforme(secciones=secciones, **general)
+
+
+def _importar(ref: str, alias: dict) -> Callable:
+    ref = alias.get(ref, ref)
+    modulo, sep, nombre = ref.partition(":")
+    if not sep:
+        raise ValueError(f"Referencia inválida '{ref}': use un alias o 'modulo:funcion'.")
+    return getattr(importlib.import_module(modulo), nombre)
+
+
+def _resolver(valor, payload: dict):
+    """'{a.b}' -> payload['a']['b'] (dentro de un texto se sustituye como str)."""
+    if not isinstance(valor, str):
+        return valor
+
+    def _buscar(ruta: str):
+        v = payload
+        for parte in ruta.split("."):
+            v = v[parte]
+        return v
+
+    completo = re.fullmatch(r"\{([\w.]+)\}", valor)
+    if completo:
+        return _buscar(completo.group(1))
+    return re.sub(r"\{([\w.]+)\}", lambda m: str(_buscar(m.group(1))), valor)
+
+
+# ---------------------------------------------------------------------------
+# Ejecutor por grafo de dependencias
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Nodo:
+    nombre: str
+    fn: Callable[[Dict[str, Any]], Any]   # recibe {dependencia: valor} de las que terminaron bien
+    deps: Sequence[str] = ()
+    llm: bool = False                     # corre en el pool de llamados al modelo
+    tolerante: bool = False               # corre aunque fallen sus dependencias
+
+
+@dataclass
+class ResultadoNodo:
+    nombre: str
+    estado: str                           # 'ok' | 'error' | 'omitido'
+    valor: Any = None
+    error: Optional[BaseException] = None
+    segundos: float = 0.0
+
+
+def _orden_topologico(nodos: Dict[str, Nodo]) -> List[str]:
+    pendientes = {n: set(nodo.deps) for n, nodo in nodos.items()}
+    faltan = {d for deps in pendientes.values() for d in deps} - set(nodos)
+    if faltan:
+        raise ValueError(f"Dependencias inexistentes en el grafo: {sorted(faltan)}")
+    orden = []
+    listos = [n for n, deps in pendientes.items() if not deps]
+    while listos:
+        n = listos.pop()
+        orden.append(n)
+        for m, deps in pendientes.items():
+            if n in deps:
+                deps.discard(n)
+                if not deps and m not in orden and m not in listos:
+                    listos.append(m)
+    if len(orden) != len(nodos):
+        raise ValueError(f"El grafo tiene ciclos: {sorted(set(nodos) - set(orden))}")
+    return orden
+
+
+def ejecutar_grafo(
+    nodos: Sequence[Nodo],
+    max_workers: int = 4,
+    max_concurrencia_llm: int = 4,
+    al_terminar: Optional[Callable[[ResultadoNodo], None]] = None,
+) -> Dict[str, ResultadoNodo]:
+    """
+    Ejecuta los nodos respetando sus dependencias y con la máxima concurrencia posible.
+    Un error solo omite a los dependientes no tolerantes. 'al_terminar' se llama
+    (en el hilo coordinador) a medida que cada nodo termina.
+    """
+    por_nombre = {n.nombre: n for n in nodos}
+    if len(por_nombre) != len(nodos):
+        raise ValueError("Nombres de nodo repetidos en el grafo.")
+    _orden_topologico(por_nombre)
+
+    resultados: Dict[str, ResultadoNodo] = {}
+
+    def _correr(nodo: Nodo, entradas: dict) -> ResultadoNodo:
+        t0 = time.perf_counter()
+        try:
+            with span(f"informe.{nodo.nombre}") as s:
+                valor = nodo.fn(entradas)
+                s.anotar(filas=contar_filas(valor))
+            return ResultadoNodo(nodo.nombre, "ok", valor, segundos=time.perf_counter() - t0)
+        except Exception as e:
+            return ResultadoNodo(nodo.nombre, "error", error=e, segundos=time.perf_counter() - t0)
+
+    def _registrar(r: ResultadoNodo):
+        resultados[r.nombre] = r
+        if al_terminar:
+            al_terminar(r)
+
+    with ThreadPoolExecutor(max(1, max_workers), thread_name_prefix="informe-datos") as pool_datos, \
+         ThreadPoolExecutor(max(1, max_concurrencia_llm), thread_name_prefix="informe-llm") as pool_llm:
+        en_curso = {}
+
+        def _lanzar_listos():
+            for nodo in por_nombre.values():
+                if nodo.nombre in resultados or nodo.nombre in en_curso.values():
+                    continue
+                if not all(d in resultados for d in nodo.deps):
+                    continue
+                fallidas = [d for d in nodo.deps if resultados[d].estado != "ok"]
+                if fallidas and not nodo.tolerante:
+                    causa = resultados[fallidas[0]]
+                    _registrar(ResultadoNodo(nodo.nombre, "omitido", error=causa.error))
+                    continue
+                entradas = {d: resultados[d].valor for d in nodo.deps if resultados[d].estado == "ok"}
+                pool = pool_llm if nodo.llm else pool_datos
+                # copy_context: los spans del nodo quedan bajo el span actual (p. ej. informe.generar)
+                en_curso[pool.submit(contextvars.copy_context().run, _correr, nodo, entradas)] = nodo.nombre
+
+        _lanzar_listos()
+        while en_curso or len(resultados) < len(por_nombre):
+            if not en_curso:
+                _lanzar_listos()  # omitidos en cascada
+                continue
+            hechos, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+            for fut in hechos:
+                en_curso.pop(fut)
+                _registrar(fut.result())
+            _lanzar_listos()
+
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Regeneración incremental
+# ---------------------------------------------------------------------------
+
+VERSION_MANIFEST = 1
+
+
+def _huella(*partes) -> str:
+    base = json.dumps(partes, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def ruta_manifest(salida: str) -> Path:
+    """Manifest de la corrida junto a la salida: Informe.docx -> Informe.manifest.json."""
+    ruta = Path(salida)
+    return ruta.with_name(ruta.stem + ".manifest.json")
+
+
+class _Incremental:
+    """Manifest de la corrida anterior y lo reutilizado en la actual."""
+
+    def __init__(self, salida: str, reutilizar: bool = True):
+        self.salida = salida
+        self.ruta = ruta_manifest(salida)
+        self.previo: dict = {}
+        if reutilizar and self.ruta.exists():
+            try:
+                previo = json.loads(self.ruta.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                previo = {}  # ilegible: se regenera todo
+            if previo.get("version") == VERSION_MANIFEST:
+                self.previo = previo
+        self.reutilizadas: List[str] = []
+        self.huella_documento: Optional[str] = None
+
+    def seccion_previa(self, nombre: str) -> dict:
+        return self.previo.get("secciones", {}).get(nombre, {})
+
+    def guardar(self, spec: EspecInforme, resultados: Dict[str, ResultadoNodo], usar_llm: bool):
+        def _ok(nombre):
+            r = resultados.get(nombre)
+            return r is not None and r.estado == "ok"
+
+        secciones = {}
+        for sec in spec.secciones:
+            registro = {}
+            if _ok(f"{sec.nombre}.tabla"):
+                registro["tabla"] = resultados[f"{sec.nombre}.tabla"].valor.huella()
+            if _ok(f"{sec.nombre}.huella") and _ok(f"{sec.nombre}.texto"):
+                registro["huella"] = resultados[f"{sec.nombre}.huella"].valor
+                registro["texto"] = resultados[f"{sec.nombre}.texto"].valor
+            elif not usar_llm:
+                # corrida sin modelo: se conservan los textos anteriores para la próxima
+                previa = self.seccion_previa(sec.nombre)
+                registro.update({k: previa[k] for k in ("huella", "texto") if k in previa})
+            secciones[sec.nombre] = registro
+
+        manifest = {
+            "version": VERSION_MANIFEST,
+            "generado": datetime.now().isoformat(timespec="seconds"),
+            "salida": str(self.salida),
+            "documento": self.huella_documento,
+            "secciones": secciones,
+        }
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta.with_name(self.ruta.name + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.ruta)
+
+
+# ---------------------------------------------------------------------------
+# Informe
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ResultadoInforme:
+    nodos: Dict[str, ResultadoNodo]
+    salida: Optional[str] = None
+    reutilizadas: List[str] = field(default_factory=list)   # p. ej. ['quejas.texto', 'documento']
+
+    def _valor(self, nombre: str):
+        r = self.nodos.get(nombre)
+        return r.valor if r is not None and r.estado == "ok" else None
+
+    def tabla(self, seccion: str):
+        """TablaReporte de la sección (None si falló)."""
+        return self._valor(f"{seccion}.tabla")
+
+    def texto(self, seccion: str) -> Optional[str]:
+        return self._valor(f"{seccion}.texto")
+
+    @property
+    def documento(self):
+        return self._valor("documento")
+
+    @property
+    def errores(self) -> Dict[str, BaseException]:
+        """Etapas con error (no incluye las omitidas por arrastre)."""
+        return {n: r.error for n, r in self.nodos.items() if r.estado == "error"}
+
+    @property
+    def ok(self) -> bool:
+        return all(r.estado == "ok" for r in self.nodos.values())
+
+
+def _etapa_tabla(sec: Seccion):
+    def fn(entradas):
+        from src.tabla_reporte import TablaReporte
+        constructor = _importar(sec.tabla, ALIAS_TABLAS)
+        args = {"filtro_improd": sec.filtro_improd} if sec.filtro_improd is not None else {}
+        return TablaReporte.desde_dataframe(
+            constructor(entradas["datos"], **args), nombre=sec.nombre_tabla or sec.nombre, **sec.formato
+        )
+    return fn
+
+
+def _etapa_prompt(sec: Seccion, presupuesto: Optional[int]):
+    def fn(entradas):
+        from prompts.loader import get_registro
+        from src.compactar_payload import compactar_payload
+        tabla = entradas[f"{sec.nombre}.tabla"]
+        payload = _importar(sec.payload, ALIAS_PAYLOADS)(tabla)
+        compacto = compactar_payload(payload, presupuesto, campos=sec.campos)
+        variables = {k: _resolver(v, payload) for k, v in sec.variables.items()}
+        registro = get_registro()
+        system = registro.obtener(*sec.system).texto
+        usuario = registro.render(*sec.prompt, payload=compacto.json, **variables)
+        return system, usuario
+    return fn
+
+
+def _etapa_huella(sec: Seccion, presupuesto: Optional[int]):
+    """Huella de lo que determina el texto: tabla agregada, plantillas, payload y modelo."""
+    def fn(entradas):
+        from config.openai_config import modelo_por_defecto
+        from prompts.loader import get_registro
+        registro = get_registro()
+        return _huella(
+            entradas[f"{sec.nombre}.tabla"].huella(),
+            registro.obtener(*sec.system).texto,
+            registro.obtener(*sec.prompt).texto,
+            [sec.payload, sec.campos, presupuesto, sec.variables],
+            sec.llm,
+            sec.llm.get("model") or modelo_por_defecto(),
+        )
+    return fn
+
+
+def _etapa_texto(sec: Seccion, limite_llm=None, incremental: Optional[_Incremental] = None,
+                 al_fragmento: Optional[Callable[[str, str], None]] = None):
+    """
+    Texto de la sección. Con 'al_fragmento' el llamado es en flujo (stream=True) y cada
+    fragmento se entrega como al_fragmento(seccion, delta) apenas llega (desde el hilo del llamado).
+    """
+    def _llamar(system, usuario):
+        if al_fragmento is None:
+            from config.openai_config import openai_response
+            return openai_response(system, usuario, **sec.llm)
+        from config.openai_config import openai_response_stream
+        flujo = openai_response_stream(system, usuario, **sec.llm)
+        for delta in flujo:
+            al_fragmento(sec.nombre, delta)
+        return flujo.texto
+
+    def fn(entradas):
+        if incremental is not None:
+            previa = incremental.seccion_previa(sec.nombre)
+            if "texto" in previa and previa.get("huella") == entradas[f"{sec.nombre}.huella"]:
+                incremental.reutilizadas.append(f"{sec.nombre}.texto")
+                if al_fragmento is not None:
+                    al_fragmento(sec.nombre, previa["texto"])
+                return previa["texto"]
+        system, usuario = entradas[f"{sec.nombre}.prompt"]
+        if limite_llm is None:
+            return _llamar(system, usuario)
+        with limite_llm:
+            return _llamar(system, usuario)
+    return fn
+
+
+def _marcadores(spec: EspecInforme, valores: dict):
+    """({marcador: texto}, {marcador: TablaReporte}) de las secciones con tabla / texto en 'valores'."""
+    textos, tablas = {}, {}
+    for sec in spec.secciones:
+        tabla = valores.get(f"{sec.nombre}.tabla")
+        if sec.marcador_tabla and tabla is not None and not tabla.vacia:
+            tablas[sec.marcador_tabla] = tabla
+        texto = valores.get(f"{sec.nombre}.texto")
+        if sec.marcador_texto and texto is not None:
+            textos[sec.marcador_texto] = texto
+    return textos, tablas
+
+
+def _guardar_atomico(ruta: Path, escribir: Callable[[str], None]):
+    """Escribe en un temporal y reemplaza: quien abre la vista previa nunca ve un archivo a medias."""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.tmp")
+    escribir(str(tmp))
+    tmp.replace(ruta)
+
+
+class _VistaPrevia:
+    """
+    Documento (<ruta>.docx) y texto (<ruta>.md) que se reescriben cada vez que termina una
+    sección (su texto, o su tabla si no lleva texto), sin esperar al resto del informe.
+    """
+
+    def __init__(self, spec: EspecInforme, plantilla: Optional[str], ruta: str, usar_llm: bool):
+        self.spec = spec
+        self.plantilla = plantilla
+        base = Path(ruta)
+        if base.suffix.lower() in (".docx", ".md"):
+            base = base.with_suffix("")
+        self.docx = base.with_name(base.name + ".docx")
+        self.md = base.with_name(base.name + ".md")
+        self.con_texto = {sec.nombre: sec.con_texto and usar_llm for sec in spec.secciones}
+        self.valores: Dict[str, Any] = {}
+        self.terminadas: List[str] = []
+
+    def al_terminar(self, r: ResultadoNodo):
+        seccion, _, etapa = r.nombre.rpartition(".")
+        if seccion not in self.con_texto or etapa not in ("tabla", "texto") or seccion in self.terminadas:
+            return
+        if r.estado == "ok":
+            self.valores[r.nombre] = r.valor
+            if etapa == "tabla" and self.con_texto[seccion]:
+                return  # la sección termina con su texto
+        self.terminadas.append(seccion)  # también si falló: se muestra lo que haya
+        try:
+            with span("informe.vista_previa", seccion=seccion):
+                self._escribir()
+        except Exception:
+            pass  # la vista previa nunca detiene el informe (el error queda en la traza)
+
+    def _escribir(self):
+        textos, tablas = _marcadores(self.spec, self.valores)
+        if self.plantilla:
+            from docx import Document
+            from src.docx_utils import aplicar_placeholders
+            doc = Document(self.plantilla)
+            aplicar_placeholders(doc, textos=textos, tablas={m: t.formateada() for m, t in tablas.items()})
+            _guardar_atomico(self.docx, doc.save)
+
+        bloques = []
+        for sec in self.spec.secciones:
+            if sec.nombre not in self.terminadas:
+                continue
+            bloques.append(f"## {sec.nombre_tabla or sec.nombre}")
+            texto = self.valores.get(f"{sec.nombre}.texto")
+            if texto:
+                bloques.append(texto)
+            tabla = self.valores.get(f"{sec.nombre}.tabla")
+            if tabla is not None and not tabla.vacia:
+                f = tabla.formateada()
+                bloques.append(f.to_string(index=any(n is not None for n in f.index.names)))
+        pendientes = [s for s in self.con_texto if s not in self.terminadas]
+        if pendientes:
+            bloques.append(f"(en preparación: {', '.join(pendientes)})")
+        contenido = "\n\n".join(bloques) + "\n"
+        _guardar_atomico(self.md, lambda ruta: Path(ruta).write_text(contenido, encoding="utf-8"))
+
+
+def _etapa_documento(spec: EspecInforme, plantilla, salida, incremental: Optional[_Incremental] = None):
+    def fn(entradas):
+        from docx import Document
+        from src.docx_utils import aplicar_placeholders
+        textos, tablas = _marcadores(spec, entradas)
+
+        if incremental is not None:
+            incremental.huella_documento = _huella(
+                hashlib.sha256(Path(plantilla).read_bytes()).hexdigest(),
+                {m: t.huella() for m, t in tablas.items()},
+                textos,
+            )
+            if (salida and Path(salida).exists()
+                    and incremental.huella_documento == incremental.previo.get("documento")):
+                incremental.reutilizadas.append("documento")
+                return Document(salida)
+
+        doc = Document(plantilla)
+        aplicar_placeholders(doc, textos=textos, tablas={m: t.formateada() for m, t in tablas.items()})
+        if salida:
+            Path(salida).parent.mkdir(parents=True, exist_ok=True)
+            with span("docx.guardar"):
+                doc.save(salida)
+        return doc
+    return fn
+
+
+def construir_grafo(spec: EspecInforme, datos, usar_llm: bool = True,
+                    plantilla: Optional[str] = None, salida: Optional[str] = None,
+                    limite_llm=None, incremental: Optional[_Incremental] = None,
+                    al_fragmento: Optional[Callable[[str, str], None]] = None) -> List[Nodo]:
+    """
+    Nodos del informe: datos (cubo), y por sección tabla -> prompt -> texto; al final el documento.
+    'limite_llm' (opcional) es un semáforo compartido que envuelve cada llamado al modelo
+    (p. ej. entre procesos, ver src.lote_informes).
+    Con 'incremental' se agrega <sec>.huella (tabla -> huella -> texto) para reutilizar textos.
+    Con 'al_fragmento' los textos se piden en flujo (ver _etapa_texto).
+    """
+    def _datos(_):
+        from src.cubo_improd import como_cubo
+        return como_cubo(datos, spec.motor)
+
+    nodos = [Nodo("datos", _datos)]
+    finales = []
+    for sec in spec.secciones:
+        presupuesto = sec.presupuesto_tokens if sec.presupuesto_tokens is not None else spec.presupuesto_tokens
+        nodos.append(Nodo(f"{sec.nombre}.tabla", _etapa_tabla(sec), deps=["datos"]))
+        finales.append(f"{sec.nombre}.tabla")
+        if sec.con_texto:
+            nodos.append(Nodo(f"{sec.nombre}.prompt", _etapa_prompt(sec, presupuesto), deps=[f"{sec.nombre}.tabla"]))
+            if usar_llm:
+                deps = [f"{sec.nombre}.prompt"]
+                if incremental is not None:
+                    nodos.append(Nodo(f"{sec.nombre}.huella", _etapa_huella(sec, presupuesto), deps=[f"{sec.nombre}.tabla"]))
+                    deps.append(f"{sec.nombre}.huella")
+                nodos.append(Nodo(f"{sec.nombre}.texto", _etapa_texto(sec, limite_llm, incremental, al_fragmento),
+                                  deps=deps, llm=True))
+                finales.append(f"{sec.nombre}.texto")
+
+    plantilla = plantilla or spec.plantilla
+    if plantilla:
+        nodos.append(Nodo("documento", _etapa_documento(spec, plantilla, salida or spec.salida, incremental),
+                          deps=finales, tolerante=True))
+    return nodos
+
+
+def generar_informe(
+    spec: EspecInforme,
+    datos,
+    usar_llm: bool = True,
+    plantilla: Optional[str] = None,
+    salida: Optional[str] = None,
+    al_terminar: Optional[Callable[[ResultadoNodo], None]] = None,
+    limite_llm=None,
+    incremental: Optional[bool] = None,
+    al_fragmento: Optional[Callable[[str, str], None]] = None,
+    vista_previa: Optional[str] = None,
+) -> ResultadoInforme:
+    """
+    Genera el informe descrito por 'spec' a partir de 'datos' (DataFrame fila a fila,
+    agregado con CASOS, CuboImprod o ruta CSV / Parquet que se agrega con spec.motor). usar_llm=False arma solo tablas y prompts.
+    'plantilla' / 'salida' reemplazan las de la especificación.
+    'incremental' (por defecto, el de la especificación) reutiliza los textos de las secciones
+    cuya huella no cambió desde la corrida anterior (ver ruta_manifest); requiere una salida.
+    Con la especificación incremental, incremental=False regenera todo y actualiza el manifest.
+    Entrega progresiva (uso interactivo):
+    - 'al_fragmento(seccion, delta)': los textos se piden en flujo y cada fragmento se
+      entrega apenas llega (se llama desde los hilos de los llamados al modelo).
+    - 'vista_previa': ruta base (p. ej. salidas/Informe.vista); cada sección que termina se escribe en
+      <vista_previa>.docx (sobre la plantilla) y <vista_previa>.md sin esperar al resto.
+    """
+    destino = salida or spec.salida
+    reutilizar = spec.incremental if incremental is None else incremental
+    estado = _Incremental(destino, reutilizar) if destino and (spec.incremental or reutilizar) else None
+
+    nodos = construir_grafo(spec, datos, usar_llm, plantilla, salida, limite_llm, estado, al_fragmento)
+    ganchos = [al_terminar] if al_terminar else []
+    if vista_previa:
+        vista = _VistaPrevia(spec, plantilla or spec.plantilla, vista_previa, usar_llm)
+        if destino and vista.docx.resolve() == Path(destino).resolve():
+            raise ValueError("La vista previa no puede escribirse sobre la salida del informe.")
+        ganchos.insert(0, vista.al_terminar)
+
+    def _al_terminar(r: ResultadoNodo):
+        for gancho in ganchos:
+            gancho(r)
+
+    with span("informe.generar", secciones=len(spec.secciones), usar_llm=usar_llm):
+        resultados = ejecutar_grafo(nodos, spec.max_workers, spec.max_concurrencia_llm,
+                                    _al_terminar if ganchos else None)
+    documento = resultados.get("documento")
+    ok = documento is not None and documento.estado == "ok"
+    if estado is not None and ok:
+        estado.guardar(spec, resultados, usar_llm)
+    return ResultadoInforme(resultados, destino if ok else None,
+                            reutilizadas=estado.reutilizadas if estado is not None else [])
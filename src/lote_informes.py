@@ -0,0 +1,274 @@
+# src/lote_informes.py
+"""
+Generación en lote: el mismo informe (config/informe.toml) para cada entidad
+(DEPENDENCIA_TITULAR o TIPO_DEPENDENCIA) y fecha de corte.
+
+- Los datos se cargan UNA vez, se ordenan por la columna de entidad y se escriben
+  en un archivo Arrow IPC. Cada proceso lo abre como memory map (sin copiar ni
+  serializar el DataFrame por tarea) y toma su entidad como un slice contiguo.
+- Tabla, payload y docx de cada entidad corren en un pool de procesos.
+- Los llamados al modelo pasan por un semáforo compartido entre procesos
+  (max_concurrencia_llm) y cada proceso usa su parte del presupuesto RPM/TPM.
+- Sale un .docx por entidad y un manifest.json con el resultado de la corrida.
+
+Uso:
+    manifest = generar_lote(cargar_spec(), df, columna="DEPENDENCIA_TITULAR", cortes=["2024-12-31"])
+
+    python -m src.lote_informes --csv data/sample_improd.csv --columna TIPO_DEPENDENCIA --sin-llm
+
+Requiere pyarrow.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+from src.cubo_improd import DIMENSIONES
+from src.informe import RUTA_SPEC, EspecInforme, cargar_spec, generar_informe
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+COLUMNAS_ENTIDAD = ["DEPENDENCIA_TITULAR", "TIPO_DEPENDENCIA"]
+MANIFEST = "manifest.json"
+
+
+@dataclass
+class TareaLote:
+    entidad: str
+    inicio: int          # fila inicial de la entidad en la tabla Arrow compartida
+    filas: int
+    corte: Optional[str]  # fecha ISO: solo FECHA_PGN <= corte (None = sin corte)
+    archivo: str
+
+
+# ---------------------------------------------------------------------------
+# Datos compartidos (Arrow IPC + memory map)
+# ---------------------------------------------------------------------------
+
+def _escribir_arrow(df: pd.DataFrame, columna: str, con_fecha: bool, ruta: Path) -> dict:
+    """Escribe las columnas necesarias ordenadas por 'columna'; devuelve {entidad: (inicio, filas)}."""
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    from src.cubo_improd import _normalizar_anio
+
+    cols = list(dict.fromkeys(DIMENSIONES + [columna] + (["FECHA_PGN"] if con_fecha else [])))
+    faltan = [c for c in cols if c not in df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas para el lote: {faltan}")
+    d = df.loc[df[columna].notna(), cols].copy()
+    d[columna] = d[columna].astype(str)
+    d["ANIO_PGN"] = _normalizar_anio(d["ANIO_PGN"])
+    if con_fecha:
+        d["FECHA_PGN"] = pd.to_datetime(d["FECHA_PGN"], errors="coerce")
+    d = d.sort_values(columna, kind="stable").reset_index(drop=True)
+
+    tabla = pa.Table.from_pandas(d, preserve_index=False)
+    with pa.OSFile(str(ruta), "wb") as f, pa.ipc.new_file(f, tabla.schema) as w:
+        w.write_table(tabla)
+
+    valores, inicios = np.unique(d[columna].to_numpy(dtype=object), return_index=True)
+    fines = list(inicios[1:]) + [len(d)]
+    return {v: (int(i), int(f - i)) for v, i, f in zip(valores, inicios, fines)}
+
+
+_compartido = {}
+
+
+def _iniciar_worker(ruta_arrow: str, spec: EspecInforme, limite_llm, procesos: int, usar_llm: bool,
+                    incremental: Optional[bool]):
+    import pyarrow as pa
+    _compartido["tabla"] = pa.ipc.open_file(pa.memory_map(ruta_arrow, "r")).read_all()
+    _compartido["spec"] = spec
+    _compartido["limite_llm"] = limite_llm
+    _compartido["usar_llm"] = usar_llm
+    _compartido["incremental"] = incremental
+    if usar_llm:
+        from config.openai_config import repartir_presupuesto
+        repartir_presupuesto(procesos)
+
+
+def _generar_entidad(tarea: TareaLote) -> dict:
+    t0 = time.perf_counter()
+    registro = {"entidad": tarea.entidad, "corte": tarea.corte, "archivo": None}
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        sub = _compartido["tabla"].slice(tarea.inicio, tarea.filas)
+        if tarea.corte:
+            tipo = sub.schema.field("FECHA_PGN").type
+            sub = sub.filter(pc.less_equal(sub["FECHA_PGN"], pa.scalar(datetime.fromisoformat(tarea.corte), tipo)))
+        df = sub.to_pandas()
+
+        r = generar_informe(
+            _compartido["spec"], df, usar_llm=_compartido["usar_llm"],
+            salida=tarea.archivo, limite_llm=_compartido["limite_llm"],
+            incremental=_compartido["incremental"],
+        )
+        omitidas = [n for n, x in r.nodos.items() if x.estado == "omitido"]
+        registro.update(
+            archivo=r.salida,
+            estado="ok" if r.ok else ("parcial" if r.salida else "error"),
+            filas=len(df),
+            errores={n: f"{type(e).__name__}: {e}" for n, e in r.errores.items()},
+            omitidas=omitidas,
+            reutilizadas=r.reutilizadas,
+        )
+    except Exception as e:
+        registro.update(estado="error", errores={"lote": f"{type(e).__name__}: {e}"})
+    registro["segundos"] = round(time.perf_counter() - t0, 3)
+    return registro
+
+
+# ---------------------------------------------------------------------------
+# Lote
+# ---------------------------------------------------------------------------
+
+def _nombre_archivo(entidad: str, corte: Optional[str], usados: set) -> str:
+    base = unicodedata.normalize("NFKD", entidad).encode("ascii", "ignore").decode()
+    base = re.sub(r"[^A-Za-z0-9]+", "_", base).strip("_")[:80] or "entidad"
+    if corte:
+        base += f"_{corte}"
+    nombre, i = base, 2
+    while nombre.lower() in usados:
+        nombre, i = f"{base}_{i}", i + 1
+    usados.add(nombre.lower())
+    return f"{nombre}.docx"
+
+
+def _escribir_manifest(salida_dir: Path, manifest: dict):
+    tmp = salida_dir / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(salida_dir / MANIFEST)
+
+
+def generar_lote(
+    spec: EspecInforme,
+    datos: pd.DataFrame,
+    columna: str = "DEPENDENCIA_TITULAR",
+    entidades: Optional[Iterable[str]] = None,
+    cortes: Optional[Iterable[Optional[str]]] = None,
+    salida_dir: str = "salidas/lote",
+    procesos: Optional[int] = None,
+    max_concurrencia_llm: int = 4,
+    usar_llm: bool = True,
+    incremental: Optional[bool] = None,
+) -> dict:
+    """
+    Un informe por (entidad, corte) en un pool de 'procesos' (por defecto, núcleos disponibles).
+    - 'datos': DataFrame fila a fila (con FECHA_PGN si se usan cortes).
+    - 'entidades': valores de 'columna' (None = todos los presentes en los datos).
+    - 'cortes': fechas ISO ('2024-12-31'); None = un único informe sin corte por entidad.
+    - 'incremental': ver generar_informe (cada .docx lleva su propio manifest de huellas).
+    Devuelve el manifest (también se escribe en salida_dir/manifest.json).
+    """
+    import multiprocessing as mp
+
+    if columna not in COLUMNAS_ENTIDAD:
+        raise ValueError(f"'columna' debe ser una de {COLUMNAS_ENTIDAD}")
+    if not spec.plantilla:
+        raise ValueError("La especificación no define [informe].plantilla.")
+    cortes = [c if c is None else str(c) for c in (cortes or [None])]
+    for c in cortes:
+        if c is not None:
+            datetime.fromisoformat(c)  # valida el formato antes de lanzar el pool
+    procesos = max(1, procesos or os.cpu_count() or 1)
+    salida = Path(salida_dir)
+    salida.mkdir(parents=True, exist_ok=True)
+
+    inicio = datetime.now()
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="lote_improd_") as tmp:
+        ruta_arrow = Path(tmp) / "datos.arrow"
+        rangos = _escribir_arrow(datos, columna, any(cortes), ruta_arrow)
+
+        pedidas = list(rangos) if entidades is None else [str(e) for e in entidades]
+        sin_datos = [e for e in pedidas if e not in rangos]
+        usados, tareas = set(), []
+        for entidad in pedidas:
+            if entidad in rangos:
+                ini, n = rangos[entidad]
+                for corte in cortes:
+                    archivo = str(salida / _nombre_archivo(entidad, corte, usados))
+                    tareas.append(TareaLote(entidad, ini, n, corte, archivo))
+
+        registros: List[dict] = [
+            {"entidad": e, "corte": None, "archivo": None, "estado": "sin_datos"} for e in sin_datos
+        ]
+        with mp.Manager() as manager:
+            limite = manager.BoundedSemaphore(max(1, max_concurrencia_llm)) if usar_llm else None
+            with ProcessPoolExecutor(
+                max_workers=min(procesos, max(1, len(tareas))),
+                initializer=_iniciar_worker,
+                initargs=(str(ruta_arrow), spec, limite, procesos, usar_llm, incremental),
+            ) as pool:
+                futuros = [pool.submit(_generar_entidad, t) for t in tareas]
+                for fut in as_completed(futuros):
+                    registros.append(fut.result())
+
+    orden = {(t.entidad, t.corte): i for i, t in enumerate(tareas)}
+    registros.sort(key=lambda r: orden.get((r["entidad"], r["corte"]), -1))
+    estados = [r["estado"] for r in registros]
+    manifest = {
+        "inicio": inicio.isoformat(timespec="seconds"),
+        "fin": datetime.now().isoformat(timespec="seconds"),
+        "segundos": round(time.perf_counter() - t0, 3),
+        "columna": columna,
+        "cortes": cortes,
+        "procesos": procesos,
+        "usar_llm": usar_llm,
+        "plantilla": spec.plantilla,
+        "secciones": [s.nombre for s in spec.secciones],
+        "resumen": {e: estados.count(e) for e in sorted(set(estados))},
+        "informes": registros,
+    }
+    _escribir_manifest(salida, manifest)
+    return manifest
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Informes IMPROD en lote (uno por entidad y corte).")
+    fuente = parser.add_mutually_exclusive_group(required=True)
+    fuente.add_argument("--csv", help="CSV fila a fila (p. ej. data/sample_improd.csv)")
+    fuente.add_argument("--snapshot", help="Snapshot Parquet (ver tables.snapshot_improd)")
+    parser.add_argument("--spec", default=RUTA_SPEC)
+    parser.add_argument("--columna", default="DEPENDENCIA_TITULAR", choices=COLUMNAS_ENTIDAD)
+    parser.add_argument("--entidades", nargs="*", help="por defecto, todas")
+    parser.add_argument("--cortes", nargs="*", help="fechas ISO de corte (FECHA_PGN <= corte)")
+    parser.add_argument("--salida", default="salidas/lote")
+    parser.add_argument("--procesos", type=int)
+    parser.add_argument("--max-concurrencia-llm", type=int, default=4)
+    parser.add_argument("--sin-llm", action="store_true", help="solo tablas (sin llamados al modelo)")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        from tables.esquema_improd import cargar_archivo_improd
+        df = cargar_archivo_improd(args.csv, list(dict.fromkeys(DIMENSIONES + [args.columna, "FECHA_PGN"])))
+    else:
+        from tables.snapshot_improd import cargar_snapshot
+        df = cargar_snapshot(args.snapshot)
+
+    manifest = generar_lote(
+        cargar_spec(args.spec), df, columna=args.columna, entidades=args.entidades, cortes=args.cortes,
+        salida_dir=args.salida, procesos=args.procesos,
+        max_concurrencia_llm=args.max_concurrencia_llm, usar_llm=not args.sin_llm,
+    )
+    print(f"{len(manifest['informes'])} informes en {manifest['segundos']} s | {manifest['resumen']}")
+    print(f"Manifest: {Path(args.salida) / MANIFEST}")
+    return 0 if set(manifest["resumen"]) <= {"ok"} else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
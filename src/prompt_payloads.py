@@ -1,9 +1,12 @@
 # src/prompt_payloads.py
 import json
-import pandas as pd
-import numpy as np
+
+from config.trazas import trazar
+from src.tabla_reporte import TablaReporte, detectar_roles
 
 def _to_number(v):
+    import numpy as np
+    import pandas as pd
     # Convierte '40.818'->40818 ; '82,30'->82.3 ; '100'->100 ; deja texto si no aplica
     if isinstance(v, (int, float, np.integer, np.floating)) and not pd.isna(v):
         return float(v)
@@ -17,19 +20,39 @@ def _to_number(v):
             return v
     return v
 
+def _leer_tabla(tabla):
+    """
+    Normaliza la entrada de los payload builders y devuelve (rows, nombre, col_hasta, year_cols).
+    - TablaReporte / DataFrame numérico: se leen los números directamente.
+    - str (JSON) o dict de dataframe_a_json_tabla: compatibilidad; las celdas de conteo y %
+      se convierten con _to_number (formato '40.818' / '82,30').
+    """
+    import pandas as pd
+    if isinstance(tabla, pd.DataFrame):
+        tabla = TablaReporte.desde_dataframe(tabla)
+    if isinstance(tabla, TablaReporte):
+        return tabla.filas(), tabla.nombre, tabla.col_hasta, list(tabla.cols_anio)
+
+    data = json.loads(tabla) if isinstance(tabla, str) else tabla
+    rows = pd.DataFrame(data["rows"])
+    roles = detectar_roles(data["columns"])
+    for c in [roles["hasta"], *roles["anios"], roles["total"], roles["pct"]]:
+        if c and c in rows.columns:
+            rows[c] = rows[c].apply(_to_number)
+    return rows, data.get("name"), roles["hasta"], roles["anios"]
+
+@trazar("payload.resumen")
 def construir_payload_resumen(json_tabla) -> dict:
     """
-    Acepta str (JSON) o dict con la tabla unida (TERRITORIAL + CENTRAL).
+    Acepta TablaReporte (o DataFrame numérico) con la tabla unida (TERRITORIAL + CENTRAL);
+    también str (JSON) o dict exportados con dataframe_a_json_tabla.
     Espera columnas de años (incl. 'HASTA ...'), 'Total general' y '%'.
     Fila subtotal por bloque renombrada como 'TOTAL TERRITORIAL' / 'TOTAL CENTRAL'.
     Calcula totales por nivel, % mayores a 4 años y el año con más casos (global y por nivel).
     """
-    data = json.loads(json_tabla) if isinstance(json_tabla, str) else json_tabla
-    rows = pd.DataFrame(data["rows"])
-    cols = list(data["columns"])
+    rows, nombre, col_hasta, year_cols = _leer_tabla(json_tabla)
 
     # detectar 'HASTA ...'
-    col_hasta = next((c for c in cols if str(c).strip().upper().startswith("HASTA ")), None)
     if not col_hasta:
         raise ValueError("No se encontró una columna que empiece por 'HASTA '.")
 
@@ -41,21 +64,6 @@ def construir_payload_resumen(json_tabla) -> dict:
     if nivel_col is None or dep_col is None:
         raise ValueError("Faltan columnas de nivel/dependencia en el JSON.")
 
-    # numericidad
-    rows["Total general"] = rows["Total general"].apply(_to_number)
-    rows[col_hasta] = rows[col_hasta].apply(_to_number)
-
-    # columnas año YYYY
-    year_cols = []
-    for c in cols:
-        cs = str(c).strip()
-        if cs.upper().startswith("HASTA ") or cs in ("Total general", "%"):
-            continue
-        if cs.isdigit() and len(cs) == 4:
-            year_cols.append(cs)
-    for yc in year_cols:
-        rows[yc] = rows[yc].apply(_to_number)
-
     def subtotal_nivel(nivel: str):
         mask_total = (rows[nivel_col] == nivel) & (rows[dep_col].str.upper() == f"TOTAL {nivel}".upper())
         if mask_total.any():
@@ -128,7 +136,7 @@ def construir_payload_resumen(json_tabla) -> dict:
                           for n in niveles_payload]
 
     return {
-        "tabla": data.get("name", "tabla"),
+        "tabla": nombre or "tabla",
         "corte_hasta": col_hasta,
         "total_activos": int(total_general),
         "mayores_4_anhos": int(mayores_4),
@@ -138,15 +146,17 @@ def construir_payload_resumen(json_tabla) -> dict:
         "niveles": niveles_payload
     }
 
+@trazar("payload.top_dependencias")
 def construir_payload_top_dependencias(json_tabla) -> dict:
     """
     Payload para tabla TOP 10 por DEPENDENCIA_TITULAR (sin niveles).
+    Acepta TablaReporte (o DataFrame numérico); también str (JSON) o dict exportados.
     Espera columnas: 'HASTA ...', años YYYY, 'Total general' y '%'.
-    El índice exportado debe contener la dependencia (ej. 'DEPENDENCIAS').
+    El índice debe contener la dependencia (ej. 'DEPENDENCIAS').
     """
-    data = json.loads(json_tabla) if isinstance(json_tabla, str) else json_tabla
-    rows = pd.DataFrame(data["rows"])
-    cols = [str(c) for c in data["columns"]]
+    import pandas as pd
+
+    rows, nombre, col_hasta, year_cols = _leer_tabla(json_tabla)
 
     # --- detectar columna dependencia (viene del índice exportado por utils)
     dep_col_candidates = ["DEPENDENCIAS", "DEPENDENCIA_TITULAR", "index", "index_0"]
@@ -154,30 +164,12 @@ def construir_payload_top_dependencias(json_tabla) -> dict:
     if dep_col is None:
         raise ValueError("No se encontró la columna de dependencia en el JSON (ej. 'DEPENDENCIAS').")
 
-    # --- detectar columna 'HASTA ...' (bucket de antigüedad)
-    col_hasta = next((c for c in cols if str(c).strip().upper().startswith("HASTA ")), None)
+    # --- columna 'HASTA ...' (bucket de antigüedad)
     if not col_hasta:
         raise ValueError("No se encontró una columna que empiece por 'HASTA ' en la tabla TOP 10.")
 
-    # --- detectar columnas de años YYYY (excluye HASTA, Total y %)
-    year_cols = []
-    for c in cols:
-        cs = str(c).strip()
-        if cs.upper().startswith("HASTA ") or cs in ("Total general", "%"):
-            continue
-        if cs.isdigit() and len(cs) == 4:
-            year_cols.append(cs)
-
-    # --- limpiar numéricos
-    if "Total general" in rows.columns:
-        rows["Total general"] = rows["Total general"].apply(_to_number)
-    if "%" in rows.columns:
-        rows["%"] = rows["%"].apply(_to_number)
-    # columnas anuales
-    rows[col_hasta] = rows[col_hasta].apply(_to_number)
-    for yc in year_cols:
-        if yc in rows.columns:
-            rows[yc] = rows[yc].apply(_to_number)
+    # --- columnas de años YYYY presentes en las filas
+    year_cols = [yc for yc in year_cols if yc in rows.columns]
 
     # --- quitar filas no deseadas si existieran (por si alguien metió un TOTAL GENERAL)
     mask_total = rows[dep_col].astype(str).str.upper().eq("TOTAL GENERAL")
@@ -227,7 +219,7 @@ def construir_payload_top_dependencias(json_tabla) -> dict:
             })
 
     return {
-        "tabla": data.get("name", "top_dependencias"),
+        "tabla": nombre or "top_dependencias",
         "corte_hasta": col_hasta,
         "total_top": int(total_top),
         "ranking_top10": ranking,            # lista de 10: {dependencia, total, pct}
@@ -0,0 +1,389 @@
+# src/servicio_informes.py
+"""
+Servicio HTTP local (stdlib, ThreadingHTTPServer) que mantiene el pipeline "caliente":
+la especificación, el cubo de conteos (y los sub-cubos ya filtrados), las plantillas de
+prompt, la plantilla docx y los clientes de Azure OpenAI / BD quedan en memoria entre
+pedidos, así un informe a demanda no paga imports, carga de datos ni agregación.
+
+Endpoints (JSON):
+    GET  /salud                      estado, versión de los datos y combinaciones del cubo
+    GET  /metricas                   latencia por endpoint (n, media, p50, p95, máx, errores)
+    POST /informe     {"filtros": {"DEPENDENCIA_TITULAR": "..."}, "usar_llm": true, "descargar": false}
+    POST /seccion     {"seccion": "quejas", "filtro_improd": "quejas", "filtros": {...}, "usar_llm": true}
+    POST /refrescar   vuelve a cargar los datos y reemplaza el cubo (los pedidos en curso terminan
+                      con la versión anterior)
+
+'filtros' son igualdades sobre las dimensiones del cubo (IMPROD, NIVEL_TERRITORIAL,
+TIPO_DEPENDENCIA, DEPENDENCIA_TITULAR, ANIO_PGN); además 'filtro_improd' (IMPROD contiene).
+Filtros sin casos en el cubo responden 404; pedidos mal formados, 400.
+
+Uso:
+    python -m src.servicio_informes --fuente data/sample_improd.csv --puerto 8765
+    python -m src.servicio_informes --fuente bd                      # conteos agregados en la BD
+    python -m src.servicio_informes --fuente data/improd.parquet --motor duckdb --sin-llm
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from config.trazas import span
+from src.cubo_improd import DIMENSIONES, CuboImprod
+from src.informe import RUTA_SPEC, EspecInforme, cargar_spec, generar_informe
+
+FUENTE_BD = "bd"
+MAX_SUBCUBOS = 64
+VENTANA_METRICAS = 1000
+
+
+def cargar_cubo(fuente: str, motor: str = "pandas") -> CuboImprod:
+    """
+    Cubo desde la fuente del servicio:
+    - "bd": conteos agregados en el servidor (tables.consultas_sql.cargar_conteos_improd);
+    - carpeta: snapshot Parquet (tables.snapshot_improd), solo las dimensiones;
+    - .sqlite: almacén incremental de conteos (tables.conteos_incrementales);
+    - archivo CSV / Parquet: src.cubo_improd.cubo_desde_archivo con 'motor'.
+    """
+    if fuente == FUENTE_BD:
+        from tables.consultas_sql import cargar_conteos_improd
+        return CuboImprod.desde_conteos(cargar_conteos_improd(DIMENSIONES))
+    if Path(fuente).is_dir():
+        from tables.snapshot_improd import cargar_snapshot
+        return CuboImprod.desde_df(cargar_snapshot(fuente, columnas=DIMENSIONES))
+    if Path(fuente).suffix.lower() == ".sqlite":
+        from tables.conteos_incrementales import AlmacenConteos
+        return AlmacenConteos(fuente).cubo()
+    from src.cubo_improd import cubo_desde_archivo
+    return cubo_desde_archivo(fuente, motor)
+
+
+class _Metricas:
+    """Latencias de los últimos VENTANA_METRICAS pedidos por endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._datos = {}
+
+    def registrar(self, ruta: str, segundos: float, error: bool):
+        with self._lock:
+            d = self._datos.setdefault(ruta, {"n": 0, "errores": 0, "ventana": deque(maxlen=VENTANA_METRICAS)})
+            d["n"] += 1
+            d["errores"] += error
+            d["ventana"].append(segundos)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            salida = {}
+            for ruta, d in self._datos.items():
+                v = sorted(d["ventana"])
+
+                def _q(q):
+                    return round(v[min(len(v) - 1, int(q * len(v)))], 4)
+                salida[ruta] = {
+                    "n": d["n"], "errores": d["errores"], "media_s": round(sum(v) / len(v), 4),
+                    "p50_s": _q(0.5), "p95_s": _q(0.95), "max_s": round(v[-1], 4),
+                }
+            return salida
+
+
+def _normalizar_filtros(filtros: Optional[dict]) -> dict:
+    """Valida que los filtros sean dimensiones del cubo; ANIO_PGN como texto (igual que _normalizar_anio)."""
+    filtros = dict(filtros or {})
+    desconocidas = sorted(set(filtros) - set(DIMENSIONES))
+    if desconocidas:
+        raise ValueError(f"Filtros sobre columnas que no son dimensiones del cubo: {desconocidas}")
+    if filtros.get("ANIO_PGN") is not None:
+        filtros["ANIO_PGN"] = str(filtros["ANIO_PGN"]).strip()  # 2022 -> '2022'
+    return filtros
+
+
+def _nombre_salida(filtros: dict, filtro_improd: Optional[str]) -> str:
+    """
+    Archivo del informe para un pedido: columnas y valores de los filtros, el filtro IMPROD
+    y una huella corta del pedido (dos pedidos distintos nunca comparten archivo).
+    """
+    import hashlib
+    from src.lote_informes import _nombre_archivo
+    partes = [f"{c}_{v}" for c, v in sorted(filtros.items())]
+    if filtro_improd:
+        partes.append(f"IMPROD_{filtro_improd}")
+    huella = hashlib.sha256(
+        json.dumps([sorted(filtros.items()), filtro_improd], ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:8]
+    return _nombre_archivo("_".join(partes) or "general", huella, set())
+
+
+class ServicioInformes:
+    """
+    Estado compartido por los pedidos. El cubo se reemplaza entero al refrescar (bajo lock),
+    y cada pedido trabaja con la versión que tomó al empezar.
+    """
+
+    def __init__(self, spec: EspecInforme, fuente: str, motor: str = "pandas",
+                 salida_dir: str = "salidas/servicio", usar_llm: bool = True, max_informes: int = 2):
+        self.spec = spec
+        self.fuente = fuente
+        self.motor = motor
+        self.salida_dir = Path(salida_dir)
+        self.usar_llm = usar_llm
+        self.metricas = _Metricas()
+        self._lock = threading.Lock()
+        self._refresco = threading.Lock()
+        self._informes = threading.BoundedSemaphore(max(1, max_informes))
+        self._subcubos: OrderedDict = OrderedDict()
+        self._por_salida = {}   # un lock por archivo de salida (dos pedidos iguales no escriben a la vez)
+        self.version = 0
+        self.cubo: Optional[CuboImprod] = None
+        self.cargado: Optional[str] = None
+
+    # -- datos ---------------------------------------------------------------
+
+    def refrescar(self) -> dict:
+        """Carga la fuente de nuevo y publica el cubo nuevo; un solo refresco a la vez."""
+        with self._refresco:
+            t0 = time.perf_counter()
+            with span("servicio.refrescar", fuente=self.fuente, motor=self.motor) as s:
+                cubo = cargar_cubo(self.fuente, self.motor)
+                s.anotar(filas=len(cubo.conteos))
+            with self._lock:
+                self.cubo = cubo
+                self.version += 1
+                self.cargado = time.strftime("%Y-%m-%dT%H:%M:%S")
+                self._subcubos.clear()
+            return {"version": self.version, "combinaciones": len(cubo.conteos),
+                    "casos": cubo.total(), "segundos": round(time.perf_counter() - t0, 3)}
+
+    def calentar(self):
+        """Imports, plantilla docx, prompts y clientes listos antes del primer pedido."""
+        from docx import Document
+        from prompts.loader import get_registro
+        if self.spec.plantilla:
+            Document(self.spec.plantilla)
+        registro = get_registro()
+        for sec in self.spec.secciones:
+            if sec.con_texto:
+                for ruta in (sec.system, sec.prompt):
+                    if ruta:
+                        registro.obtener(*ruta)
+        if self.usar_llm:
+            from config.openai_config import _get_client
+            _get_client()
+        if self.fuente == FUENTE_BD:
+            from config.db_config import get_engine
+            get_engine()
+
+    def subcubo(self, filtros: Optional[dict] = None, filtro_improd: Optional[str] = None):
+        """(versión, cubo) restringido a 'filtros'; los sub-cubos recientes quedan en memoria."""
+        filtros = _normalizar_filtros(filtros)
+        with self._lock:
+            version, cubo = self.version, self.cubo
+        if cubo is None:
+            raise RuntimeError("El servicio todavía no tiene datos cargados.")
+        if not filtros and not filtro_improd:
+            return version, cubo
+        clave = (version, filtro_improd, tuple(sorted(filtros.items())))
+        with self._lock:
+            if clave in self._subcubos:
+                self._subcubos.move_to_end(clave)
+                return version, self._subcubos[clave]
+        sub = CuboImprod(cubo.filtrar(filtro_improd, **filtros))
+        if sub.conteos.empty:
+            raise LookupError(f"No hay casos para los filtros {filtros}"
+                              + (f" con IMPROD que contenga {filtro_improd!r}" if filtro_improd else "") + ".")
+        with self._lock:
+            self._subcubos[clave] = sub
+            while len(self._subcubos) > MAX_SUBCUBOS:
+                self._subcubos.popitem(last=False)
+        return version, sub
+
+    # -- pedidos -------------------------------------------------------------
+
+    def _usar_llm(self, pedido: dict) -> bool:
+        return self.usar_llm and bool(pedido.get("usar_llm", True))
+
+    def informe(self, pedido: dict) -> dict:
+        filtros = _normalizar_filtros(pedido.get("filtros"))
+        filtro_improd = pedido.get("filtro_improd")
+        version, cubo = self.subcubo(filtros, filtro_improd)
+        salida = self.salida_dir / _nombre_salida(filtros, filtro_improd)
+        with self._lock:
+            lock_salida = self._por_salida.setdefault(str(salida), threading.Lock())
+        documento = None
+        with self._informes, lock_salida:
+            r = generar_informe(self.spec, cubo, usar_llm=self._usar_llm(pedido), salida=str(salida))
+            if pedido.get("descargar") and r.salida:
+                documento = Path(r.salida).read_bytes()  # antes de soltar el lock: otro pedido podría reescribirlo
+        return {
+            "documento": documento,
+            "version_datos": version,
+            "salida": r.salida,
+            "ok": r.ok,
+            "errores": {n: f"{type(e).__name__}: {e}" for n, e in r.errores.items()},
+            "reutilizadas": r.reutilizadas,
+            "textos": {s.nombre: r.texto(s.nombre) for s in self.spec.secciones if s.con_texto},
+        }
+
+    def seccion(self, pedido: dict) -> dict:
+        nombre = pedido.get("seccion")
+        try:
+            sec = self.spec.seccion(nombre)
+        except StopIteration:
+            raise ValueError(f"Sección desconocida: {nombre!r} "
+                             f"(disponibles: {[s.nombre for s in self.spec.secciones]})") from None
+        if "filtro_improd" in pedido:
+            sec = replace(sec, filtro_improd=pedido["filtro_improd"])
+        version, cubo = self.subcubo(pedido.get("filtros"))
+        if sec.filtro_improd and cubo.total(sec.filtro_improd) == 0:
+            raise LookupError(f"No hay casos con IMPROD que contenga {sec.filtro_improd!r} para la sección {sec.nombre!r}.")
+        spec = replace(self.spec, secciones=[sec], plantilla=None, salida=None, incremental=False)
+        r = generar_informe(spec, cubo, usar_llm=self._usar_llm(pedido))
+        tabla = r.tabla(sec.nombre)
+        return {
+            "version_datos": version,
+            "seccion": sec.nombre,
+            "filtro_improd": sec.filtro_improd,
+            "ok": r.ok,
+            "errores": {n: f"{type(e).__name__}: {e}" for n, e in r.errores.items()},
+            "tabla": json.loads(tabla.a_json()) if tabla is not None else None,
+            "texto": r.texto(sec.nombre),
+        }
+
+    def salud(self) -> dict:
+        with self._lock:
+            cubo = self.cubo
+            return {
+                "ok": cubo is not None,
+                "version_datos": self.version,
+                "cargado": self.cargado,
+                "fuente": self.fuente,
+                "motor": self.motor,
+                "combinaciones": len(cubo.conteos) if cubo is not None else 0,
+                "subcubos_en_memoria": len(self._subcubos),
+            }
+
+
+def _manejador(servicio: ServicioInformes):
+    rutas_get = {"/salud": lambda _: servicio.salud(), "/metricas": lambda _: servicio.metricas.resumen()}
+    rutas_post = {
+        "/informe": servicio.informe,
+        "/seccion": servicio.seccion,
+        "/refrescar": lambda _: servicio.refrescar(),
+    }
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, codigo: int, cuerpo: bytes, tipo: str = "application/json; charset=utf-8",
+                       extra: Optional[dict] = None):
+            self.send_response(codigo)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _json(self, codigo: int, datos):
+            self._responder(codigo, json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8"))
+
+        def _atender(self, rutas: dict, leer_cuerpo: bool):
+            ruta = self.path.split("?", 1)[0]
+            t0 = time.perf_counter()
+            codigo = 500
+            try:
+                if ruta not in rutas:
+                    codigo = 404
+                    return self._json(404, {"error": f"Ruta desconocida: {ruta}"})
+                pedido = {}
+                if leer_cuerpo:
+                    largo = int(self.headers.get("Content-Length") or 0)
+                    pedido = json.loads(self.rfile.read(largo) or b"{}") if largo else {}
+                    if not isinstance(pedido, dict):
+                        raise ValueError("El cuerpo debe ser un objeto JSON.")
+                with span(f"servicio.{ruta.strip('/')}"):
+                    respuesta = rutas[ruta](pedido)
+                codigo = 200
+                documento = respuesta.pop("documento", None)  # bytes del docx si se pidió 'descargar'
+                if documento is not None:
+                    return self._responder(
+                        200, documento,
+                        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                        {"Content-Disposition": f'attachment; filename="{Path(respuesta["salida"]).name}"'},
+                    )
+                if leer_cuerpo:
+                    respuesta["segundos"] = round(time.perf_counter() - t0, 3)
+                return self._json(200, respuesta)
+            except (ValueError, KeyError, TypeError) as e:
+                codigo = 400
+                return self._json(400, {"error": f"{type(e).__name__}: {e}"})
+            except LookupError as e:  # filtros válidos sin casos en el cubo
+                codigo = 404
+                return self._json(404, {"error": str(e)})
+            except Exception as e:
+                codigo = 503 if isinstance(e, RuntimeError) else 500
+                return self._json(codigo, {"error": f"{type(e).__name__}: {e}"})
+            finally:
+                if ruta != "/metricas":
+                    servicio.metricas.registrar(ruta if ruta in rutas else "(desconocida)",
+                                                time.perf_counter() - t0, codigo >= 400)
+
+        def do_GET(self):
+            self._atender(rutas_get, leer_cuerpo=False)
+
+        def do_POST(self):
+            self._atender(rutas_post, leer_cuerpo=True)
+
+        def log_message(self, formato, *args):
+            pass  # las latencias quedan en /metricas (y en la traza si TRAZAS está activa)
+
+    return Manejador
+
+
+def crear_servidor(servicio: ServicioInformes, host: str = "127.0.0.1", puerto: int = 8765) -> ThreadingHTTPServer:
+    """Servidor listo para serve_forever(); puerto=0 elige uno libre (ver server_address)."""
+    servidor = ThreadingHTTPServer((host, puerto), _manejador(servicio))
+    servidor.daemon_threads = True
+    return servidor
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Servicio local de informes IMPROD (datos y clientes en memoria).")
+    parser.add_argument("--fuente", required=True, help='CSV / Parquet, carpeta de snapshot, almacén .sqlite o "bd"')
+    parser.add_argument("--motor", default="pandas", choices=["pandas", "duckdb"])
+    parser.add_argument("--spec", default=RUTA_SPEC)
+    parser.add_argument("--salida", default="salidas/servicio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--max-informes", type=int, default=2, help="informes completos en paralelo")
+    parser.add_argument("--sin-llm", action="store_true", help="solo tablas (sin llamados al modelo)")
+    args = parser.parse_args(argv)
+
+    servicio = ServicioInformes(cargar_spec(args.spec), args.fuente, args.motor, args.salida,
+                                usar_llm=not args.sin_llm, max_informes=args.max_informes)
+    t0 = time.perf_counter()
+    datos = servicio.refrescar()
+    servicio.calentar()
+    servidor = crear_servidor(servicio, args.host, args.puerto)
+    host, puerto = servidor.server_address[:2]
+    print(f"Datos: {datos['combinaciones']:,} combinaciones, {datos['casos']:,} casos "
+          f"(listo en {time.perf_counter() - t0:.1f} s)")
+    print(f"Servicio en http://{host}:{puerto} (Ctrl+C para detener)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+# src/tabla_reporte.py
+"""
+Contrato numérico de las tablas del informe.
+
+TablaReporte lleva la tabla con valores numéricos, los niveles del índice y el rol
+de cada columna (bucket 'HASTA ...', columnas de año, total y %), de punta a punta:
+- los payload builders leen los números directamente (sin formatear → JSON → parsear);
+- el formato de presentación solo se aplica al renderizar (docx) con formateada().
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional
+
+from src.formato_tablas import formatear_tabla
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+COL_TOTAL = "Total general"
+COL_PCT = "%"
+
+
+def detectar_roles(columnas) -> dict:
+    """Clasifica columnas: 'hasta' (primer 'HASTA ...'), 'anios' (YYYY), 'total' y 'pct'."""
+    cols = [str(c).strip() for c in columnas]
+    col_hasta = next((c for c in cols if c.upper().startswith("HASTA ")), None)
+    anios = [c for c in cols if c.isdigit() and len(c) == 4]
+    return {
+        "hasta": col_hasta,
+        "anios": anios,
+        "total": COL_TOTAL if COL_TOTAL in cols else None,
+        "pct": COL_PCT if COL_PCT in cols else None,
+    }
+
+
+@dataclass
+class TablaReporte:
+    datos: pd.DataFrame
+    nombre: Optional[str] = None
+    col_hasta: Optional[str] = None
+    cols_anio: List[str] = field(default_factory=list)
+    col_total: Optional[str] = COL_TOTAL
+    col_pct: Optional[str] = COL_PCT
+    decimales_pct: int = 2   # presentación del % (2 -> '82,30'; 0 -> '82')
+    sufijo_pct: str = ""     # p. ej. '%' en la tabla TOP
+
+    @classmethod
+    def desde_dataframe(cls, df: pd.DataFrame, nombre: Optional[str] = None, **formato) -> "TablaReporte":
+        """Envuelve la salida numérica de un constructor de tablas detectando los roles de columna."""
+        datos = df.copy()
+        datos.columns = [str(c) for c in datos.columns]
+        datos.columns.name = df.columns.name
+        roles = detectar_roles(datos.columns)
+        return cls(
+            datos=datos,
+            nombre=nombre,
+            col_hasta=roles["hasta"],
+            cols_anio=roles["anios"],
+            col_total=roles["total"],
+            col_pct=roles["pct"],
+            **formato,
+        )
+
+    @property
+    def vacia(self) -> bool:
+        return self.datos.empty
+
+    @property
+    def index_names(self) -> List[str]:
+        return [n if n is not None else f"index_{i}" for i, n in enumerate(self.datos.index.names)]
+
+    @property
+    def cols_conteo(self) -> List[str]:
+        """Columnas de conteo en orden: bucket HASTA, años y total."""
+        return [c for c in [self.col_hasta, *self.cols_anio, self.col_total] if c]
+
+    def filas(self) -> pd.DataFrame:
+        """Tabla con el índice como columnas (mismos nombres que en el JSON exportado)."""
+        t = self.datos.copy()
+        t.index = t.index.set_names(self.index_names)
+        return t.reset_index()
+
+    def formateada(self) -> pd.DataFrame:
+        """Copia con formato de presentación (miles con punto, % con coma) para el docx."""
+        return formatear_tabla(
+            self.datos, col_pct=self.col_pct, decimales_pct=self.decimales_pct, sufijo_pct=self.sufijo_pct
+        )
+
+    def huella(self) -> str:
+        """sha256 de la tabla agregada y su formato (cambia solo si cambia lo que se publica)."""
+        import hashlib
+        base = "\n".join([
+            repr((self.nombre, self.decimales_pct, self.sufijo_pct, self.datos.index.names)),
+            self.datos.to_csv(lineterminator="\n"),
+        ])
+        return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+    def a_json(self, **kwargs) -> str:
+        """JSON numérico de la tabla (ver src.utils.dataframe_a_json_tabla)."""
+        from src.utils import dataframe_a_json_tabla
+        return dataframe_a_json_tabla(self.datos, nombre_tabla=self.nombre or "tabla", **kwargs)
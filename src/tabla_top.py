@@ -1,21 +1,30 @@
-import pandas as pd
+from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
+from config.trazas import trazar
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+@trazar("tabla.top_dependencias")
 def construir_tabla_top_dependencias(df: pd.DataFrame, filtro_improd: str = "disciplinarios") -> pd.DataFrame:
     """
     TOP 10 de DEPENDENCIAS por total, discriminado por ANIO_PGN tal cual
     (valores como 'HASTA 2021', '2022', '2023', ...). Sin fila TOTAL GENERAL.
-    El % es sobre el total mostrado (Top 10).
+    El % es sobre el total mostrado (Top 10), entero.
+    Devuelve valores numéricos. Acepta el DataFrame fila a fila, un CuboImprod o un agregado con CASOS.
     """
-    # 1) Filtrar por IMPROD
-    d = df[df["IMPROD"].str.contains(filtro_improd, case=False, na=False)].copy()
-    if d.empty:
-        return pd.DataFrame()
+    import pandas as pd
+    from src.cubo_improd import como_cubo
 
-    # 2) Usar ANIO_PGN tal cual (nada de astype(int))
-    d["_anio_bucket"] = d["ANIO_PGN"].astype(str).str.strip()
+    # 1-2) Cubo de conteos (ANIO_PGN ya normalizado como texto, sin astype(int))
+    cubo = como_cubo(df)
 
-    # 3) Crosstab
-    tabla = pd.crosstab(d["DEPENDENCIA_TITULAR"], d["_anio_bucket"])
+    # 3) Crosstab tomada del cubo con el filtro IMPROD
+    tabla = cubo.crosstab("DEPENDENCIA_TITULAR", "ANIO_PGN", filtro_improd)
+    if tabla.empty:
+        return pd.DataFrame()
 
     # 4) Asegurar orden de columnas
     orden = ["HASTA 2021", "2022", "2023", "2024", "2025"]
@@ -31,16 +40,8 @@ def construir_tabla_top_dependencias(df: pd.DataFrame, filtro_improd: str = "dis
     total = float(tabla["Total general"].sum())
     tabla["%"] = (tabla["Total general"] / total * 100).round(0).astype(int)
 
-    # 6) Etiquetas + formato
+    # 6) Etiquetas (el formato de miles y '%' se aplica al renderizar, ver TablaReporte.formateada)
     tabla.index.name = "DEPENDENCIAS"
     tabla.columns.name = "FECHA DE LA QUEJA"
 
-    def fmt_miles(x): 
-        try: return f"{int(x):,}".replace(",", ".")
-        except: return x
-
-    for c in orden + ["Total general"]:
-        tabla[c] = tabla[c].astype(int).map(fmt_miles)
-    tabla["%"] = tabla["%"].map(lambda v: f"{v:d}%")
-
-    return tabla
\ No newline at end of file
+    return tabla
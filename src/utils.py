@@ -10,8 +10,12 @@ Incluye:
 
 from __future__ import annotations
 import json
-import pandas as pd
-import numpy as np
+from typing import TYPE_CHECKING
+
+from config.trazas import trazar
+
+if TYPE_CHECKING:  # pandas/numpy se importan al usarse (arranque liviano)
+    import pandas as pd
 
 # --- helpers de orden ---
 def _ordenar_columnas(df: pd.DataFrame) -> pd.DataFrame:
@@ -29,6 +33,7 @@ def _ordenar_columnas(df: pd.DataFrame) -> pd.DataFrame:
 TOTAL_KEYS = {"total general", "total territorial", "total central", "total global"}
 
 def _mover_totales_al_final(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
     if isinstance(df.index, pd.MultiIndex):
         mask = pd.Series(
             [any(str(i).strip().lower() in TOTAL_KEYS for i in idx) for idx in df.index],
@@ -50,6 +55,8 @@ def _mover_totales_al_final(df: pd.DataFrame) -> pd.DataFrame:
 
 # --- coerción numérica segura (para tablas "bonitas") ---
 def _to_number_if_possible(v):
+    import numpy as np
+    import pandas as pd
     if isinstance(v, (int, float, np.integer, np.floating)) and not pd.isna(v):
         return int(v) if float(v).is_integer() else float(v)
     if isinstance(v, str):
@@ -64,9 +71,12 @@ def _to_number_if_possible(v):
     return v
 
 def _es_num(x):
+    import numpy as np
+    import pandas as pd
     return isinstance(x, (int, float, np.integer, np.floating)) and not pd.isna(x)
 
 # --- función principal ---
+@trazar("json.dataframe_a_json_tabla")
 def dataframe_a_json_tabla(
     df: pd.DataFrame,
     nombre_tabla: str = "tabla",
@@ -80,6 +90,7 @@ def dataframe_a_json_tabla(
     - Mueve filas TOTAL ... al final (TERRITORIAL/CENTRAL/GENERAL)
     - Si coerce_numeric_from_str=True, convierte '40.818' -> 40818 y '82,30' -> 82.3
     """
+    import pandas as pd
     t = df.copy()
     t = _ordenar_columnas(t)
     t = _mover_totales_al_final(t)
@@ -0,0 +1,95 @@
+# tables/consultas_duckdb.py
+"""
+Conteos IMPROD sobre archivos CSV / Parquet con DuckDB (motor embebido, fuera de memoria).
+
+Es la misma consulta que cargar_conteos_improd (SELECT <dimensiones>, COUNT(*) AS CASOS
+... GROUP BY <dimensiones>), pero leyendo los archivos directamente: DuckDB recorre los
+datos en paralelo con todos los núcleos y, si el agregado no cabe en 'memoria', lo
+vuelca a disco en 'dir_temporal'. El resultado se usa con CuboImprod.desde_conteos, así
+las tablas, payloads y el docx no cambian (ver src.cubo_improd.cubo_desde_archivo).
+
+Requiere duckdb (pip install duckdb).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config.trazas import span
+from tables.consultas_sql import COLUMNAS_IMPROD, COLUMNAS_REPORTE
+from tables.esquema_improd import NULOS_CSV
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("El motor DuckDB requiere duckdb (pip install duckdb).") from e
+    return duckdb
+
+
+def _lector(fuente) -> str:
+    """read_csv / read_parquet según la extensión; 'fuente' admite comodines (data/*.parquet)."""
+    rutas = [str(p) for p in fuente] if isinstance(fuente, (list, tuple)) else [str(fuente)]
+    sufijos = {Path(r).suffix.lower() for r in rutas}
+    lista = "[" + ", ".join("'" + r.replace("'", "''") + "'" for r in rutas) + "]"
+    if sufijos <= {".parquet", ".pq"}:
+        return f"read_parquet({lista})"
+    if sufijos <= {".csv", ".txt"}:
+        nulos = "[" + ", ".join("'" + n.replace("'", "''") + "'" for n in NULOS_CSV) + "]"
+        return f"read_csv({lista}, header = true, all_varchar = true, nullstr = {nulos})"
+    raise ValueError(f"Formato no soportado para el motor DuckDB: {sorted(sufijos)} (use .csv o .parquet)")
+
+
+def conectar_duckdb(memoria: str = None, dir_temporal: str = None, hilos: int = None):
+    """
+    Conexión en memoria configurada para agregados grandes:
+    - 'memoria': límite antes de volcar a disco (p. ej. "4GB"; por defecto, 80% de la RAM).
+    - 'dir_temporal': carpeta para el volcado (por defecto, la de DuckDB).
+    - 'hilos': por defecto, todos los núcleos.
+    """
+    con = _duckdb().connect(":memory:")
+    con.execute("SET preserve_insertion_order = false")  # el GROUP BY no necesita orden
+    if memoria:
+        con.execute("SET memory_limit = ?", [memoria])
+    if dir_temporal:
+        Path(dir_temporal).mkdir(parents=True, exist_ok=True)
+        con.execute("SET temp_directory = ?", [str(dir_temporal)])
+    if hilos:
+        con.execute("SET threads = ?", [int(hilos)])
+    return con
+
+
+def conteos_duckdb(fuente, columnas=None, filtro_improd: str = None,
+                   memoria: str = None, dir_temporal: str = None, hilos: int = None) -> pd.DataFrame:
+    """
+    Conteos agregados por 'columnas' (por defecto, COLUMNAS_REPORTE) leyendo 'fuente'
+    (ruta, comodín o lista de rutas .csv / .parquet). Mismo contrato que cargar_conteos_improd:
+    columna CASOS int64, nulos como grupo propio, 'filtro_improd' = IMPROD contiene el texto.
+    """
+    cols = list(columnas or COLUMNAS_REPORTE)
+    desconocidas = [c for c in cols if c not in COLUMNAS_IMPROD]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas para IMPROD_DISCIPLINARIO: {desconocidas}")
+
+    select = ", ".join(f'"{c}"' for c in cols)
+    query = f"SELECT {select}, COUNT(*) AS CASOS\nFROM {_lector(fuente)}"
+    params = []
+    if filtro_improd:
+        query += '\nWHERE contains(lower("IMPROD"), ?)'  # texto literal, sin comodines
+        params.append(filtro_improd.lower())
+    query += f"\nGROUP BY {select}"
+
+    with span("duckdb.conteos_improd", filtro_improd=filtro_improd) as s:
+        con = conectar_duckdb(memoria, dir_temporal, hilos)
+        try:
+            df = con.execute(query, params).df()
+        finally:
+            con.close()
+        df["CASOS"] = df["CASOS"].astype("int64")
+        s.anotar(filas=int(df["CASOS"].sum()), combinaciones=len(df))
+    return df
@@ -1,32 +1,282 @@
-from config.db_config import get_engine
-from sqlalchemy import text
-import pandas as pd
+from __future__ import annotations
+
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config.db_config import get_engine
+from config.trazas import span
+from tables.esquema_improd import ESQUEMA_IMPROD
+
+if TYPE_CHECKING:  # pandas y sqlalchemy se importan al usarse (arranque liviano)
+    import pandas as pd
+
+# Columnas de [EXT].[IMPROD_DISCIPLINARIO] en el orden de la consulta original (tipos en el esquema)
+COLUMNAS_IMPROD = list(ESQUEMA_IMPROD)
+
+# Columnas que realmente usan las secciones del informe (tabla por nivel y top de dependencias)
+COLUMNAS_REPORTE = ["IMPROD", "NIVEL_TERRITORIAL", "TIPO_DEPENDENCIA", "DEPENDENCIA_TITULAR", "ANIO_PGN"]
+
+
+def _patron_like(filtro_improd: str) -> str:
+    """Convierte el filtro IMPROD en un patrón LIKE literal ('contiene', sin distinguir mayúsculas)."""
+    s = filtro_improd.lower()
+    for ch in ("\\", "%", "_", "["):
+        s = s.replace(ch, "\\" + ch)
+    return f"%{s}%"
+
+
+def _consulta_improd(columnas=None, filtro_improd=None, condiciones=None, params=None, contar: bool = False):
+    """
+    Arma el SELECT sobre IMPROD_DISCIPLINARIO solo con las columnas pedidas.
+    El filtro IMPROD viaja como parámetro ligado (nunca concatenado en el SQL).
+    'condiciones' (opcional) son predicados SQL adicionales que se unen con AND;
+    sus valores deben venir en 'params'.
+    contar=True agrega COUNT(*) AS CASOS y GROUP BY por las columnas (agregado en el servidor).
+    """
+    from sqlalchemy import text
+
+    columnas = list(columnas or COLUMNAS_IMPROD)
+    desconocidas = [c for c in columnas if c not in COLUMNAS_IMPROD]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas para IMPROD_DISCIPLINARIO: {desconocidas}")
+
+    select = ",\n           ".join(f"[{c}]" for c in columnas)
+    if contar:
+        select += ",\n           COUNT(*) AS [CASOS]"
+    query = f"""
+    SELECT {select}
+    FROM [EXT].[IMPROD_DISCIPLINARIO]"""
+    params = dict(params or {})
+    where = list(condiciones or [])
+    if filtro_improd:
+        where.append("LOWER([IMPROD]) LIKE :patron_improd ESCAPE '\\'")
+        params["patron_improd"] = _patron_like(filtro_improd)
+    if where:
+        query += "\n    WHERE " + "\n      AND ".join(f"({w})" for w in where)
+    if contar:
+        query += "\n    GROUP BY " + ", ".join(f"[{c}]" for c in columnas)
+    return text(query + ";"), params
+
+
+def cargar_improd(particionar_por: str = None, particiones: int = None):
+    """
+    Extracción completa de IMPROD_DISCIPLINARIO.
+    Con 'particionar_por' ("ANIO_PGN" o "ID_CASO"; por defecto, la variable DB_PARTICIONAR_POR)
+    se lee por particiones en paralelo sobre varias conexiones (ver cargar_improd_particionado);
+    particionar_por="" fuerza una sola consulta.
+    """
+    import os
+    import pandas as pd
+
+    engine = get_engine()  # carga también el .env
+    if particionar_por is None:
+        particionar_por = os.getenv("DB_PARTICIONAR_POR", "").strip()
+    if particionar_por:
+        return cargar_improd_particionado(COLUMNAS_IMPROD, por=particionar_por, particiones=particiones)
+
+    query, params = _consulta_improd(COLUMNAS_IMPROD)
+    with span("sql.cargar_improd") as s:
+        with engine.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        s.anotar(filas=len(df))
+    return df
+
+
+def cargar_improd_delta(id_caso_desde=None, fecha_pgn_desde=None) -> pd.DataFrame:
+    """
+    Trae solo las filas posteriores a la marca de agua de un snapshot local:
+    ID_CASO > id_caso_desde  o  FECHA_PGN > fecha_pgn_desde.
+    Sin marca de agua equivale a cargar_improd().
+    """
+    import pandas as pd
+
+    partes, params = [], {}
+    if id_caso_desde is not None:
+        partes.append("[ID_CASO] > :id_caso_desde")
+        params["id_caso_desde"] = id_caso_desde
+    if fecha_pgn_desde is not None:
+        partes.append("[FECHA_PGN] > :fecha_pgn_desde")
+        params["fecha_pgn_desde"] = fecha_pgn_desde
+    condiciones = [" OR ".join(partes)] if partes else None
+
+    query, params = _consulta_improd(COLUMNAS_IMPROD, condiciones=condiciones, params=params)
+    with span("sql.cargar_improd_delta") as s:
+        engine = get_engine()
+        with engine.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        s.anotar(filas=len(df))
+    return df
+
+
+def iterar_improd(columnas=None, filtro_improd=None, chunksize: int = 100_000):
+    """
+    Lee IMPROD_DISCIPLINARIO por bloques de 'chunksize' filas (cursor en streaming).
+    - 'columnas' por defecto son COLUMNAS_REPORTE (solo lo que usan las tablas).
+    - 'filtro_improd' (opcional) filtra en el servidor: IMPROD contiene el texto.
+    Cada bloque es un DataFrame; nunca se materializa la tabla completa.
+    """
+    import pandas as pd
 
-def cargar_improd():
-    query = """
-    SELECT [ID_CASO],
-           [IUS],
-           [IUC],
-           [FECHA_PGN],
-           [FECHA_PRESCRIPCION],
-           [ESTADO_CASO],
-           [DEPENDENCIA_TITULAR],
-           [ETAPA_ACTUAL],
-           [NIVEL_TERRITORIAL],
-           [TIPO_DEPENDENCIA],
-           [ETAPA_PROCESO],
-           [ETAPA_HOMOLOGADA],
-           [RIESGO],
-           [IMPROD],
-           [ANIO_PGN]
-    FROM [EXT].[IMPROD_DISCIPLINARIO];
+    query, params = _consulta_improd(columnas or COLUMNAS_REPORTE, filtro_improd)
+    engine = get_engine()
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for bloque in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+            yield bloque
+
+
+def agregar_improd(columnas=None, filtro_improd=None, chunksize: int = 100_000) -> pd.DataFrame:
     """
+    Carga en streaming y acumula conteos por las columnas pedidas (columna 'CASOS').
+    Cada bloque se agrega y se suma al acumulado, de modo que la memoria depende
+    del número de combinaciones distintas y no del número de filas.
+    Los nulos se conservan como grupo propio (igual que en el DataFrame completo).
+    """
+    import pandas as pd
+
+    cols = list(columnas or COLUMNAS_REPORTE)
+    acumulado = pd.DataFrame(columns=cols + ["CASOS"])
+
+    with span("sql.agregar_improd", filtro_improd=filtro_improd) as s:
+        filas = 0
+        for bloque in iterar_improd(cols, filtro_improd, chunksize):
+            filas += len(bloque)
+            parcial = bloque.groupby(cols, dropna=False).size().rename("CASOS").reset_index()
+            if acumulado.empty:
+                acumulado = parcial
+                continue
+            acumulado = (
+                pd.concat([acumulado, parcial], ignore_index=True)
+                  .groupby(cols, dropna=False)["CASOS"].sum()
+                  .reset_index()
+            )
+        s.anotar(filas=filas, combinaciones=len(acumulado))
+
+    acumulado["CASOS"] = acumulado["CASOS"].astype("int64")
+    return acumulado
+
+
+def cargar_conteos_improd(columnas=None, filtro_improd=None) -> pd.DataFrame:
+    """
+    Conteos agregados en el servidor: SELECT <columnas>, COUNT(*) AS CASOS ... GROUP BY <columnas>.
+    - 'columnas' por defecto son COLUMNAS_REPORTE (las dimensiones del cubo).
+    - 'filtro_improd' (opcional) filtra en el servidor con parámetro ligado; sin filtro
+      el agregado sirve para todas las secciones (disciplinarios y quejas).
+    Por la red viajan unas miles de combinaciones en vez de todas las filas; el resultado
+    se usa directamente con CuboImprod.desde_conteos, construir_tabla1 y
+    construir_tabla_top_dependencias. Los nulos quedan como grupo propio (GROUP BY).
+    """
+    import pandas as pd
+
+    query, params = _consulta_improd(columnas or COLUMNAS_REPORTE, filtro_improd, contar=True)
+    with span("sql.cargar_conteos_improd", filtro_improd=filtro_improd) as s:
+        engine = get_engine()
+        with engine.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+        df["CASOS"] = df["CASOS"].astype("int64")
+        s.anotar(filas=int(df["CASOS"].sum()), combinaciones=len(df))
+    return df
+
+
+PARTICIONES_POR = ("ANIO_PGN", "ID_CASO")
+
+
+def _particiones_improd(conn, por: str, particiones: int, filtro_improd=None) -> list:
+    """
+    Condiciones [(condición SQL, params)] que cubren todas las filas sin solaparse:
+    - ANIO_PGN: una por valor distinto;
+    - ID_CASO: 'particiones' rangos del mismo ancho entre el mínimo y el máximo.
+    Los nulos de la columna van en una partición propia (IS NULL).
+    """
+    from sqlalchemy import text
+
+    where, params = "", {}
+    if filtro_improd:
+        where = "\n    WHERE LOWER([IMPROD]) LIKE :patron_improd ESCAPE '\\'"
+        params["patron_improd"] = _patron_like(filtro_improd)
+
+    if por == "ANIO_PGN":
+        valores = conn.execute(
+            text(f"SELECT DISTINCT [ANIO_PGN] FROM [EXT].[IMPROD_DISCIPLINARIO]{where};"), params
+        ).scalars().all()
+        lista = [("[ANIO_PGN] = :valor", {"valor": v}) for v in sorted(v for v in valores if v is not None)]
+        nulos = any(v is None for v in valores)
+    else:
+        fila = conn.execute(text(
+            "SELECT MIN([ID_CASO]) AS minimo, MAX([ID_CASO]) AS maximo, "
+            "SUM(CASE WHEN [ID_CASO] IS NULL THEN 1 ELSE 0 END) AS nulos "
+            f"FROM [EXT].[IMPROD_DISCIPLINARIO]{where};"
+        ), params).one()
+        lista = []
+        if fila.minimo is not None:
+            minimo, maximo = int(fila.minimo), int(fila.maximo)
+            ancho = -(-(maximo - minimo + 1) // max(1, particiones))
+            for desde in range(minimo, maximo + 1, ancho):
+                lista.append(("[ID_CASO] >= :desde AND [ID_CASO] < :hasta", {"desde": desde, "hasta": desde + ancho}))
+        nulos = bool(fila.nulos)
+    if nulos:
+        lista.append((f"[{por}] IS NULL", {}))
+    return lista
+
+
+def _concatenar(partes: list) -> pd.DataFrame:
+    """Concatena las particiones; una columna toda nula en una partición toma el tipo de las demás."""
+    import pandas as pd
+
+    con_filas = [p for p in partes if len(p)] or partes[:1]
+    for c in con_filas[0].columns:
+        tipos = {str(p[c].dtype): p[c].dtype for p in con_filas if p[c].notna().any()}
+        if len(tipos) == 1:
+            tipo = next(iter(tipos.values()))
+            for p in con_filas:
+                if p[c].dtype != tipo:
+                    p[c] = p[c].astype(tipo)
+    return pd.concat(con_filas, ignore_index=True)
+
+
+def cargar_improd_particionado(columnas=None, filtro_improd=None, por: str = "ANIO_PGN",
+                               particiones: int = None, hilos: int = None) -> pd.DataFrame:
+    """
+    Lee IMPROD_DISCIPLINARIO en particiones (por ANIO_PGN o por rangos de ID_CASO) que se
+    traen a la vez en un pool de hilos, cada una por su propia conexión del pool, y las concatena.
+    - 'particiones': número de rangos de ID_CASO (por defecto, DB_POOL_SIZE).
+    - 'hilos': lecturas simultáneas (por defecto, DB_POOL_SIZE).
+    Mismo resultado que la consulta completa (salvo el orden de las filas, que la consulta
+    original tampoco fija): sirve cuando una sola conexión limita la extracción.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    import pandas as pd
+    from config.db_config import opciones_pool
+
+    if por not in PARTICIONES_POR:
+        raise ValueError(f"Solo se puede particionar por {PARTICIONES_POR} (recibido: {por!r}).")
+    cols = list(columnas or COLUMNAS_IMPROD)
+    tamano_pool = opciones_pool()["pool_size"]
     engine = get_engine()
-    with engine.connect() as conn:
-        df = pd.read_sql_query(text(query), conn)
+
+    def _leer(condicion: str, valores: dict) -> pd.DataFrame:
+        query, params = _consulta_improd(cols, filtro_improd, [condicion], valores)
+        with span("sql.particion", condicion=condicion, **valores) as s:
+            with engine.connect() as conn:
+                df = pd.read_sql_query(query, conn, params=params)
+            s.anotar(filas=len(df))
+        return df
+
+    with span("sql.cargar_improd_particionado", por=por, filtro_improd=filtro_improd) as s:
+        with engine.connect() as conn:
+            lista = _particiones_improd(conn, por, particiones or tamano_pool, filtro_improd)
+        if not lista:  # tabla vacía: la consulta completa da las columnas
+            query, params = _consulta_improd(cols, filtro_improd)
+            with engine.connect() as conn:
+                return pd.read_sql_query(query, conn, params=params)
+        with ThreadPoolExecutor(max(1, hilos or tamano_pool), thread_name_prefix="improd-particion") as pool:
+            futuros = [pool.submit(contextvars.copy_context().run, _leer, c, v) for c, v in lista]
+            df = _concatenar([f.result() for f in futuros])
+        s.anotar(filas=len(df), particiones=len(lista))
     return df
 
+
 def exportar_improd_a_csv(ruta_csv: str = "data/sample_improd.csv"):
     """
     Ejecuta la consulta real a la BD y guarda un CSV demo.
@@ -41,4 +291,4 @@ def exportar_improd_a_csv(ruta_csv: str = "data/sample_improd.csv"):
     # Guardar CSV
     df.to_csv(ruta, index=False, encoding="utf-8-sig")
 
-    print(f"✅ CSV demo generado en: {ruta.resolve()}")
\ No newline at end of file
+    print(f"✅ CSV demo generado en: {ruta.resolve()}")
@@ -0,0 +1,352 @@
+# tables/conteos_incrementales.py
+"""
+Almacén persistente (SQLite) de los conteos del cubo IMPROD, mantenido con deltas por ID_CASO.
+
+En vez de volver a contar IMPROD_DISCIPLINARIO completo ante cada cambio, el almacén guarda:
+- conteos: CASOS por celda (IMPROD, NIVEL_TERRITORIAL, TIPO_DEPENDENCIA, DEPENDENCIA_TITULAR, ANIO_PGN);
+- casos:   la celda en la que cuenta cada ID_CASO (y su ESTADO_CASO).
+Un delta (altas, cambios y bajas por ID_CASO) resta el caso de su celda anterior y lo suma
+a la nueva, así el costo de un refresco depende del tamaño del delta y no del de la tabla.
+
+- 'estados' (opcional): solo cuentan los casos con ESTADO_CASO en ese conjunto; un cambio
+  de estado que saca (o mete) al caso resta (o suma) su celda. Por defecto cuentan todos,
+  igual que las tablas del informe.
+- verificar: compara el almacén con un recuento completo (del DataFrame fila a fila o,
+  sin él, de la tabla de casos) y devuelve las celdas que difieren.
+
+Uso:
+    almacen = AlmacenConteos("data/conteos_improd.sqlite")
+    almacen.reconstruir(cargar_improd(COLUMNAS_ALMACEN))       # una vez (carga completa)
+    almacen.aplicar_delta(leer_delta("delta.csv"))             # columnas ID_CASO, OPERACION, dimensiones
+    cubo = almacen.cubo()                                      # CuboImprod para las tablas
+    almacen.verificar(df).empty                                # True si coincide con el recuento
+
+    python -m tables.conteos_incrementales data/conteos_improd.sqlite --reconstruir data/improd.parquet
+    python -m tables.conteos_incrementales data/conteos_improd.sqlite --delta delta.csv --verificar data/improd.parquet
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from config.trazas import span
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+    from src.cubo_improd import CuboImprod
+
+# Mismas dimensiones que src.cubo_improd.DIMENSIONES (no se importa para no cargar src al arrancar)
+DIMENSIONES = ["IMPROD", "NIVEL_TERRITORIAL", "TIPO_DEPENDENCIA", "DEPENDENCIA_TITULAR", "ANIO_PGN"]
+COLUMNAS_ALMACEN = ["ID_CASO", "ESTADO_CASO"] + DIMENSIONES
+COL_OPERACION = "OPERACION"
+# OPERACION del delta: I (alta) y U (cambio) reemplazan la fila del caso; D (baja) la elimina
+OPERACIONES = {"I": "I", "INSERT": "I", "U": "U", "UPDATE": "U", "D": "D", "DELETE": "D"}
+_LOTE_IDS = 900  # parámetros por consulta (SQLite admite 999)
+
+
+def _clave(valores) -> str:
+    """Celda del cubo como texto JSON (los nulos son una celda más, igual que en el groupby)."""
+    return json.dumps(list(valores), ensure_ascii=False, separators=(",", ":"))
+
+
+def _sin_decimales(s: pd.Series) -> pd.Series:
+    """Números enteros leídos como float (p. ej. ANIO_PGN con nulos: 2024.0) -> Int64."""
+    import pandas as pd
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        return s.astype("Int64")
+    return s
+
+
+def _textos(s: pd.Series) -> list:
+    """Valores como texto sin espacios sobrantes (None para los nulos)."""
+    s = _sin_decimales(s)
+    return [None if v is None else str(v).strip() for v in s.astype(object).where(s.notna(), None)]
+
+
+def _claves(df: pd.DataFrame) -> list:
+    """
+    Clave de celda por fila: dimensiones como texto sin espacios sobrantes, igual que
+    tables.esquema_improd (las categorías del cargador) y CuboImprod (ANIO_PGN).
+    """
+    columnas = [_textos(df[c]) for c in DIMENSIONES]
+    return [_clave(fila) for fila in zip(*columnas)]
+
+
+def leer_delta(ruta) -> pd.DataFrame:
+    """
+    Lee un delta CSV / Parquet con los tipos del esquema (tables.esquema_improd).
+    Las bajas suelen traer las dimensiones vacías; leídas sin esquema convertirían
+    ANIO_PGN en float ('2024.0') y las altas / cambios caerían en otra celda.
+    """
+    import pandas as pd
+    from tables.esquema_improd import NULOS_CSV, _aplicar_esquema
+    ruta = Path(ruta)
+    sufijo = ruta.suffix.lower()
+    if sufijo in (".csv", ".txt"):
+        df = pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=NULOS_CSV)
+    elif sufijo in (".parquet", ".pq"):
+        df = pd.read_parquet(ruta)
+        for c in DIMENSIONES:
+            if c in df.columns:
+                df[c] = _sin_decimales(df[c])
+    else:
+        raise ValueError(f"Formato no soportado: {ruta} (use .csv o .parquet)")
+    if "ID_CASO" in df.columns:
+        df["ID_CASO"] = pd.to_numeric(df["ID_CASO"]).astype("Int64")
+    return _aplicar_esquema(df)
+
+
+class AlmacenConteos:
+    def __init__(self, ruta: str = "data/conteos_improd.sqlite", estados: Optional[Iterable[str]] = None):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS conteos (clave TEXT PRIMARY KEY, CASOS INTEGER NOT NULL)")
+            con.execute(
+                """CREATE TABLE IF NOT EXISTS casos (
+                       ID_CASO     INTEGER PRIMARY KEY,
+                       ESTADO_CASO TEXT,
+                       clave       TEXT            -- NULL: el caso existe pero no cuenta (estado)
+                   )"""
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS meta (nombre TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+            self._guardados = self._meta(con).get("estados")
+        # Con otros 'estados' que los guardados, el contenido no sirve hasta reconstruir()
+        self.estados = sorted({str(e).strip() for e in estados}) if estados is not None else self._guardados
+
+    def _validar_estados(self):
+        if self.estados != self._guardados:
+            raise ValueError(
+                f"El almacén {self.ruta} cuenta los estados {self._guardados}, no {self.estados}; use reconstruir()."
+            )
+
+    @contextmanager
+    def _conectar(self):
+        # Una conexión por operación: segura entre hilos y procesos
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:  # commit / rollback: un delta se aplica completo o no se aplica
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _meta(con) -> dict:
+        return {n: json.loads(v) for n, v in con.execute("SELECT nombre, valor FROM meta")}
+
+    @staticmethod
+    def _guardar_meta(con, **valores):
+        con.executemany(
+            "INSERT OR REPLACE INTO meta (nombre, valor) VALUES (?, ?)",
+            [(n, json.dumps(v, ensure_ascii=False, default=str)) for n, v in valores.items()],
+        )
+
+    def estado(self) -> dict:
+        """Metadatos: estados contados, última actualización y resumen del último delta."""
+        with self._conectar() as con:
+            meta = self._meta(con)
+            meta["celdas"], meta["casos"] = con.execute("SELECT COUNT(*), COALESCE(SUM(CASOS), 0) FROM conteos").fetchone()
+        return meta
+
+    def _cuenta(self, estado: Optional[str]) -> bool:
+        return self.estados is None or estado in self.estados
+
+    def _filas(self, df: pd.DataFrame) -> list:
+        """(ID_CASO, ESTADO_CASO, clave o None) por fila, validando las columnas."""
+        requeridas = ["ID_CASO"] + DIMENSIONES + (["ESTADO_CASO"] if self.estados is not None else [])
+        faltan = [c for c in requeridas if c not in df.columns]
+        if faltan:
+            raise ValueError(f"Faltan columnas para el almacén de conteos: {faltan}")
+        if df["ID_CASO"].isna().any():
+            raise ValueError("Hay filas sin ID_CASO.")
+        estados = _textos(df["ESTADO_CASO"]) if "ESTADO_CASO" in df.columns else [None] * len(df)
+        claves = _claves(df)
+        return [
+            (int(i), e, c if self._cuenta(e) else None)
+            for i, e, c in zip(df["ID_CASO"], estados, claves)
+        ]
+
+    def reconstruir(self, df: pd.DataFrame) -> dict:
+        """Carga completa (reemplaza el contenido): df con COLUMNAS_ALMACEN, un caso por fila."""
+        import pandas as pd
+        with span("conteos.reconstruir") as s:
+            filas = self._filas(df)
+            if len({f[0] for f in filas}) != len(filas):
+                raise ValueError("ID_CASO repetido en la carga completa.")
+            conteos = pd.Series([f[2] for f in filas], dtype=object).dropna().value_counts()
+            with self._conectar() as con:
+                con.execute("DELETE FROM conteos")
+                con.execute("DELETE FROM casos")
+                con.executemany("INSERT INTO casos (ID_CASO, ESTADO_CASO, clave) VALUES (?, ?, ?)", filas)
+                con.executemany(
+                    "INSERT INTO conteos (clave, CASOS) VALUES (?, ?)",
+                    ((c, int(n)) for c, n in conteos.items()),
+                )
+                self._guardar_meta(con, estados=self.estados, reconstruido=datetime.now().isoformat(timespec="seconds"),
+                                   ultimo_delta=None)
+            self._guardados = self.estados
+            s.anotar(filas=len(filas))
+        return {"casos": len(filas), "celdas": int(len(conteos))}
+
+    def aplicar_delta(self, delta: pd.DataFrame) -> dict:
+        """
+        Aplica altas, cambios y bajas por ID_CASO en una sola transacción.
+        - OPERACION (opcional; sin ella todas las filas son altas / cambios):
+          I / U reemplazan el caso (si ya existía, se resta de su celda anterior),
+          D lo elimina (basta ID_CASO). Filas repetidas de un caso se aplican en orden.
+        Devuelve cuántas filas de cada tipo se aplicaron y cuántas celdas cambiaron.
+        """
+        from collections import Counter
+        self._validar_estados()
+        if COL_OPERACION in delta.columns:
+            ops = [OPERACIONES.get(str(o).strip().upper()) for o in delta[COL_OPERACION]]
+            if None in ops:
+                invalidas = sorted({str(o) for o, n in zip(delta[COL_OPERACION], ops) if n is None})
+                raise ValueError(f"OPERACION no válida: {invalidas} (use {sorted(set(OPERACIONES))})")
+        else:
+            ops = ["U"] * len(delta)
+
+        with span("conteos.aplicar_delta") as s:
+            bajas = [o == "D" for o in ops]
+            if all(bajas):
+                filas = [(int(i), None, None) for i in delta["ID_CASO"]]
+            else:
+                filas = self._filas(delta)
+            resumen = {"altas": 0, "cambios": 0, "bajas": 0, "ignoradas": 0}
+            with self._conectar() as con:
+                ids = sorted({f[0] for f in filas})
+                actual = {}
+                for i in range(0, len(ids), _LOTE_IDS):
+                    lote = ids[i:i + _LOTE_IDS]
+                    marcas = ",".join("?" * len(lote))
+                    actual.update(
+                        (id_caso, (estado, clave)) for id_caso, estado, clave in con.execute(
+                            f"SELECT ID_CASO, ESTADO_CASO, clave FROM casos WHERE ID_CASO IN ({marcas})", lote
+                        )
+                    )
+                existian = set(actual)
+                cambios = Counter()
+                for op, (id_caso, estado, clave) in zip(ops, filas):
+                    previo = actual.get(id_caso)
+                    if op == "D":
+                        if previo is None:
+                            resumen["ignoradas"] += 1
+                            continue
+                        resumen["bajas"] += 1
+                        cambios[previo[1]] -= 1
+                        actual[id_caso] = None
+                        continue
+                    resumen["cambios" if previo is not None else "altas"] += 1
+                    if previo is not None:
+                        cambios[previo[1]] -= 1
+                    cambios[clave] += 1
+                    actual[id_caso] = (estado, clave)
+
+                cambios.pop(None, None)
+                cambios = {c: n for c, n in cambios.items() if n}
+                con.executemany(
+                    "INSERT INTO conteos (clave, CASOS) VALUES (?, ?) "
+                    "ON CONFLICT (clave) DO UPDATE SET CASOS = CASOS + excluded.CASOS",
+                    cambios.items(),
+                )
+                con.executemany("DELETE FROM conteos WHERE clave = ? AND CASOS = 0", ((c,) for c in cambios))
+                negativas = con.execute("SELECT COUNT(*) FROM conteos WHERE CASOS < 0").fetchone()[0]
+                if negativas:  # rollback: el delta no corresponde al contenido del almacén
+                    raise ValueError(f"El delta deja {negativas} celda(s) con conteo negativo; use reconstruir().")
+
+                eliminar = [(i,) for i, v in actual.items() if v is None and i in existian]
+                con.executemany("DELETE FROM casos WHERE ID_CASO = ?", eliminar)
+                con.executemany(
+                    "INSERT OR REPLACE INTO casos (ID_CASO, ESTADO_CASO, clave) VALUES (?, ?, ?)",
+                    ((i, *v) for i, v in actual.items() if v is not None),
+                )
+                resumen["celdas"] = len(cambios)
+                self._guardar_meta(con, ultimo_delta={**resumen, "aplicado": datetime.now().isoformat(timespec="seconds")})
+            s.anotar(filas=len(filas), **resumen)
+        return resumen
+
+    def conteos(self) -> pd.DataFrame:
+        """Celdas con CASOS > 0 (DIMENSIONES + CASOS), como las de CuboImprod."""
+        import pandas as pd
+        self._validar_estados()
+        with self._conectar() as con:
+            filas = con.execute("SELECT clave, CASOS FROM conteos").fetchall()
+        d = pd.DataFrame([json.loads(c) for c, _ in filas], columns=DIMENSIONES, dtype=object)
+        d["CASOS"] = pd.Series([n for _, n in filas], dtype="int64")
+        return d
+
+    def cubo(self) -> CuboImprod:
+        from src.cubo_improd import CuboImprod
+        return CuboImprod.desde_conteos(self.conteos())
+
+    def verificar(self, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Compara el almacén con un recuento completo y devuelve las celdas que difieren
+        (columnas CASOS_ALMACEN / CASOS_RECUENTO); vacío si coincide.
+        - df: filas de IMPROD_DISCIPLINARIO (COLUMNAS_ALMACEN); se recuentan con CuboImprod.
+        - sin df: se recuenta la tabla de casos del propio almacén (consistencia interna).
+        """
+        import pandas as pd
+        from src.cubo_improd import CuboImprod
+        self._validar_estados()
+        with span("conteos.verificar") as s:
+            if df is not None:
+                if self.estados is not None:
+                    df = df[[e in self.estados for e in _textos(df["ESTADO_CASO"])]]
+                recuento = CuboImprod.desde_df(df).conteos
+            else:
+                with self._conectar() as con:
+                    filas = con.execute(
+                        "SELECT clave, COUNT(*) FROM casos WHERE clave IS NOT NULL GROUP BY clave"
+                    ).fetchall()
+                recuento = pd.DataFrame([json.loads(c) for c, _ in filas], columns=DIMENSIONES, dtype=object)
+                recuento["CASOS"] = pd.Series([n for _, n in filas], dtype="int64")
+                recuento = CuboImprod.desde_conteos(recuento).conteos
+            almacen = self.cubo().conteos
+            comparacion = almacen.merge(recuento, on=DIMENSIONES, how="outer",
+                                        suffixes=("_ALMACEN", "_RECUENTO"))
+            comparacion[["CASOS_ALMACEN", "CASOS_RECUENTO"]] = (
+                comparacion[["CASOS_ALMACEN", "CASOS_RECUENTO"]].fillna(0).astype("int64")
+            )
+            difieren = comparacion[comparacion["CASOS_ALMACEN"] != comparacion["CASOS_RECUENTO"]]
+            s.anotar(filas=len(comparacion), diferencias=len(difieren))
+        return difieren.reset_index(drop=True)
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="Almacén incremental de conteos IMPROD (deltas por ID_CASO).")
+    parser.add_argument("ruta", help="archivo SQLite del almacén")
+    parser.add_argument("--reconstruir", metavar="ARCHIVO", help="carga completa desde CSV / Parquet")
+    parser.add_argument("--delta", metavar="ARCHIVO", help="CSV / Parquet con ID_CASO, OPERACION y dimensiones")
+    parser.add_argument("--verificar", nargs="?", const="", metavar="ARCHIVO",
+                        help="compara con un recuento completo del archivo (sin archivo: de la tabla de casos)")
+    parser.add_argument("--estados", nargs="+", help="solo cuentan estos ESTADO_CASO (al reconstruir)")
+    args = parser.parse_args(argv)
+
+    from tables.esquema_improd import cargar_archivo_improd
+
+    almacen = AlmacenConteos(args.ruta, args.estados if args.reconstruir else None)
+    if args.reconstruir:
+        print("Reconstruido:", almacen.reconstruir(cargar_archivo_improd(args.reconstruir, COLUMNAS_ALMACEN)))
+    if args.delta:
+        print("Delta aplicado:", almacen.aplicar_delta(leer_delta(args.delta)))
+    if args.verificar is not None:
+        df = cargar_archivo_improd(args.verificar, COLUMNAS_ALMACEN) if args.verificar else None
+        difieren = almacen.verificar(df)
+        if not difieren.empty:
+            print(f"{len(difieren)} celda(s) no coinciden con el recuento (primeras 50):")
+            print(difieren.head(50).to_string(index=False))
+            return 1
+        print("El almacén coincide con el recuento completo.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
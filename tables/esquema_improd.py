@@ -0,0 +1,146 @@
+# tables/esquema_improd.py
+"""
+Esquema de IMPROD_DISCIPLINARIO (las columnas de cargar_improd) y carga tipada de
+archivos CSV / Parquet sin la BD.
+
+- ESQUEMA_IMPROD: tipo de cada columna, declarado una sola vez.
+    "entero"    -> int64
+    "texto"     -> str (identificadores de alta cardinalidad)
+    "categoria" -> category (dimensiones de pocas categorías; ANIO_PGN siempre como texto)
+    "fecha"     -> datetime64
+- cargar_archivo_improd: lee solo las columnas pedidas (motor pyarrow), con los tipos
+  del esquema ya aplicados; las tablas no tienen que volver a convertir ANIO_PGN.
+- resumen_memoria: memoria por columna del DataFrame cargado.
+
+Uso:
+    df = cargar_archivo_improd("data/sample_improd.csv", columnas=COLUMNAS_REPORTE)
+    print(resumen_memoria(df))
+
+Requiere pyarrow.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from config.trazas import span
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+ESQUEMA_IMPROD = {
+    "ID_CASO": "entero",
+    "IUS": "texto",
+    "IUC": "texto",
+    "FECHA_PGN": "fecha",
+    "FECHA_PRESCRIPCION": "fecha",
+    "ESTADO_CASO": "categoria",
+    "DEPENDENCIA_TITULAR": "categoria",
+    "ETAPA_ACTUAL": "categoria",
+    "NIVEL_TERRITORIAL": "categoria",
+    "TIPO_DEPENDENCIA": "categoria",
+    "ETAPA_PROCESO": "categoria",
+    "ETAPA_HOMOLOGADA": "categoria",
+    "RIESGO": "categoria",
+    "IMPROD": "categoria",
+    "ANIO_PGN": "categoria",
+}
+
+# Textos que pandas.read_csv interpreta como nulo por defecto (se usan en todos los lectores)
+NULOS_CSV = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def _columnas(columnas) -> list:
+    cols = list(columnas or ESQUEMA_IMPROD)
+    desconocidas = [c for c in cols if c not in ESQUEMA_IMPROD]
+    if desconocidas:
+        raise ValueError(f"Columnas no válidas para IMPROD_DISCIPLINARIO: {desconocidas}")
+    return cols
+
+
+def _tipos_arrow(cols: list) -> dict:
+    import pyarrow as pa
+    arrow = {
+        "entero": pa.int64(),
+        "texto": pa.string(),
+        "categoria": pa.dictionary(pa.int32(), pa.string()),
+        "fecha": pa.timestamp("ns"),
+    }
+    return {c: arrow[ESQUEMA_IMPROD[c]] for c in cols}
+
+
+def _aplicar_esquema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos del esquema sobre un DataFrame ya leído. Las categorías quedan ordenadas
+    (el groupby del cubo ordena igual que con texto) y sin espacios sobrantes.
+    """
+    import pandas as pd
+    for c in df.columns:
+        tipo = ESQUEMA_IMPROD.get(c)
+        s = df[c]
+        if tipo == "categoria":
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                s = s.where(s.isna(), s.astype(str)).astype("category")
+            categorias = s.cat.categories.astype(str).str.strip()
+            if categorias.has_duplicates:  # ' 2022' y '2022' son la misma categoría
+                s = s.astype(str).str.strip().where(s.notna()).astype("category")
+            else:
+                s = s.cat.rename_categories(categorias)
+            df[c] = s.cat.reorder_categories(sorted(s.cat.categories))
+        elif tipo == "fecha" and not pd.api.types.is_datetime64_any_dtype(s):
+            df[c] = pd.to_datetime(s, errors="coerce")
+        elif tipo == "texto" and not pd.api.types.is_string_dtype(s):
+            df[c] = s.where(s.isna(), s.astype(str))
+    return df
+
+
+def cargar_archivo_improd(ruta, columnas=None) -> pd.DataFrame:
+    """
+    Lee un CSV o Parquet con el esquema de IMPROD_DISCIPLINARIO.
+    - 'columnas': solo se leen esas columnas (por defecto, todas las del esquema);
+      para las tablas del informe basta con COLUMNAS_REPORTE.
+    Los nulos son los mismos que los de pandas.read_csv (NULOS_CSV).
+    """
+    cols = _columnas(columnas)
+    ruta = Path(ruta)
+    sufijo = ruta.suffix.lower()
+    with span("carga.archivo_improd", formato=sufijo.lstrip(".")) as s:
+        if sufijo in (".csv", ".txt"):
+            import pyarrow.csv as pa_csv
+            tabla = pa_csv.read_csv(
+                ruta,
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=cols, column_types=_tipos_arrow(cols),
+                    null_values=NULOS_CSV, strings_can_be_null=True,
+                ),
+            )
+            df = tabla.to_pandas()
+        elif sufijo in (".parquet", ".pq"):
+            import pandas as pd
+            df = pd.read_parquet(ruta, columns=cols, engine="pyarrow")
+        else:
+            raise ValueError(f"Formato no soportado: {ruta} (use .csv o .parquet)")
+        df = _aplicar_esquema(df[cols])
+        s.anotar(filas=len(df), memoria_mb=round(memoria_mb(df), 1))
+    return df
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    """Memoria total del DataFrame en MB (incluye el contenido de los textos)."""
+    return float(df.memory_usage(deep=True, index=False).sum()) / 1e6
+
+
+def resumen_memoria(df: pd.DataFrame) -> pd.DataFrame:
+    """Memoria por columna (MB), tipo y número de categorías / valores distintos; fila TOTAL al final."""
+    import pandas as pd
+    uso = df.memory_usage(deep=True, index=False) / 1e6
+    filas = [
+        {"columna": c, "tipo": str(df[c].dtype), "distintos": int(df[c].nunique(dropna=True)), "mb": round(uso[c], 2)}
+        for c in df.columns
+    ]
+    filas.append({"columna": "TOTAL", "tipo": "", "distintos": None, "mb": round(float(uso.sum()), 2)})
+    return pd.DataFrame(filas).astype({"distintos": "Int64"})
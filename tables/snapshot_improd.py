@@ -0,0 +1,231 @@
+# tables/snapshot_improd.py
+"""
+Snapshot local del dataset IMPROD en Parquet particionado (ANIO_PGN / IMPROD).
+
+- guardar_snapshot:   escribe el DataFrame completo y el manifest.json.
+- cargar_snapshot:    lee el snapshot (con poda de columnas y de particiones IMPROD).
+- refrescar_snapshot: consulta a la BD solo las filas posteriores a la marca de agua
+                      (ID_CASO / FECHA_PGN) y reescribe únicamente las particiones afectadas.
+
+Requiere pyarrow.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from tables.consultas_sql import cargar_improd, cargar_improd_delta
+
+RUTA_SNAPSHOT = "data/snapshot_improd"
+COLUMNAS_PARTICION = ["ANIO_PGN", "IMPROD"]
+MANIFEST = "manifest.json"
+_DIR_DATOS = "datos"
+
+if TYPE_CHECKING:  # pandas se importa al usarse (arranque liviano)
+    import pandas as pd
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("El snapshot IMPROD requiere pyarrow (pip install pyarrow).") from e
+    return pa, pc, ds
+
+
+def _particionado():
+    pa, _, ds = _pyarrow()
+    esquema = pa.schema([(c, pa.string()) for c in COLUMNAS_PARTICION])
+    return ds.partitioning(esquema, flavor="hive")
+
+
+def _normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    """Claves de partición como texto (ANIO_PGN mezcla 'HASTA 2021' con años)."""
+    out = df.copy()
+    for c in COLUMNAS_PARTICION:
+        out[c] = out[c].astype("string").str.strip()
+    return out
+
+
+def _marca_de_agua(df: pd.DataFrame, previa=None) -> dict:
+    """Máximos de ID_CASO y FECHA_PGN (combinados con la marca previa, si existe)."""
+    import pandas as pd
+
+    previa = previa or {}
+    id_max, fecha_max = previa.get("ID_CASO"), previa.get("FECHA_PGN")
+
+    if "ID_CASO" in df.columns and df["ID_CASO"].notna().any():
+        v = df["ID_CASO"].max()
+        v = v.item() if hasattr(v, "item") else v
+        id_max = v if id_max is None else max(id_max, v)
+
+    if "FECHA_PGN" in df.columns:
+        fechas = pd.to_datetime(df["FECHA_PGN"], errors="coerce")
+        if fechas.notna().any():
+            v = fechas.max()
+            fecha_max = v.isoformat() if fecha_max is None else max(pd.Timestamp(fecha_max), v).isoformat()
+
+    return {"ID_CASO": id_max, "FECHA_PGN": fecha_max}
+
+
+def _leer_manifest(ruta: Path):
+    archivo = ruta / MANIFEST
+    if not archivo.exists():
+        return None
+    return json.loads(archivo.read_text(encoding="utf-8"))
+
+
+def _escribir_manifest(ruta: Path, filas: int, columnas, marca: dict, delta: int = None) -> dict:
+    manifest = {
+        "version": 1,
+        "formato": "parquet",
+        "particiones": COLUMNAS_PARTICION,
+        "columnas": list(columnas),
+        "filas": int(filas),
+        "marca_de_agua": marca,
+        "actualizado": datetime.now().isoformat(timespec="seconds"),
+    }
+    if delta is not None:
+        manifest["ultimo_delta"] = int(delta)
+    tmp = ruta / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    tmp.replace(ruta / MANIFEST)
+    return manifest
+
+
+def _escribir_particiones(tabla, ruta_datos: Path):
+    _, _, ds = _pyarrow()
+    ds.write_dataset(
+        tabla,
+        ruta_datos,
+        format="parquet",
+        partitioning=_particionado(),
+        basename_template=f"parte-{uuid.uuid4().hex[:12]}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def guardar_snapshot(df: pd.DataFrame, ruta: str = RUTA_SNAPSHOT) -> dict:
+    """
+    Guarda el DataFrame completo como snapshot (reemplaza el anterior).
+    Devuelve el manifest escrito.
+    """
+    import shutil
+    pa, _, _ = _pyarrow()
+
+    base = Path(ruta)
+    ruta_datos = base / _DIR_DATOS
+    if ruta_datos.exists():
+        shutil.rmtree(ruta_datos)
+    ruta_datos.mkdir(parents=True, exist_ok=True)
+
+    d = _normalizar(df)
+    _escribir_particiones(pa.Table.from_pandas(d, preserve_index=False), ruta_datos)
+    return _escribir_manifest(base, len(d), d.columns, _marca_de_agua(d))
+
+
+def _abrir(ruta: Path):
+    _, _, ds = _pyarrow()
+    return ds.dataset(ruta / _DIR_DATOS, format="parquet", partitioning=_particionado())
+
+
+def _claves_particion(fragmento) -> dict:
+    """Claves de partición {columna: valor} de un fragmento del dataset."""
+    _, _, ds = _pyarrow()
+    return ds.get_partition_keys(fragmento.partition_expression)
+
+
+def cargar_snapshot(ruta: str = RUTA_SNAPSHOT, columnas=None, filtro_improd: str = None) -> pd.DataFrame:
+    """
+    Lee el snapshot a DataFrame.
+    - 'columnas': solo se leen esas columnas del Parquet.
+    - 'filtro_improd': IMPROD contiene el texto (sin mayúsculas); se resuelve sobre
+      los valores de partición, así que solo se abren los archivos necesarios.
+    """
+    _, pc, _ = _pyarrow()
+    base = Path(ruta)
+    manifest = _leer_manifest(base)
+    if manifest is None:
+        raise FileNotFoundError(f"No existe un snapshot en {base.resolve()}")
+
+    dataset = _abrir(base)
+    filtro = None
+    if filtro_improd:
+        valores = {_claves_particion(f).get("IMPROD") for f in dataset.get_fragments()}
+        valores = [v for v in valores if v is not None and filtro_improd.lower() in v.lower()]
+        filtro = pc.field("IMPROD").isin(valores)
+
+    df = dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+    # Las columnas de partición quedan al final en Parquet: se restaura el orden original
+    orden = [c for c in (columnas or manifest.get("columnas", [])) if c in df.columns]
+    return df[orden] if orden else df
+
+
+def _clave(valores: dict):
+    return tuple(valores.get(c) for c in COLUMNAS_PARTICION)
+
+
+def refrescar_snapshot(ruta: str = RUTA_SNAPSHOT) -> pd.DataFrame:
+    """
+    Actualiza el snapshot con las filas nuevas de la BD y devuelve el dataset completo.
+    - Sin snapshot previo: carga completa (cargar_improd) y guarda.
+    - Con snapshot: solo pide a la BD ID_CASO/FECHA_PGN posteriores a la marca de agua.
+      Las filas del delta reemplazan (por ID_CASO) a las existentes y solo se
+      reescriben las particiones donde entran o de donde salen casos.
+    """
+    import pandas as pd
+
+    pa, pc, _ = _pyarrow()
+    base = Path(ruta)
+    manifest = _leer_manifest(base)
+    if manifest is None:
+        guardar_snapshot(cargar_improd(), ruta)
+        return cargar_snapshot(ruta)
+
+    marca = manifest.get("marca_de_agua") or {}
+    fecha = marca.get("FECHA_PGN")
+    delta = cargar_improd_delta(
+        id_caso_desde=marca.get("ID_CASO"),
+        fecha_pgn_desde=pd.Timestamp(fecha).to_pydatetime() if fecha else None,
+    )
+    if delta.empty:
+        return cargar_snapshot(ruta)
+
+    delta = _normalizar(delta)
+    dataset = _abrir(base)
+    ids_delta = pa.array(delta["ID_CASO"].dropna().unique().tolist())
+
+    # Particiones afectadas: las que reciben filas del delta y las que contienen casos actualizados
+    claves_delta = delta[COLUMNAS_PARTICION].astype(object)
+    claves_delta = claves_delta.where(claves_delta.notna(), None)
+    afectadas = set(claves_delta.itertuples(index=False, name=None))
+    previas = dataset.to_table(columns=["ID_CASO"] + COLUMNAS_PARTICION, filter=pc.field("ID_CASO").isin(ids_delta))
+    afectadas |= {_clave(r) for r in previas.select(COLUMNAS_PARTICION).to_pylist()}
+
+    fragmentos = [f for f in dataset.get_fragments() if _clave(_claves_particion(f)) in afectadas]
+    if fragmentos:
+        existentes = pa.concat_tables(
+            [f.to_table(schema=dataset.schema) for f in fragmentos]
+        ).to_pandas()
+        existentes = existentes[~existentes["ID_CASO"].isin(delta["ID_CASO"])]
+    else:
+        existentes = delta.iloc[0:0]
+
+    reemplazadas = len(previas)
+    combinado = _normalizar(pd.concat([existentes, delta[existentes.columns]], ignore_index=True))
+    tabla = pa.Table.from_pandas(combinado, schema=dataset.schema, preserve_index=False)
+
+    # Primero se escriben los archivos nuevos; luego se eliminan los reemplazados
+    _escribir_particiones(tabla, base / _DIR_DATOS)
+    for f in fragmentos:
+        Path(f.path).unlink(missing_ok=True)
+
+    filas = int(manifest.get("filas", 0)) - reemplazadas + len(delta)
+    _escribir_manifest(base, filas, manifest.get("columnas", delta.columns), _marca_de_agua(delta, marca), delta=len(delta))
+    return cargar_snapshot(ruta)